@@ -0,0 +1,134 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+ADMIN_ID = 1000
+OTHER_ID = 42
+
+# Cek paralelisme handler: Application asli dari bot.build_application() polling
+# ke fake Bot API, PlayFab palsu dengan latency besar. User A membuka info akun
+# (GetPlayerCombinedInfo lambat) dan user B mengirim /start di saat yang sama.
+# Dengan concurrent_updates balasan B tidak menunggu call upstream milik A.
+def prepare_workdir(workdir, api_url):
+    with open(os.path.join(workdir, "config.json"), "w") as f:
+        json.dump({
+            "admin_id": ADMIN_ID,
+            "db_name": os.path.join(workdir, "bench.db"),
+            "max_running_per_user": 2,
+            "log_level": "WARNING",
+            "bot_api_url": api_url
+        }, f)
+    os.environ.setdefault("BOT_TOKEN", "0:bench")
+    os.chdir(workdir)
+
+def first_reply(sent, chat_id, since):
+    times = [at for at, chat, _ in sent if chat == chat_id and at >= since]
+    return round((min(times) - since) * 1000, 1) if times else None
+
+async def run_mode(bot, fake, concurrency, timeout):
+    from fake_telegram import make_update
+
+    loop = asyncio.get_running_loop()
+    bot.CONCURRENT_UPDATES = concurrency
+    bot.player_info_cache.invalidate("acc0")
+    fake.reset()
+    app = bot.build_application()
+    async with app:
+        await app.start()
+        await app.updater.start_polling(drop_pending_updates=True)
+        while fake.first_poll_at is None:
+            await asyncio.sleep(0.01)
+        fake.push(make_update(1, ADMIN_ID, "📋 List Accounts"))
+        await loop.run_in_executor(None, fake.wait_sent, 1, timeout)
+        started = time.monotonic()
+        fake.push(make_update(2, ADMIN_ID, "acc0"), make_update(3, OTHER_ID, "/start"))
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and None in (
+                first_reply(fake.sent, ADMIN_ID, started), first_reply(fake.sent, OTHER_ID, started)):
+            await asyncio.sleep(0.01)
+        await app.updater.stop()
+        await app.stop()
+    slow = first_reply(fake.sent, ADMIN_ID, started)
+    other = first_reply(fake.sent, OTHER_ID, started)
+    return {
+        "concurrent_updates": concurrency,
+        "slow_reply_ms": slow,
+        "other_reply_ms": other,
+        "parallel": other is not None and slow is not None and other < slow / 2
+    }
+
+async def run(args):
+    import fake_playfab
+    import fake_telegram
+    import db
+    import money
+    import bot
+
+    playfab = fake_playfab.serve(latency_ms=args.latency, jitter_ms=0)
+    telegram = fake_telegram.serve()
+    for server in (playfab, telegram):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    money.PLAYFAB_BASE_URL = f"http://127.0.0.1:{playfab.server_port}"
+    bot.BOT_API_URL = f"http://127.0.0.1:{telegram.server_port}/bot"
+
+    db.open_db(bot.DB_NAME)
+    await db.add_account("acc0", "ticket0", '{"AndroidDeviceId": "bench"}', "bench", ADMIN_ID)
+    await db.add_whitelist(OTHER_ID, "user0", "2024-01-01 00:00:00")
+
+    results = []
+    for concurrency in [int(n) for n in args.concurrency.split(",") if n.strip()]:
+        result = await run_mode(bot, telegram.fake, concurrency, args.timeout)
+        results.append(result)
+        print(json.dumps(result), flush=True)
+    playfab.shutdown()
+    telegram.shutdown()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Cek dua chat dilayani paralel saat ada call upstream lambat")
+    parser.add_argument("--latency", type=float, default=3000.0, help="latency fake PlayFab (ms)")
+    parser.add_argument("--concurrency", default="1,32", help="nilai concurrent_updates, dipisah koma")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output", default="bench_concurrency.json")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+
+    revision = None
+    try:
+        revision = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+
+    with tempfile.TemporaryDirectory() as workdir:
+        prepare_workdir(workdir, "")
+        results = asyncio.run(run(args))
+        os.chdir(ROOT)
+
+    report = {
+        "benchmark": "concurrency",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_revision": revision,
+        "python": platform.python_version(),
+        "latency_ms": args.latency,
+        "results": results
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Hasil disimpan di {output}")
+    # Gagal (exit 1) kalau mode concurrent (>1) tidak paralel
+    if not all(r["parallel"] for r in results if r["concurrent_updates"] > 1):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
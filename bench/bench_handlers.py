@@ -0,0 +1,263 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+ADMIN_ID = 1000
+USER_ID = 42
+OWNERS = 100
+
+# Microbenchmark handler Telegram: replay update sintetis lewat start dan
+# handle_message untuk setiap state percakapan, dengan bot palsu, DB sementara
+# dan fake PlayFab tanpa latency. Dilaporkan latency p50/p99 dan alokasi memori
+# per state untuk tabel accounts berukuran 10, 1k dan 100k baris.
+class Obj:
+    pass
+
+class FakeMessage:
+    def __init__(self, text):
+        self.text = text
+
+    async def reply_text(self, text, **kwargs):
+        return None
+
+    async def reply_document(self, **kwargs):
+        return None
+
+class FakeBot:
+    async def send_message(self, chat_id, text, **kwargs):
+        return None
+
+def make_update(user_id, text):
+    update = Obj()
+    update.effective_user = Obj()
+    update.effective_user.id = user_id
+    update.effective_chat = Obj()
+    update.effective_chat.id = user_id
+    update.message = FakeMessage(text)
+    return update
+
+def make_context(user_data):
+    context = Obj()
+    context.user_data = dict(user_data)
+    context.bot = FakeBot()
+    return context
+
+# Setup per iterasi (tidak ikut diukur) untuk state yang mengubah data, supaya
+# setiap iterasi melewati jalur yang sama dan tidak menumpuk baris di DB
+TEMP_ACCOUNT = "bench_tmp"
+TEMP_USER_ID = 999999
+
+async def setup_temp_account(bot):
+    import db
+    if not await db.account_exists(TEMP_ACCOUNT):
+        await db.add_account(TEMP_ACCOUNT, "ticket-tmp", '{"AndroidDeviceId": "bench"}', "bench", USER_ID)
+
+async def clear_temp_account(bot):
+    import db
+    await db.delete_account(TEMP_ACCOUNT)
+    # Bulk create dari iterasi sebelumnya harus selesai dulu
+    if bot.background_tasks:
+        await asyncio.gather(*bot.background_tasks)
+    await db.delete_account(TEMP_ACCOUNT + "1")
+
+async def setup_running_worker(bot):
+    if not await bot.is_running("acc0"):
+        await bot.start_worker("acc0", "ticket0", USER_ID)
+
+async def clear_temp_whitelist(bot):
+    import db
+    await db.remove_whitelist(TEMP_USER_ID)
+
+async def setup_temp_whitelist(bot):
+    import db
+    await db.remove_whitelist(TEMP_USER_ID)
+    await db.add_whitelist(TEMP_USER_ID, "bench_tmp_user", "2024-01-01 00:00:00")
+
+# (nama, user, user_data awal, teks[, setup])
+SCENARIOS = [
+    ("start", USER_ID, {}, "/start"),
+    ("main_menu_unknown", USER_ID, {}, "halo"),
+    ("main_menu_list_accounts", USER_ID, {}, "📋 List Accounts"),
+    ("main_menu_add_money", USER_ID, {}, "💰 Add Money"),
+    ("main_menu_delete_account", USER_ID, {}, "🗑 Delete Account"),
+    ("main_menu_admin_list_accounts", ADMIN_ID, {}, "📋 List Accounts"),
+    ("list_accounts", USER_ID, {"state": "list_accounts", "prev": ""}, "{account}"),
+    ("back_to_list_accounts", USER_ID, {"state": "account_info", "prev": "list_accounts"}, "⬅ Kembali"),
+    ("add_money_select", USER_ID, {"state": "add_money_select", "prev": ""}, "{account}"),
+    ("add_money_control", USER_ID, {"state": "add_money_control", "prev": "add_money_select",
+                                    "current_account": "{account}"}, "⏹ Stop"),
+    ("account_info_refresh", USER_ID, {"state": "account_info", "prev": "list_accounts",
+                                       "current_account": "{account}"}, "🔄 Refresh"),
+    ("account_info_file", USER_ID, {"state": "account_info", "prev": "list_accounts",
+                                    "current_account": "{account}"}, "📄 File Txt"),
+    ("delete_account", USER_ID, {"state": "delete_account", "prev": ""}, TEMP_ACCOUNT, setup_temp_account),
+    ("add_account_name", USER_ID, {"state": "add_account_name", "prev": ""}, TEMP_ACCOUNT),
+    ("add_account_auth", USER_ID, {"state": "add_account_auth", "prev": "", "add_name": TEMP_ACCOUNT},
+     "ticket-tmp", clear_temp_account),
+    ("create_account_list_name", USER_ID, {"state": "create_account_list_name", "prev": ""}, TEMP_ACCOUNT),
+    ("create_account_bussid_name", USER_ID, {"state": "create_account_bussid_name", "prev": "",
+                                             "list_name": TEMP_ACCOUNT}, "BenchDriver", clear_temp_account),
+    ("bulk_create_count", USER_ID, {"state": "bulk_create_count", "prev": ""}, "1"),
+    ("bulk_create_pattern", USER_ID, {"state": "bulk_create_pattern", "prev": "", "bulk_count": 1},
+     TEMP_ACCOUNT + "{{n}}", clear_temp_account),
+    ("change_bussid_name", USER_ID, {"state": "change_bussid_name", "prev": "list_accounts",
+                                     "current_account": "{account}"}, "BenchDriver"),
+    ("admin_menu", ADMIN_ID, {}, "🔐 Admin Menu"),
+    ("admin_list_whitelist", ADMIN_ID, {"state": "admin_menu", "prev": ""}, "📜 List Whitelist"),
+    ("admin_list_running", ADMIN_ID, {"state": "admin_menu", "prev": ""}, "📊 List Running"),
+    ("admin_metrics", ADMIN_ID, {"state": "admin_menu", "prev": ""}, "📈 Metrics"),
+    ("list_whitelist", ADMIN_ID, {"state": "list_whitelist", "prev": "admin_menu"}, "user0"),
+    ("list_running_users", ADMIN_ID, {"state": "list_running_users", "prev": "admin_menu"}, "user0"),
+    ("list_running_accounts", ADMIN_ID, {"state": "list_running_accounts", "prev": "list_running_users",
+                                         "selected_user_id": USER_ID, "selected_user_name": "user0"},
+     "{account}", setup_running_worker),
+    ("running_control", ADMIN_ID, {"state": "running_control", "prev": "list_running_accounts",
+                                   "current_account": "{account}", "selected_user_id": USER_ID,
+                                   "selected_user_name": "user0"}, "⏹ Stop", setup_running_worker),
+    ("whitelist_id", ADMIN_ID, {"state": "whitelist_id", "prev": "admin_menu"}, str(TEMP_USER_ID)),
+    ("whitelist_name", ADMIN_ID, {"state": "whitelist_name", "prev": "admin_menu", "whitelist_id": TEMP_USER_ID},
+     "bench_tmp_user", clear_temp_whitelist),
+    ("unwhitelist", ADMIN_ID, {"state": "unwhitelist", "prev": "admin_menu"}, "bench_tmp_user", setup_temp_whitelist),
+]
+
+def prepare_workdir(workdir):
+    with open(os.path.join(workdir, "config.json"), "w") as f:
+        json.dump({
+            "admin_id": ADMIN_ID,
+            "db_name": os.path.join(workdir, "bench.db"),
+            "max_running_per_user": 2,
+            "log_level": "WARNING"
+        }, f)
+    os.environ.setdefault("BOT_TOKEN", "0:bench")
+    os.chdir(workdir)
+
+def fill_db(path, rows):
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("DELETE FROM accounts")
+        conn.execute("DELETE FROM whitelist")
+        conn.executemany(
+            "INSERT INTO whitelist (telegram_id, name, whitelist_time) VALUES (?, ?, ?)",
+            [(USER_ID if i == 0 else 10000 + i, f"user{i}", "2024-01-01 00:00:00") for i in range(OWNERS)])
+        conn.executemany(
+            "INSERT INTO accounts (name, session_ticket, payload, device_id, telegram_id) VALUES (?, ?, ?, ?, ?)",
+            [(f"acc{i}", f"ticket{i}", '{"AndroidDeviceId": "bench"}', "bench",
+              USER_ID if i % OWNERS == 0 else 10000 + i % OWNERS) for i in range(rows)])
+    conn.close()
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+async def run_scenario(bot, scenario, iterations):
+    name, user_id, user_data, text, *setup = scenario
+    setup = setup[0] if setup else None
+    user_data = {k: v.format(account="acc0") if isinstance(v, str) else v for k, v in user_data.items()}
+    text = text.format(account="acc0")
+    handler = bot.start if text == "/start" else bot.handle_message
+
+    # Putaran pertama: latency tanpa tracemalloc
+    latencies = []
+    for _ in range(iterations):
+        if setup:
+            await setup(bot)
+        update, context = make_update(user_id, text), make_context(user_data)
+        started = time.perf_counter()
+        await handler(update, context)
+        latencies.append(time.perf_counter() - started)
+
+    # Putaran kedua: alokasi memori per update
+    peaks = []
+    tracemalloc.start()
+    for _ in range(max(1, iterations // 5)):
+        if setup:
+            await setup(bot)
+        update, context = make_update(user_id, text), make_context(user_data)
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        await handler(update, context)
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+
+    return {
+        "state": name,
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "alloc_peak_kb": round(sum(peaks) / len(peaks) / 1024, 1)
+    }
+
+async def run(args):
+    import db
+    import money
+    import bot
+    from fake_playfab import serve
+
+    server = serve(latency_ms=0, jitter_ms=0)
+    asyncio.get_running_loop().run_in_executor(None, server.serve_forever)
+    money.PLAYFAB_BASE_URL = f"http://127.0.0.1:{server.server_port}"
+
+    results = []
+    db.open_db(bot.DB_NAME)
+    for rows in [int(n) for n in args.rows.split(",") if n.strip()]:
+        fill_db(bot.DB_NAME, rows)
+        db.open_db(bot.DB_NAME)
+        plans = db.check_query_plans()
+        states = []
+        for scenario in SCENARIOS:
+            iterations = args.iterations if rows < 100000 else max(5, args.iterations // 20)
+            states.append(await run_scenario(bot, scenario, iterations))
+        result = {"rows": rows, "unindexed_queries": [sql for sql, _ in plans], "states": states}
+        results.append(result)
+        print(json.dumps(result), flush=True)
+    if bot.background_tasks:
+        await asyncio.gather(*bot.background_tasks)
+    for name in money.get_running_workers():
+        money.stop_money_worker(name)
+    server.shutdown()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark handle_message per state")
+    parser.add_argument("--rows", default="10,1000,100000", help="ukuran tabel accounts, dipisah koma")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--output", default="bench_handlers.json")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+
+    revision = None
+    try:
+        revision = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+
+    with tempfile.TemporaryDirectory() as workdir:
+        prepare_workdir(workdir)
+        results = asyncio.run(run(args))
+        os.chdir(ROOT)
+
+    report = {
+        "benchmark": "handlers",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_revision": revision,
+        "python": platform.python_version(),
+        "iterations": args.iterations,
+        "results": results
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Hasil disimpan di {output}")
+
+if __name__ == "__main__":
+    main()
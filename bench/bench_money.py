@@ -0,0 +1,161 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import metrics
+import money
+
+# Benchmark money.py terhadap fake PlayFab lokal: jalankan N worker lewat
+# start_money_worker, ukur missions/detik, CPU, RSS dan latency siklus untuk
+# setiap N, lalu simpan hasilnya ke file JSON supaya bisa dibandingkan antar rilis.
+def start_fake_server(args):
+    cmd = [
+        sys.executable, os.path.join(ROOT, "bench", "fake_playfab.py"),
+        "--port", str(args.port), "--latency", str(args.latency), "--jitter", str(args.jitter),
+        "--rate-429", str(args.rate_429), "--rate-401", str(args.rate_401),
+        "--rate-visited", str(args.rate_visited)
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    if not line:
+        raise RuntimeError("Fake PlayFab gagal start")
+    return proc, line.strip().rsplit(" ", 1)[-1]
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+# Histogram worker_cycle yang juga menyimpan sampel mentah selama pengukuran;
+# quantile dari bucket hanya memberi batas atas bucket (mis. p50 tepat 0.5 s)
+class SampleHistogram(metrics.Histogram):
+    def __init__(self):
+        super().__init__()
+        self.samples = None
+
+    def observe(self, value):
+        super().observe(value)
+        samples = self.samples
+        if samples is not None:
+            samples.append(value)
+
+    def record(self):
+        self.samples = []
+
+    def percentiles(self, *qs):
+        samples = sorted(self.samples or ())
+        if not samples:
+            return [0.0] * len(qs)
+        return [samples[min(len(samples) - 1, int(q * len(samples)))] for q in qs]
+
+def run_round(count, args):
+    names = [f"bench{count}_{i}" for i in range(count)]
+    cycles = metrics.histograms["worker_cycle"] = SampleHistogram()
+    for name in names:
+        money.start_money_worker(name, f"ticket-{name}", owner=0)
+    time.sleep(args.warmup)
+
+    cycles.record()
+    before = metrics.worker_counters.snapshot()
+    cpu_before = cpu_seconds()
+    started = time.perf_counter()
+    time.sleep(args.duration)
+    elapsed = time.perf_counter() - started
+    cpu_used = cpu_seconds() - cpu_before
+    after = metrics.worker_counters.snapshot()
+    samples = len(cycles.samples)
+    p50, p99 = cycles.percentiles(0.5, 0.99)
+    rss = rss_mb()
+
+    for name in names:
+        money.stop_money_worker(name)
+
+    delta = {key: after[key] - before.get(key, 0) for key in after}
+    return {
+        "workers": count,
+        "duration_s": round(elapsed, 2),
+        "missions_per_s": round(delta["fare_ok"] / elapsed, 2),
+        "requests_429": delta["throttled_429"],
+        "requests_401": delta["unauthorized_401"],
+        "fare_failed": delta["fare_failed"],
+        "cpu_percent": round(cpu_used / elapsed * 100, 1),
+        "rss_mb": round(rss, 1),
+        "cycles": samples,
+        "cycle_p50_ms": round(p50 * 1000, 1),
+        "cycle_p99_ms": round(p99 * 1000, 1)
+    }
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test money.py terhadap fake PlayFab")
+    parser.add_argument("--engine", choices=money.ENGINES, default="thread")
+    parser.add_argument("--workers", default="10,50,100,250", help="daftar jumlah worker, dipisah koma")
+    parser.add_argument("--duration", type=float, default=30.0, help="lama pengukuran per ronde (detik)")
+    parser.add_argument("--warmup", type=float, default=5.0, help="jeda sebelum mulai mengukur (detik)")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=50.0)
+    parser.add_argument("--jitter", type=float, default=10.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-401", type=float, default=0.0)
+    parser.add_argument("--rate-visited", type=float, default=0.0, help="peluang rute ditolak 'Terminal has been visited'")
+    parser.add_argument("--pool-size", type=int, default=100)
+    parser.add_argument("--rate-limit", type=float, default=1000.0, help="batas awal rate limiter (req/detik)")
+    parser.add_argument("--output", default="bench_money.json")
+    args = parser.parse_args()
+
+    logging.getLogger("money").addHandler(logging.NullHandler())
+    logging.getLogger("money").propagate = False
+
+    proc, base_url = start_fake_server(args)
+    try:
+        money.PLAYFAB_BASE_URL = base_url
+        money.set_engine(args.engine)
+        money.configure_http_pool(args.pool_size)
+        money.configure_rate_limiter(args.rate_limit, 1.0, max(args.rate_limit, 1.0))
+        rounds = []
+        for count in [int(n) for n in args.workers.split(",") if n.strip()]:
+            result = run_round(count, args)
+            rounds.append(result)
+            print(json.dumps(result), flush=True)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    report = {
+        "benchmark": "money",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "engine": args.engine,
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "rounds": rounds
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Hasil disimpan di {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Benchmark mode shard money.py: jumlah worker yang sama dijalankan dengan 1, 2, 4, ...
+# proses shard terhadap beberapa proses fake PlayFab (SO_REUSEPORT) tanpa latency
+# dan pacing adaptive tanpa jeda minimum, supaya yang diukur adalah batas CPU.
+# Setiap jumlah shard jalan di subprocess sendiri karena shard hanya bisa dibuat sekali.
+def start_fake_servers(args):
+    procs = []
+    for _ in range(args.servers):
+        cmd = [
+            sys.executable, os.path.join(ROOT, "bench", "fake_playfab.py"),
+            "--port", str(args.port), "--latency", str(args.latency), "--jitter", "0", "--reuse-port"
+        ]
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+        if not proc.stdout.readline():
+            raise RuntimeError("Fake PlayFab gagal start")
+        procs.append(proc)
+    return procs
+
+def run_once(args):
+    import metrics
+    import money
+
+    logging.getLogger("money").addHandler(logging.NullHandler())
+    logging.getLogger("money").propagate = False
+    money.PLAYFAB_BASE_URL = f"http://127.0.0.1:{args.port}"
+    money.SHARD_STATS_INTERVAL = 1
+    money.set_engine(args.engine)
+    money.configure_http_pool(args.pool_size)
+    money.configure_rate_limiter(args.rate_limit, 1.0, args.rate_limit)
+    money.configure_pacing("adaptive", min_delay=0.0, max_delay=1.0)
+    money.configure_shards(args.shards)
+
+    names = [f"bench_{i}" for i in range(args.workers)]
+    for name in names:
+        money.start_money_worker(name, f"ticket-{name}", owner=0)
+    time.sleep(args.warmup)
+    before = metrics.worker_counters.snapshot()["fare_ok"]
+    started = time.perf_counter()
+    time.sleep(args.duration)
+    elapsed = time.perf_counter() - started
+    after = metrics.worker_counters.snapshot()["fare_ok"]
+    for name in names:
+        money.stop_money_worker(name)
+    money.stop_shards()
+    print(json.dumps({
+        "shards": args.shards,
+        "workers": args.workers,
+        "missions_per_s": round((after - before) / elapsed, 2)
+    }), flush=True)
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scaling money worker per jumlah proses shard")
+    parser.add_argument("--engine", choices=("thread", "asyncio"), default="asyncio")
+    parser.add_argument("--shards", default=None, help="daftar jumlah shard, dipisah koma (default 1,2,4,.. sampai jumlah core)")
+    parser.add_argument("--workers", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--servers", type=int, default=os.cpu_count() or 1, help="jumlah proses fake PlayFab")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--pool-size", type=int, default=100)
+    parser.add_argument("--rate-limit", type=float, default=100000.0)
+    parser.add_argument("--output", default="bench_shards.json")
+    parser.add_argument("--run", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        args.shards = int(args.shards)
+        run_once(args)
+        return
+
+    if args.shards:
+        counts = [int(n) for n in args.shards.split(",") if n.strip()]
+    else:
+        counts, n = [], 1
+        while n <= (os.cpu_count() or 1):
+            counts.append(n)
+            n *= 2
+
+    procs = start_fake_servers(args)
+    rounds = []
+    try:
+        for count in counts:
+            cmd = [sys.executable, os.path.abspath(__file__), "--run", "--shards", str(count)]
+            for key in ("engine", "workers", "duration", "warmup", "port", "pool_size", "rate_limit"):
+                cmd += ["--" + key.replace("_", "-"), str(getattr(args, key))]
+            result = json.loads(subprocess.check_output(cmd, text=True).strip().splitlines()[-1])
+            result["speedup"] = round(result["missions_per_s"] / rounds[0]["missions_per_s"], 2) if rounds and rounds[0]["missions_per_s"] else 1.0
+            rounds.append(result)
+            print(json.dumps(result), flush=True)
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.wait()
+
+    report = {
+        "benchmark": "shards",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "run")},
+        "rounds": rounds
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Hasil disimpan di {args.output}")
+
+if __name__ == "__main__":
+    main()
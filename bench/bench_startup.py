@@ -0,0 +1,131 @@
+import argparse
+import json
+import os
+import platform
+import re
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+from fake_telegram import make_update, serve
+
+ADMIN_ID = 1000
+TOKEN = "0:bench"
+
+# Benchmark startup bot.py: proses bot dijalankan ulang terhadap fake Bot API
+# lokal (config "bot_api_url"). Dicatat waktu dari spawn sampai getUpdates pertama
+# (polling mulai) dan sampai balasan /start pertama terkirim (time-to-first-update),
+# plus waktu import per modul dari `python -X importtime -c "import bot"`.
+def prepare_workdir(workdir, api_url, args):
+    with open(os.path.join(workdir, "config.json"), "w") as f:
+        json.dump({
+            "admin_id": ADMIN_ID,
+            "db_name": os.path.join(workdir, "bench.db"),
+            "max_running_per_user": 2,
+            "log_level": "WARNING",
+            "money_engine": args.engine,
+            "http_pool_warmup": args.http_warmup,
+            "bot_api_url": api_url
+        }, f)
+
+def bot_env():
+    return dict(os.environ, BOT_TOKEN=TOKEN, PYTHONPATH=ROOT)
+
+def measure_imports(workdir):
+    # Baris importtime: "import time: self | cumulative | nama", indent 2 spasi = import langsung dari bot
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import bot"],
+        cwd=workdir, env=bot_env(), capture_output=True, text=True
+    ).stderr
+    modules = {}
+    for line in output.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)", line)
+        if match and len(match.group(2)) <= 2:
+            modules[match.group(3)] = int(match.group(1)) / 1000.0
+    return modules
+
+def run_once(server, workdir, timeout):
+    fake = server.fake
+    fake.reset()
+    started = time.monotonic()
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "bot.py")], cwd=workdir, env=bot_env())
+    try:
+        replied = fake.wait_sent(1, timeout)
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            exit_code = proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            exit_code = proc.wait()
+    if not replied:
+        raise RuntimeError(f"Bot tidak membalas /start dalam {timeout} detik")
+    return {
+        "first_poll_ms": round((fake.first_poll_at - started) * 1000, 1),
+        "first_reply_ms": round((fake.sent[0][0] - started) * 1000, 1),
+        "exit_code": exit_code
+    }
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark waktu startup bot.py")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--engine", choices=("thread", "asyncio"), default="thread")
+    parser.add_argument("--http-warmup", type=int, default=0, help="http_pool_warmup (koneksi ke PlayFab asli)")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output", default="bench_startup.json")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+
+    # /start dikirim setelah polling mulai; update yang menunggu sebelum itu dibuang bot
+    def send_start(fake):
+        fake.push(make_update(1, ADMIN_ID, "/start"))
+
+    server = serve(on_first_poll=send_start)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_url = f"http://127.0.0.1:{server.server_port}/bot"
+
+    runs = []
+    imports = []
+    with tempfile.TemporaryDirectory() as workdir:
+        prepare_workdir(workdir, api_url, args)
+        for _ in range(args.runs):
+            imports.append(measure_imports(workdir))
+            result = run_once(server, workdir, args.timeout)
+            runs.append(result)
+            print(json.dumps(result), flush=True)
+    server.shutdown()
+
+    modules = sorted(set().union(*imports), key=lambda name: -statistics.median(i.get(name, 0.0) for i in imports))
+    report = {
+        "benchmark": "startup",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "first_poll_ms": statistics.median(r["first_poll_ms"] for r in runs),
+        "first_reply_ms": statistics.median(r["first_reply_ms"] for r in runs),
+        "import_ms": {name: round(statistics.median(i.get(name, 0.0) for i in imports), 1) for name in modules},
+        "runs": runs
+    }
+    print(f"Polling mulai {report['first_poll_ms']} ms, balasan pertama {report['first_reply_ms']} ms (median)")
+    for name, ms in list(report["import_ms"].items())[:12]:
+        print(f"  import {name}: {ms} ms")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Hasil disimpan di {output}")
+
+if __name__ == "__main__":
+    main()
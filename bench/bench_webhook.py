@@ -0,0 +1,217 @@
+import argparse
+import http.client
+import json
+import os
+import platform
+import queue
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+from fake_telegram import make_update, serve
+
+ADMIN_ID = 1000
+TOKEN = "0:bench"
+SECRET = "bench-secret"
+USER_BASE = 100000
+
+# Benchmark ingestion update: bot.py dijalankan dalam mode webhook lalu dibanjiri
+# update sintetis lewat POST paralel (dengan secret token), dibandingkan dengan
+# mode polling yang menerima burst yang sama lewat getUpdates. Setiap update
+# datang dari user berbeda yang tidak di-whitelist, jadi bot membalas tepat satu
+# pesan dan latency per update bisa dihitung dari chat_id balasan.
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def prepare_workdir(workdir, api_url, webhook_port, mode):
+    with open(os.path.join(workdir, "config.json"), "w") as f:
+        json.dump({
+            "admin_id": ADMIN_ID,
+            "db_name": os.path.join(workdir, "bench.db"),
+            "max_running_per_user": 2,
+            "log_level": "WARNING",
+            "http_pool_warmup": 0,
+            "bot_api_url": api_url,
+            "webhook": {
+                "enabled": mode == "webhook",
+                "url": f"http://127.0.0.1:{webhook_port}",
+                "port": webhook_port,
+                "path": "telegram",
+                "secret_token": SECRET
+            }
+        }, f)
+
+def start_bot(workdir):
+    return subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "bot.py")], cwd=workdir,
+        env=dict(os.environ, BOT_TOKEN=TOKEN, PYTHONPATH=ROOT)
+    )
+
+def stop_bot(proc):
+    proc.send_signal(signal.SIGTERM)
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+def wait_until(check, timeout):
+    deadline = time.monotonic() + timeout
+    while not check():
+        if time.monotonic() > deadline:
+            raise RuntimeError("Bot tidak siap")
+        time.sleep(0.05)
+
+def post(conn, update, secret):
+    body = json.dumps(update).encode()
+    conn.request("POST", "/telegram", body=body, headers={
+        "Content-Type": "application/json",
+        "X-Telegram-Bot-Api-Secret-Token": secret
+    })
+    response = conn.getresponse()
+    response.read()
+    return response.status
+
+def post_updates(port, updates, concurrency):
+    # Return {chat_id: waktu POST selesai}, status HTTP per update
+    jobs = queue.Queue()
+    for update in updates:
+        jobs.put(update)
+    acked = {}
+    statuses = {}
+    lock = threading.Lock()
+
+    def client():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        while True:
+            try:
+                update = jobs.get_nowait()
+            except queue.Empty:
+                break
+            status = post(conn, update, SECRET)
+            with lock:
+                acked[update["message"]["chat"]["id"]] = time.monotonic()
+                statuses[status] = statuses.get(status, 0) + 1
+        conn.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return acked, statuses
+
+def summarize(mode, started, sent, count, acked=None, statuses=None, rejected=None):
+    replies = {chat_id: at for at, chat_id, _ in sent if chat_id >= USER_BASE}
+    latencies = sorted(at - started for at in replies.values())
+    done = max(replies.values()) - started
+    result = {
+        "mode": mode,
+        "updates": count,
+        "replied": len(replies),
+        "processed_per_s": round(len(replies) / done, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))] * 1000, 1)
+    }
+    if acked:
+        result["ingested_per_s"] = round(len(acked) / (max(acked.values()) - started), 1)
+        result["http_status"] = statuses
+        result["wrong_secret_status"] = rejected
+    return result
+
+def run_webhook(server, args):
+    fake = server.fake
+    fake.reset()
+    port = free_port()
+    updates = [make_update(i + 1, USER_BASE + i, "halo") for i in range(args.updates)]
+    with tempfile.TemporaryDirectory() as workdir:
+        prepare_workdir(workdir, f"http://127.0.0.1:{server.server_port}/bot", port, "webhook")
+        proc = start_bot(workdir)
+        try:
+            wait_until(lambda: fake.calls.get("setWebhook"), args.timeout)
+            # Update dengan secret salah harus ditolak
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            wait_until(lambda: _can_connect(port), args.timeout)
+            rejected = post(conn, make_update(0, ADMIN_ID, "/start"), "salah")
+            conn.close()
+            started = time.monotonic()
+            acked, statuses = post_updates(port, updates, args.concurrency)
+            if not fake.wait_sent(len(updates), args.timeout):
+                raise RuntimeError(f"Hanya {len(fake.sent)}/{len(updates)} update dibalas")
+        finally:
+            stop_bot(proc)
+    return summarize("webhook", started, fake.sent, len(updates), acked, statuses, rejected)
+
+def run_polling(server, args):
+    fake = server.fake
+    fake.reset()
+    updates = [make_update(i + 1, USER_BASE + i, "halo") for i in range(args.updates)]
+    with tempfile.TemporaryDirectory() as workdir:
+        prepare_workdir(workdir, f"http://127.0.0.1:{server.server_port}/bot", free_port(), "polling")
+        proc = start_bot(workdir)
+        try:
+            wait_until(lambda: fake.first_poll_at is not None, args.timeout)
+            started = time.monotonic()
+            fake.push(*updates)
+            if not fake.wait_sent(len(updates), args.timeout):
+                raise RuntimeError(f"Hanya {len(fake.sent)}/{len(updates)} update dibalas")
+        finally:
+            stop_bot(proc)
+    return summarize("polling", started, fake.sent, len(updates))
+
+def _can_connect(port):
+    try:
+        socket.create_connection(("127.0.0.1", port), timeout=1).close()
+        return True
+    except OSError:
+        return False
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingestion update mode webhook vs polling")
+    parser.add_argument("--modes", default="webhook,polling", help="dipisah koma")
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20, help="jumlah koneksi POST paralel (webhook)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", default="bench_webhook.json")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+
+    server = serve()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    runners = {"webhook": run_webhook, "polling": run_polling}
+    results = []
+    for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+        result = runners[mode](server, args)
+        results.append(result)
+        print(json.dumps(result), flush=True)
+    server.shutdown()
+
+    report = {
+        "benchmark": "webhook",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": results
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Hasil disimpan di {output}")
+
+if __name__ == "__main__":
+    main()
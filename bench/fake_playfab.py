@@ -0,0 +1,164 @@
+import argparse
+import json
+import random
+import socket
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Server pengganti 4ae9.playfabapi.com untuk benchmark lokal. Meniru endpoint
+# yang dipakai bot.py dan money.py, dengan latency, 429 dan 401 yang bisa diatur.
+# Response mengikuti mode X-ReportErrorAsSuccess: error dikirim sebagai HTTP 200
+# dengan field "code" di body.
+CITIES = ["PBR", "JMB", "PLB", "LPG", "JKT", "CBN", "SMG", "SBY", "MLG", "BKL"]
+
+class FakePlayFab:
+    def __init__(self, latency_ms=50.0, jitter_ms=10.0, rate_429=0.0, rate_401=0.0, retry_after=1, rate_visited=0.0):
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.rate_429 = rate_429
+        self.rate_401 = rate_401
+        self.retry_after = retry_after
+        self.rate_visited = rate_visited
+        self.visited = set()  # pasangan kota yang selalu ditolak "Terminal has been visited"
+        self.lock = threading.Lock()
+        self.requests = {}
+
+    def count(self, name):
+        with self.lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+
+    def respond(self, path, body):
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        endpoint = path.rsplit("/", 1)[-1]
+        name = body.get("FunctionName", endpoint) if endpoint == "ExecuteCloudScript" else endpoint
+        self.count(name)
+
+        if endpoint != "LoginWithAndroidDeviceID":
+            if random.random() < self.rate_429:
+                self.count("429")
+                return {"code": 429, "status": "TooManyRequests", "error": "APIClientRequestRateLimitExceeded",
+                        "errorMessage": "The client has exceeded the maximum API request rate",
+                        "data": {"Error": {"retryAfterSeconds": self.retry_after}}}
+            if random.random() < self.rate_401:
+                self.count("401")
+                return {"code": 401, "status": "Unauthorized", "error": "NotAuthenticated",
+                        "errorMessage": "This API method does not allow anonymous callers."}
+
+        if endpoint == "LoginWithAndroidDeviceID":
+            return {"code": 200, "status": "OK", "data": {
+                "SessionTicket": f"{uuid.uuid4().hex[:16]}-{body.get('AndroidDeviceId', '')}",
+                "PlayFabId": uuid.uuid4().hex[:16].upper(), "NewlyCreated": bool(body.get("CreateAccount"))}}
+        if endpoint == "UpdateUserTitleDisplayName":
+            return {"code": 200, "status": "OK", "data": {"DisplayName": body.get("DisplayName")}}
+        if endpoint == "GetPlayerCombinedInfo":
+            return {"code": 200, "status": "OK", "data": {"InfoResultPayload": {
+                "AccountInfo": {"PlayFabId": "FAKE", "TitleInfo": {
+                    "DisplayName": "fake", "Origination": "Android", "Created": "2024-01-01T00:00:00Z",
+                    "LastLogin": "2024-01-01T00:00:00Z", "FirstLogin": "2024-01-01T00:00:00Z"}},
+                "UserVirtualCurrency": {"RP": random.randint(0, 2000000)}}}}
+        if name == "PlayCareer":
+            cities = body.get("FunctionParameter", {}).get("cities") or CITIES
+            passengers = [{"source": random.choice(cities), "destination": random.choice(cities),
+                           "amount": random.randint(0, 60)} for _ in range(6)]
+            return {"code": 200, "status": "OK", "data": {"FunctionResult": {"careerSession": {
+                "token": uuid.uuid4().hex, "passenger": passengers}}, "Logs": []}}
+        if name == "FarePayment":
+            records = body.get("FunctionParameter", {}).get("records", [])
+            pairs = [(r["Key"]["sourceCity"], r["Key"]["destinationCity"]) for r in records]
+            with self.lock:
+                if pairs and random.random() < self.rate_visited:
+                    self.visited.add(pairs[0])
+                rejected = any(pair in self.visited for pair in pairs)
+            if rejected:
+                self.count("visited")
+                return {"code": 200, "status": "OK", "data": {"apiError": "Terminal has been visited", "Logs": []}}
+            paid = sum(r.get("Value", 0) for r in records)
+            return {"code": 200, "status": "OK", "data": {"FunctionResult": {"paid": paid},
+                    "Logs": [{"Level": "Info", "Message": f"Paid {paid}"}]}}
+        if name == "ResetUserFuel":
+            return {"code": 200, "status": "OK", "data": {"FunctionResult": {"fuel": 100}, "Logs": []}}
+        return {"code": 400, "status": "BadRequest", "errorMessage": f"Unknown endpoint {path}"}
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True  # header dan body ditulis terpisah; tanpa ini kena delayed ACK ~40 ms
+
+        def _send(self, payload):
+            data = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            # Dipakai warm-up pool dan untuk melihat jumlah request
+            self._send({"requests": dict(fake.requests)})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                body = {}
+            self._send(fake.respond(self.path, body))
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+class FakeServer(ThreadingHTTPServer):
+    reuse_port = False
+
+    def server_bind(self):
+        # Beberapa proses fake server bisa listen di port yang sama (SO_REUSEPORT),
+        # supaya server tidak jadi bottleneck satu core saat benchmark multi-proses
+        if self.reuse_port:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+    def handle_error(self, request, client_address):
+        # Client benchmark sering memutus koneksi keep-alive saat berhenti
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+def serve(host="127.0.0.1", port=0, reuse_port=False, **options):
+    fake = FakePlayFab(**options)
+    server = FakeServer((host, port), make_handler(fake), bind_and_activate=False)
+    server.reuse_port = reuse_port
+    server.server_bind()
+    server.server_activate()
+    server.daemon_threads = True
+    server.fake = fake
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake PlayFab server untuk benchmark")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=50.0, help="latency rata-rata (ms)")
+    parser.add_argument("--jitter", type=float, default=10.0, help="variasi latency +/- (ms)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="peluang response 429 (0-1)")
+    parser.add_argument("--rate-401", type=float, default=0.0, help="peluang response 401 (0-1)")
+    parser.add_argument("--retry-after", type=int, default=1, help="retryAfterSeconds di response 429")
+    parser.add_argument("--rate-visited", type=float, default=0.0,
+                        help="peluang sebuah rute mulai ditolak 'Terminal has been visited' (0-1)")
+    parser.add_argument("--reuse-port", action="store_true", help="izinkan beberapa proses di port yang sama")
+    args = parser.parse_args()
+    server = serve(args.host, args.port, args.reuse_port, latency_ms=args.latency, jitter_ms=args.jitter,
+                   rate_429=args.rate_429, rate_401=args.rate_401, retry_after=args.retry_after,
+                   rate_visited=args.rate_visited)
+    print(f"Fake PlayFab di http://{args.host}:{server.server_port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+# Server pengganti api.telegram.org untuk benchmark lokal (config "bot_api_url").
+# Cukup untuk python-telegram-bot: getMe, deleteWebhook/setWebhook, getUpdates
+# (long-poll dari antrean) dan sendMessage yang dicatat waktunya.
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+
+def make_update(update_id, user_id, text):
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+        "text": text
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": update_id, "message": message}
+
+class FakeTelegram:
+    def __init__(self, on_first_poll=None):
+        self.on_first_poll = on_first_poll  # dipanggil sekali saat getUpdates pertama
+        self.condition = threading.Condition()
+        self.generation = 0
+        self.reset()
+
+    def reset(self):
+        # Long poll dari proses/Application sebelumnya bisa masih menunggu; generation
+        # baru membuatnya pulang kosong tanpa membuang update run berikutnya
+        with self.condition:
+            self.generation += 1
+            self.condition.notify_all()
+            self.updates = []
+            self.first_poll_at = None
+            self.sent = []  # [(waktu, chat_id, text)]
+            self.calls = {}
+
+    def push(self, *updates):
+        with self.condition:
+            self.updates.extend(updates)
+            self.condition.notify_all()
+
+    def wait_sent(self, count, timeout):
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while len(self.sent) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+
+    def call(self, method, params):
+        with self.condition:
+            self.calls[method] = self.calls.get(method, 0) + 1
+        if method == "getMe":
+            return BOT_USER
+        if method == "getUpdates":
+            return self.get_updates(int(params.get("offset") or 0), float(params.get("timeout") or 0))
+        if method == "deleteWebhook":
+            if params.get("drop_pending_updates") in ("true", "True", True):
+                with self.condition:
+                    self.updates = []
+            return True
+        if method == "sendMessage":
+            chat_id = int(params.get("chat_id", 0))
+            with self.condition:
+                self.sent.append((time.monotonic(), chat_id, params.get("text", "")))
+                message_id = len(self.sent)
+                self.condition.notify_all()
+            return {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": BOT_USER,
+                "text": params.get("text", "")
+            }
+        return True
+
+    def get_updates(self, offset, timeout):
+        first = False
+        with self.condition:
+            generation = self.generation
+            if self.first_poll_at is None:
+                self.first_poll_at = time.monotonic()
+                first = True
+        if first and self.on_first_poll:
+            self.on_first_poll(self)
+        deadline = time.monotonic() + min(timeout, 1.0)
+        with self.condition:
+            while True:
+                if generation != self.generation:
+                    return []
+                updates = [u for u in self.updates if u["update_id"] >= offset]
+                self.updates = updates
+                remaining = deadline - time.monotonic()
+                if updates or remaining <= 0:
+                    return updates[:100]
+                self.condition.wait(remaining)
+
+def _parse_params(handler):
+    length = int(handler.headers.get("Content-Length") or 0)
+    raw = handler.rfile.read(length).decode() if length else ""
+    if handler.headers.get("Content-Type", "").startswith("application/json"):
+        return json.loads(raw or "{}")
+    # python-telegram-bot mengirim form-urlencoded dengan nilai JSON
+    params = {}
+    for key, values in parse_qs(raw).items():
+        try:
+            params[key] = json.loads(values[0])
+        except ValueError:
+            params[key] = values[0]
+    return params
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True  # header dan body ditulis terpisah; tanpa ini kena delayed ACK ~40 ms
+
+        def do_POST(self):
+            method = self.path.rsplit("/", 1)[-1]
+            result = fake.call(method, _parse_params(self))
+            body = json.dumps({"ok": True, "result": result}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = do_POST
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+def serve(host="127.0.0.1", port=0, **options):
+    fake = FakeTelegram(**options)
+    server = FakeServer((host, port), make_handler(fake))
+    server.fake = fake
+    return server
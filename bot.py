@@ -1,31 +1,33 @@
-import requests
 import json
 import uuid
-import sqlite3
 import os
 import logging
 from datetime import datetime
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
 import asyncio
-import nest_asyncio
+import functools
+import random
 import re
-from money import start_money_worker, stop_money_worker, is_worker_running, get_running_workers
+import secrets
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+import db
+from logging_setup import setup_logging
+from cluster import (
+    configure_cluster, serve_cluster_store, start_worker, stop_worker, start_local_worker, is_running, running_workers,
+    worker_nodes, run_node
+)
+from metrics import histogram, histograms, timed, worker_counters, start_exporter, register_gauge
+from money import (
+    get_running_workers, set_engine,
+    configure_http_pool, warm_up_http_pool, get_http_pool_stats, PlayFabClient,
+    configure_rate_limiter, get_rate_limiter_stats, configure_pacing, get_missions_per_minute,
+    configure_shards, relogin_payload, set_session_listener
+)
 from dotenv import load_dotenv
 
-# Apply nest_asyncio for nested event loops
-nest_asyncio.apply()
-
-
-# Konfigurasi logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO,
-    handlers=[
-        logging.FileHandler("bussid_bot.log"),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 # Baca .env
@@ -42,6 +44,22 @@ try:
         ADMIN_ID = config["admin_id"]
         DB_NAME = config["db_name"]
         MAX_RUNNING_PER_USER = config["max_running_per_user"]
+        MONEY_ENGINE = config.get("money_engine", "thread")
+        HTTP_POOL_SIZE = config.get("http_pool_size", 20)
+        HTTP_POOL_WARMUP = config.get("http_pool_warmup", 2)
+        RATE_LIMIT = config.get("rate_limit", {})
+        UPSTREAM_WORKERS = config.get("upstream_workers", 8)
+        CONCURRENT_UPDATES = config.get("concurrent_updates", 32)
+        DB_READERS = config.get("db_readers", 3)
+        METRICS = config.get("metrics", {})
+        RESUME = config.get("resume", {})
+        PACING = config.get("pacing", {})
+        MONEY_SHARDS = config.get("money_shards", 0)
+        CLUSTER = config.get("cluster", {})
+        BULK_CREATE = config.get("bulk_create", {})
+        PLAYER_INFO_TTL = config.get("player_info_ttl", 60)
+        BOT_API_URL = config.get("bot_api_url")
+        WEBHOOK = config.get("webhook", {})
 except FileNotFoundError:
     logger.error("File config.json tidak ditemukan")
     raise FileNotFoundError("File config.json harus ada di direktori bot")
@@ -51,54 +69,29 @@ except json.JSONDecodeError:
 except KeyError as e:
     logger.error(f"Key {e} tidak ditemukan di config.json")
     raise KeyError(f"Key {e} harus ada di config.json")
-    
-# Inisialisasi database
-def init_db():
-    with sqlite3.connect(DB_NAME) as conn:
-        c = conn.cursor()
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS accounts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL UNIQUE,
-                session_ticket TEXT NOT NULL,
-                payload TEXT NOT NULL,
-                device_id TEXT NOT NULL,
-                telegram_id INTEGER NOT NULL
-            )
-        """)
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS whitelist (
-                telegram_id INTEGER PRIMARY KEY,
-                name TEXT NOT NULL,
-                whitelist_time TEXT NOT NULL
-            )
-        """)
-        conn.commit()
-
-def is_whitelisted(telegram_id, conn):
-    c = conn.cursor()
-    c.execute("SELECT telegram_id FROM whitelist WHERE telegram_id = ?", (telegram_id,))
-    return c.fetchone() is not None or telegram_id == ADMIN_ID
-
-def get_user_running_count(telegram_id):
-    running_accounts = get_running_workers()
-    with sqlite3.connect(DB_NAME) as conn:
-        c = conn.cursor()
-        c.execute("SELECT name FROM accounts WHERE telegram_id = ?", (telegram_id,))
-        user_accounts = [row[0] for row in c.fetchall()]
-        return len([acc for acc in running_accounts if acc in user_accounts])
+
+async def is_whitelisted(telegram_id):
+    return telegram_id == ADMIN_ID or await db.is_whitelisted(telegram_id)
+
+def owner_filter(user_id):
+    # Admin boleh akses semua akun; user biasa hanya akun miliknya
+    return None if user_id == ADMIN_ID else user_id
+
+# Call PlayFab dari handler dijalankan di executor terbatas supaya event loop
+# Telegram tetap melayani user lain selama menunggu response.
+upstream_executor = ThreadPoolExecutor(max_workers=UPSTREAM_WORKERS, thread_name_prefix="upstream")
+
+async def run_upstream(func, *args):
+    start = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(upstream_executor, func, *args)
+    finally:
+        histogram(f"upstream_{func.__name__}").observe(time.perf_counter() - start)
 
 def generate_device_id():
     return str(uuid.uuid4()).replace("-", "")[:16]
 
 def create_bussid_account(display_name):
-    url = "https://4ae9.playfabapi.com/Client/LoginWithAndroidDeviceID"
-    headers = {
-        "User-Agent": "UnityEngine-Unity; Version: 2018.4.26f1",
-        "X-ReportErrorAsSuccess": "true",
-        "X-PlayFabSDK": "UnitySDK-2.20.170411",
-        "Content-Type": "application/json"
-    }
     device_id = generate_device_id()
     payload = {
         "AndroidDeviceId": device_id,
@@ -111,90 +104,130 @@ def create_bussid_account(display_name):
         "InfoRequestParameters": None
     }
     
-    try:
-        response = requests.post(url, headers=headers, data=json.dumps(payload), timeout=5)
-        logger.info(f"Create account response: {response.status_code}")
-        if response.status_code == 200:
-            data = response.json()
-            if data.get("code") == 200:
-                return data["data"]["SessionTicket"], payload, device_id, ""
-            return "", "", "", f"Error: {data.get('errorMessage', 'Unknown error')}"
-        return "", "", "", f"HTTP Error: {response.status_code}"
-    except Exception as e:
-        logger.error(f"Create account error: {str(e)}")
-        return "", "", "", f"Error: {str(e)}"
+    data, error = PlayFabClient(interactive=True).login_android(payload)
+    if data is None:
+        logger.error(f"Create account error: {error}")
+        return "", "", "", error
+    if data.get("code") == 200:
+        return data["data"]["SessionTicket"], payload, device_id, ""
+    return "", "", "", f"Error: {data.get('errorMessage', 'Unknown error')}"
 
 def update_display_name(session_ticket, display_name):
-    url = "https://4ae9.playfabapi.com/Client/UpdateUserTitleDisplayName"
-    headers = {
-        "User-Agent": "UnityEngine-Unity; Version: 2018.4.26f1",
-        "X-ReportErrorAsSuccess": "true",
-        "X-PlayFabSDK": "UnitySDK-2.20.170411",
-        "X-Authorization": session_ticket,
-        "Content-Type": "application/json"
-    }
-    payload = {"DisplayName": display_name}
-    
-    try:
-        response = requests.post(url, headers=headers, data=json.dumps(payload), timeout=5)
-        logger.info(f"Update display name response: {response.status_code}")
-        if response.status_code == 200:
-            data = response.json()
-            if data.get("code") == 200:
-                return True, ""
-            return False, f"Error: {data.get('errorMessage', 'Unknown error')}"
-        return False, f"HTTP Error: {response.status_code}"
-    except Exception as e:
-        logger.error(f"Update display name error: {str(e)}")
-        return False, f"Error: {str(e)}"
+    data, error = PlayFabClient(session_ticket, interactive=True).update_display_name(display_name)
+    if data is None:
+        logger.error(f"Update display name error: {error}")
+        return False, error
+    if data.get("code") == 200:
+        return True, ""
+    return False, f"Error: {data.get('errorMessage', 'Unknown error')}"
+
+def create_named_account(display_name):
+    # Buat akun lalu ganti nama BUSSID-nya, satu task di upstream_executor
+    session_ticket, payload, device_id, error = create_bussid_account(display_name)
+    if not session_ticket:
+        return None, error
+    success, error = update_display_name(session_ticket, display_name)
+    if not success:
+        return None, error
+    return (session_ticket, json.dumps(payload), device_id), ""
 
 def get_player_info(session_ticket):
-    url = "https://4ae9.playfabapi.com/Client/GetPlayerCombinedInfo"
-    headers = {
-        "User-Agent": "UnityEngine-Unity; Version: 2018.4.26f1",
-        "X-ReportErrorAsSuccess": "true",
-        "X-PlayFabSDK": "UnitySDK-2.20.170411",
-        "X-Authorization": session_ticket,
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "PlayFabId": None,
-        "InfoRequestParameters": {
-            "GetUserAccountInfo": True,
-            "GetUserInventory": True,
-            "GetUserVirtualCurrency": True,
-            "GetUserData": False,
-            "GetUserReadOnlyData": True,
-            "GetCharacterList": False,
-            "GetTitleData": True,
-            "GetPlayerStatistics": False
-        }
-    }
-    
+    data, error = PlayFabClient(session_ticket, interactive=True).get_combined_info()
+    if data is None:
+        logger.error(f"Get player info error: {error}")
+        return None, error, session_ticket
+    if data.get("code") != 200:
+        return None, f"Error: {data.get('errorMessage', 'Unknown error')}", session_ticket
     try:
-        response = requests.post(url, headers=headers, data=json.dumps(payload), timeout=5)
-        logger.info(f"Get player info response: {response.status_code}")
-        if response.status_code == 200:
-            data = response.json()
-            if data.get("code") == 200:
-                info = data["data"]["InfoResultPayload"]
-                account_info = info["AccountInfo"]
-                virtual_currency = info.get("UserVirtualCurrency", {})
-                return {
-                    "PlayFabId": account_info["PlayFabId"],
-                    "DisplayName": account_info["TitleInfo"]["DisplayName"],
-                    "Origination": account_info["TitleInfo"]["Origination"],
-                    "Created": account_info["TitleInfo"]["Created"],
-                    "LastLogin": account_info["TitleInfo"]["LastLogin"],
-                    "FirstLogin": account_info["TitleInfo"]["FirstLogin"],
-                    "UserVirtualCurrency": virtual_currency
-                }, "", session_ticket
-            return None, f"Error: {data.get('errorMessage', 'Unknown error')}", session_ticket
-        return None, f"HTTP Error: {response.status_code}", session_ticket
-    except Exception as e:
+        info = data["data"]["InfoResultPayload"]
+        account_info = info["AccountInfo"]
+        virtual_currency = info.get("UserVirtualCurrency", {})
+        return {
+            "PlayFabId": account_info["PlayFabId"],
+            "DisplayName": account_info["TitleInfo"]["DisplayName"],
+            "Origination": account_info["TitleInfo"]["Origination"],
+            "Created": account_info["TitleInfo"]["Created"],
+            "LastLogin": account_info["TitleInfo"]["LastLogin"],
+            "FirstLogin": account_info["TitleInfo"]["FirstLogin"],
+            "UserVirtualCurrency": virtual_currency
+        }, "", session_ticket
+    except (KeyError, TypeError) as e:
         logger.error(f"Get player info error: {str(e)}")
         return None, f"Error: {str(e)}", session_ticket
 
+# Cache hasil GetPlayerCombinedInfo per akun. Entry yang lebih tua dari TTL tetap
+# langsung dipakai sementara satu refresh jalan di background (single-flight per
+# akun); "🔄 Refresh" selalu ambil ulang. Hanya diakses dari event loop bot.
+class PlayerInfoCache:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.entries = {}  # {account_name: (info, fetched_at)}
+        self.inflight = {}  # {account_name: Task}
+        # Naik setiap put/invalidate; hasil fetch yang mulai sebelumnya dibuang
+        self.generations = {}  # {account_name: int}
+        self.hits = 0
+        self.stale = 0
+        self.misses = 0
+
+    async def get(self, account_name, session_ticket, refresh=False):
+        # Return (info, error)
+        entry = self.entries.get(account_name)
+        if entry is not None and not refresh and self.ttl > 0:
+            info, fetched_at = entry
+            if time.monotonic() - fetched_at < self.ttl:
+                self.hits += 1
+            else:
+                self.stale += 1
+                self._fetch(account_name, session_ticket)
+            return info, ""
+        self.misses += 1
+        return await asyncio.shield(self._fetch(account_name, session_ticket))
+
+    def put(self, account_name, info):
+        self.generations[account_name] = self.generations.get(account_name, 0) + 1
+        self.entries[account_name] = (info, time.monotonic())
+
+    def invalidate(self, account_name):
+        self.generations[account_name] = self.generations.get(account_name, 0) + 1
+        self.entries.pop(account_name, None)
+        # Fetch yang sedang jalan tetap selesai untuk pemanggilnya, tapi get
+        # berikutnya tidak menunggunya dan hasilnya tidak masuk cache
+        self.inflight.pop(account_name, None)
+
+    def _fetch(self, account_name, session_ticket):
+        task = self.inflight.get(account_name)
+        if task is None:
+            task = self.inflight[account_name] = asyncio.get_running_loop().create_task(
+                self._load(account_name, session_ticket, self.generations.get(account_name, 0)))
+        return task
+
+    async def _load(self, account_name, session_ticket, generation):
+        try:
+            info, error, _ = await run_upstream(get_player_info, session_ticket)
+        except Exception as e:
+            logger.error(f"Get player info error: {str(e)}")
+            info, error = None, f"Error: {str(e)}"
+        finally:
+            if self.inflight.get(account_name) is asyncio.current_task():
+                self.inflight.pop(account_name)
+        if info and self.generations.get(account_name, 0) == generation:
+            self.put(account_name, info)
+        return info, error
+
+    def stats(self):
+        total = self.hits + self.stale + self.misses
+        return {
+            "hits": self.hits,
+            "stale": self.stale,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.stale) / total if total else 0.0
+        }
+
+player_info_cache = PlayerInfoCache(PLAYER_INFO_TTL)
+register_gauge("player_info_cache_hits", lambda: player_info_cache.hits)
+register_gauge("player_info_cache_stale", lambda: player_info_cache.stale)
+register_gauge("player_info_cache_misses", lambda: player_info_cache.misses)
+
 def generate_account_file(session_ticket, payload, display_name):
     safe_name = re.sub(r'[<>:"/\\|?*]', '_', display_name)
     filename = f"bussid_{safe_name}.txt"
@@ -212,24 +245,184 @@ def generate_account_file(session_ticket, payload, display_name):
         logger.error(f"Generate file error: {str(e)}")
         return None, f"Error: {str(e)}"
 
-async def show_main_menu(update, context, chat_id):
-    keyboard = [
-        ["➕ Add Account", "🆕 Create Account"],
-        ["🗑 Delete Account", "📋 List Accounts"],
-        ["💰 Add Money"]
+def format_rate(rate):
+    # Rate tak terhingga = belum pernah kena 429
+    return "tanpa batas" if rate == float("inf") else f"{rate:.1f} req/s"
+
+def format_latency_summary():
+    lines = ["⏱ Latency (p50 / p99):"]
+    for name in sorted(n for n in histograms if n.startswith(("handler_", "upstream_"))):
+        snap = histograms[name].snapshot()
+        lines.append(f"- {name}: {snap['p50'] * 1000:.0f} / {snap['p99'] * 1000:.0f} ms ({snap['count']}x)")
+    return "\n".join(lines)
+
+def format_worker_metrics():
+    totals = worker_counters.snapshot()
+    running = get_running_workers()
+    lines = [
+        f"📈 Metrics worker ({len(running)} running)",
+        f"Mission: {totals['missions_created']} | Fare OK: {totals['fare_ok']} | Fare gagal: {totals['fare_failed']}",
+        f"Fuel reset: {totals['fuel_resets']} | 429: {totals['throttled_429']} | 401: {totals['unauthorized_401']} | Backoff: {totals['error_backoffs']}",
+        "",
+        "⏱ CloudScript (p50 / p99):"
     ]
-    if update.effective_user.id == ADMIN_ID:
-        keyboard.append(["🔐 Admin Menu"])
-    
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    for name in sorted(n for n in histograms if n.startswith("cloudscript_")):
+        snap = histograms[name].snapshot()
+        lines.append(f"- {name[len('cloudscript_'):]}: {snap['p50'] * 1000:.0f} / {snap['p99'] * 1000:.0f} ms ({snap['count']}x)")
+    if running:
+        per_minute = get_missions_per_minute()
+        lines += ["", "Per akun (fare OK / gagal / 429, mission/menit):"]
+        for name in running:
+            counts = worker_counters.snapshot(name)
+            lines.append(f"- {name}: {counts['fare_ok']} / {counts['fare_failed']} / {counts['throttled_429']}, {per_minute.get(name, 0)}/menit")
+    return "\n".join(lines)
+
+async def format_running_accounts(title, accounts):
+    # Mode cluster: tampilkan node yang menjalankan tiap akun
+    nodes = await worker_nodes()
+    if not nodes:
+        return title
+    return "\n".join([title] + [f"- {acc} ({nodes.get(acc, 'menunggu node')})" for acc in accounts])
+
+def bulk_account_names(pattern, count):
+    # "akun{n}" -> akun1..akunN; tanpa {n} nomor ditambahkan di belakang
+    if "{n}" not in pattern:
+        pattern += "{n}"
+    return [pattern.replace("{n}", str(i)) for i in range(1, count + 1)]
+
+async def bulk_create_accounts(names, owner):
+    # Login + ganti nama jalan paralel (dibatasi semaphore supaya upstream_executor
+    # tetap ada sisa untuk user lain), lalu semua akun yang berhasil disimpan dalam
+    # satu transaksi. Return [(nama, error)], error "" kalau berhasil.
+    semaphore = asyncio.Semaphore(BULK_CREATE.get("concurrency", 4))
+
+    async def create(name):
+        async with semaphore:
+            return await run_upstream(create_named_account, name)
+
+    errors = {}
+    pending = []
+    for name in names:
+        if await db.account_exists(name):
+            errors[name] = "Nama sudah ada"
+        else:
+            pending.append(name)
+    rows = []
+    for name, (account, error) in zip(pending, await asyncio.gather(*(create(name) for name in pending))):
+        if account is None:
+            errors[name] = error
+        else:
+            rows.append((name, *account, owner))
+    added = set(await db.add_accounts(rows))
+    for row in rows:
+        if row[0] not in added:
+            errors[row[0]] = "Nama sudah ada"
+    return [(name, errors.get(name, "")) for name in names]
+
+# Batas teks sendMessage Telegram: 4096 karakter, dihitung dalam unit UTF-16
+MAX_MESSAGE_LENGTH = 4096
+
+def _message_length(text):
+    return len(text.encode("utf-16-le")) // 2
+
+def split_message(lines, limit=MAX_MESSAGE_LENGTH):
+    # Gabungkan baris jadi beberapa pesan yang masing-masing muat dalam limit
+    chunks, current, size = [], [], 0
+    for line in lines:
+        if _message_length(line) > limit:
+            line = line[:limit // 2]
+        length = _message_length(line)
+        if current and size + 1 + length > limit:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        size += length + (1 if current else 0)
+        current.append(line)
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+# Kirim dari task background: tidak ada handler yang menangkap error, jadi
+# kegagalan (chat diblokir, jaringan) cukup dicatat
+async def send_logged(bot, chat_id, text):
+    try:
+        await bot.send_message(chat_id=chat_id, text=text)
+        return True
+    except Exception as e:
+        logger.error(f"Gagal kirim pesan ke {chat_id}: {str(e)}")
+        return False
+
+async def run_bulk_create(bot, chat_id, user_id, names):
+    try:
+        results = await bulk_create_accounts(names, user_id)
+    except Exception as e:
+        logger.error(f"Bulk create error: {str(e)}")
+        await send_logged(bot, chat_id, f"⚠ Bulk create gagal: {str(e)}")
+        return
+    created = sum(1 for _, error in results if not error)
+    logger.info(f"User {user_id} bulk created {created}/{len(results)} accounts")
+    lines = [f"📦 Bulk create selesai: {created}/{len(results)} akun dibuat"]
+    for name, error in results:
+        lines.append(f"✅ {name}" if not error else f"⚠ {name}: {error[:60]}")
+    for text in split_message(lines):
+        await send_logged(bot, chat_id, text)
+
+# Referensi task background supaya tidak di-garbage-collect sebelum selesai
+background_tasks = set()
+
+def spawn(coro):
+    task = asyncio.get_running_loop().create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+# Keyboard statis dibuat sekali saat import dan dipakai bersama semua update
+BACK_KEYBOARD = ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True)
+MAIN_MENU_ROWS = [
+    ["➕ Add Account", "🆕 Create Account"],
+    ["🗑 Delete Account", "📋 List Accounts"],
+    ["💰 Add Money", "📦 Bulk Create"]
+]
+MAIN_KEYBOARD = ReplyKeyboardMarkup(MAIN_MENU_ROWS, resize_keyboard=True)
+ADMIN_MAIN_KEYBOARD = ReplyKeyboardMarkup(MAIN_MENU_ROWS + [["🔐 Admin Menu"]], resize_keyboard=True)
+ADMIN_MENU_KEYBOARD = ReplyKeyboardMarkup([
+    ["✅ Whitelist User", "❌ Unwhitelist User"],
+    ["📜 List Whitelist", "📊 List Running", "📈 Metrics"],
+    ["⬅ Kembali"]
+], resize_keyboard=True)
+ACCOUNT_INFO_KEYBOARD = ReplyKeyboardMarkup(
+    [["🔄 Change Name BUSSID", "📄 File Txt"], ["🔄 Refresh"], ["⬅ Kembali"]], resize_keyboard=True)
+MONEY_CONTROL_KEYBOARD = ReplyKeyboardMarkup([["▶ Start", "⏹ Stop"], ["⬅ Kembali"]], resize_keyboard=True)
+RUNNING_CONTROL_KEYBOARD = ReplyKeyboardMarkup([["⏹ Stop"], ["⬅ Kembali"]], resize_keyboard=True)
+
+def list_keyboard(names):
+    return ReplyKeyboardMarkup([[name] for name in names] + [["⬅ Kembali"]], resize_keyboard=True)
+
+async def show_main_menu(update, context, chat_id):
+    reply_markup = ADMIN_MAIN_KEYBOARD if update.effective_user.id == ADMIN_ID else MAIN_KEYBOARD
     await context.bot.send_message(chat_id=chat_id, text="🎮 Selamat datang di BUSSID Bot! Pilih menu:", reply_markup=reply_markup)
 
+# Update dari user yang sama tetap diproses berurutan (state percakapan ada di
+# user_data); user berbeda jalan paralel lewat concurrent_updates
+user_locks = {}
+
+def per_user(func):
+    @functools.wraps(func)
+    async def wrapper(update, context):
+        user_id = update.effective_user.id
+        lock = user_locks.get(user_id)
+        if lock is None:
+            lock = user_locks[user_id] = asyncio.Lock()
+        async with lock:
+            return await func(update, context)
+    return wrapper
+
+@timed("handler_start")
+@per_user
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    with sqlite3.connect(DB_NAME) as conn:
-        if not is_whitelisted(user_id, conn):
-            await update.message.reply_text("🚫 Maaf, kamu tidak diizinkan menggunakan bot ini.", reply_markup=ReplyKeyboardRemove())
-            return
+    if not await is_whitelisted(user_id):
+        await update.message.reply_text("🚫 Maaf, kamu tidak diizinkan menggunakan bot ini.", reply_markup=ReplyKeyboardRemove())
+        return
     context.user_data.clear()
     await show_main_menu(update, context, update.effective_chat.id)
 
@@ -237,27 +430,22 @@ async def show_account_info(update, context, account_name, session_ticket, paylo
     user_id = update.effective_user.id
     info = None
     error = ""
-    
+
     if refresh:
         logger.info(f"Refreshing account: {account_name}")
-        info, error, new_session_ticket = get_player_info(session_ticket)
+        info, error = await player_info_cache.get(account_name, session_ticket, refresh=True)
         if info:
-            with sqlite3.connect(DB_NAME) as conn:
-                c = conn.cursor()
-                query = "UPDATE accounts SET session_ticket = ? WHERE name = ? AND telegram_id = ?" if user_id != ADMIN_ID else "UPDATE accounts SET session_ticket = ? WHERE name = ?"
-                c.execute(query, (new_session_ticket, account_name, user_id) if user_id != ADMIN_ID else (new_session_ticket, account_name))
-                conn.commit()
-            session_ticket = new_session_ticket
+            await db.update_session_ticket(account_name, session_ticket, owner_filter(user_id))
         else:
             logger.error(f"Refresh failed for {account_name}: {error}")
-            await update.message.reply_text(f"⚠ Gagal refresh: {error}", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
+            await update.message.reply_text(f"⚠ Gagal refresh: {error}", reply_markup=BACK_KEYBOARD)
             return
     else:
-        info, error, _ = get_player_info(session_ticket)
-    
+        info, error = await player_info_cache.get(account_name, session_ticket)
+
     payload_formatted = json.dumps(json.loads(payload), indent=2)
     message = ""
-    
+
     if info:
         vc = json.dumps(info["UserVirtualCurrency"]) if info["UserVirtualCurrency"] else "{}"
         message += (
@@ -270,633 +458,652 @@ async def show_account_info(update, context, account_name, session_ticket, paylo
         )
     else:
         message += f"⚠ Gagal ambil info akun: {error}\n\n"
-    
+
     message += (
         "📋 Payload:\n"
         f"```\n{payload_formatted}\n```\n"
         "🔑 Auth:\n"
         f"```\n{session_ticket}\n```"
     )
-    
-    keyboard = [["🔄 Change Name BUSSID", "📄 File Txt"], ["🔄 Refresh"], ["⬅ Kembali"]]
-    await update.message.reply_text(message, parse_mode="Markdown", reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True))
 
+    await update.message.reply_text(message, parse_mode="Markdown", reply_markup=ACCOUNT_INFO_KEYBOARD)
+
+# Layar daftar yang dipakai dari beberapa menu dan dari tombol "⬅ Kembali"
+async def show_account_list(update, context, state, title):
+    context.user_data["state"] = state
+    context.user_data["prev"] = ""
+    accounts = await db.list_account_names(owner_filter(update.effective_user.id))
+    if not accounts:
+        await update.message.reply_text("📭 Tidak ada akun yang tersimpan.", reply_markup=BACK_KEYBOARD)
+        return
+    await update.message.reply_text(title, reply_markup=list_keyboard(accounts))
+
+async def show_whitelist_list(update, context, state, title):
+    context.user_data["state"] = state
+    context.user_data["prev"] = "admin_menu"
+    users = await db.list_whitelist_names()
+    if not users:
+        await update.message.reply_text("📭 Tidak ada user di-whitelist.", reply_markup=BACK_KEYBOARD)
+        return
+    await update.message.reply_text(title, reply_markup=list_keyboard(users))
+
+async def show_running_accounts(update, context, telegram_id, user_name):
+    context.user_data["state"] = "list_running_accounts"
+    context.user_data["prev"] = "list_running_users"
+    running_user_accounts = await running_workers(telegram_id)
+    if not running_user_accounts:
+        await update.message.reply_text(
+            f"📭 Tidak ada akun running untuk user '{user_name}'.",
+            reply_markup=BACK_KEYBOARD
+        )
+        return
+    await update.message.reply_text(
+        await format_running_accounts(f"📊 Akun running untuk user '{user_name}':", running_user_accounts),
+        reply_markup=list_keyboard(running_user_accounts)
+    )
+
+async def show_list_accounts(update, context):
+    await show_account_list(update, context, "list_accounts", "📋 Pilih akun untuk detail:")
+
+async def show_add_money_accounts(update, context):
+    await show_account_list(update, context, "add_money_select", "💰 Pilih akun untuk Add Money:")
+
+async def show_delete_accounts(update, context):
+    await show_account_list(update, context, "delete_account", "🗑 Pilih akun untuk dihapus:")
+
+async def show_running_users(update, context):
+    await show_whitelist_list(update, context, "list_running_users", "📊 Pilih user untuk lihat akun running:")
+
+async def show_admin_menu(update, context):
+    context.user_data["state"] = "admin_menu"
+    context.user_data["prev"] = ""
+    await update.message.reply_text("🔐 Admin Menu:", reply_markup=ADMIN_MENU_KEYBOARD)
+
+async def back_to_main_menu(update, context):
+    context.user_data.clear()
+    await show_main_menu(update, context, update.effective_chat.id)
+
+async def prompt(update, context, state, prev, text):
+    context.user_data["state"] = state
+    context.user_data["prev"] = prev
+    await update.message.reply_text(text, reply_markup=BACK_KEYBOARD)
+
+# Main menu
+async def menu_add_account(update, context):
+    await prompt(update, context, "add_account_name", "", "📝 Masukkan nama akun untuk daftar akun:")
+
+async def menu_create_account(update, context):
+    await prompt(update, context, "create_account_list_name", "", "📝 Masukkan nama akun untuk daftar akun:")
+
+async def menu_bulk_create(update, context):
+    await prompt(update, context, "bulk_create_count", "", f"🔢 Mau buat berapa akun? (1-{BULK_CREATE.get('max_count', 50)})")
+
+async def menu_admin(update, context):
+    if update.effective_user.id == ADMIN_ID:
+        await show_admin_menu(update, context)
+    else:
+        await update.message.reply_text("🚫 Hanya admin yang bisa akses.", reply_markup=BACK_KEYBOARD)
+
+# Admin menu
+async def admin_whitelist_user(update, context):
+    await prompt(update, context, "whitelist_id", "admin_menu", "🆔 Masukkan Telegram ID:")
+
+async def admin_unwhitelist_user(update, context):
+    await show_whitelist_list(update, context, "unwhitelist", "❌ Pilih user untuk di-unwhitelist:")
+
+async def admin_list_whitelist(update, context):
+    await show_whitelist_list(update, context, "list_whitelist", "📜 Pilih user untuk detail:")
+
+async def admin_list_running(update, context):
+    pool = get_http_pool_stats()
+    limiter = get_rate_limiter_stats()
+    info_cache = player_info_cache.stats()
+    await update.message.reply_text(
+        f"🔌 HTTP pool ({pool['max_connections']} koneksi): "
+        f"hit {pool['hits']} / miss {pool['misses']}, "
+        f"wait avg {pool['wait_avg_ms']:.1f} ms / max {pool['wait_max_ms']:.1f} ms\n"
+        f"🚦 Rate limit: {format_rate(limiter['rate'])}, antre {limiter['queued']}, "
+        f"429 {limiter['throttles']}x, pause {limiter['paused_for']:.1f} s "
+        f"(handler: antre {limiter['interactive']['queued']}, 429 {limiter['interactive']['throttles']}x)\n"
+        f"🗂 Cache info akun: hit {info_cache['hits']} / basi {info_cache['stale']} / miss {info_cache['misses']} "
+        f"({info_cache['hit_rate'] * 100:.0f}%)\n"
+        f"{format_latency_summary()}"
+    )
+    await show_running_users(update, context)
+
+async def admin_metrics(update, context):
+    await update.message.reply_text(format_worker_metrics())
+
+# State handler: dipanggil dengan teks pesan saat user_data["state"] cocok
+async def on_admin_menu(update, context, text):
+    action = ADMIN_MENU_ACTIONS.get(text)
+    if action:
+        await action(update, context)
+
+async def on_list_accounts(update, context, text):
+    result = await db.get_account(text, owner_filter(update.effective_user.id))
+    if result:
+        account_name, session_ticket, payload = result["name"], result["session_ticket"], result["payload"]
+        context.user_data["current_account"] = account_name
+        context.user_data["state"] = "account_info"
+        context.user_data["prev"] = "list_accounts"
+        await show_account_info(update, context, account_name, session_ticket, payload)
+    else:
+        await update.message.reply_text("🚫 Akun tidak ditemukan atau bukan milikmu.", reply_markup=BACK_KEYBOARD)
+
+async def on_account_info(update, context, text):
+    account_name = context.user_data.get("current_account")
+    result = await db.get_account(account_name, owner_filter(update.effective_user.id))
+    if not result:
+        await update.message.reply_text("🚫 Akun tidak ditemukan atau bukan milikmu.", reply_markup=BACK_KEYBOARD)
+        return
+    session_ticket, payload = result["session_ticket"], result["payload"]
+    if text == "🔄 Change Name BUSSID":
+        await prompt(update, context, "change_bussid_name", "list_accounts", "📛 Masukkan nama BUSSID baru:")
+    elif text == "📄 File Txt":
+        filename, error = generate_account_file(session_ticket, payload, account_name)
+        if filename:
+            with open(filename, "rb") as f:
+                await update.message.reply_document(document=f, filename=filename)
+            os.remove(filename)
+            await update.message.reply_text("✅ File dikirim.", reply_markup=BACK_KEYBOARD)
+        else:
+            await update.message.reply_text(f"⚠ Gagal membuat file: {error}", reply_markup=BACK_KEYBOARD)
+    elif text == "🔄 Refresh":
+        await show_account_info(update, context, account_name, session_ticket, payload, refresh=True)
+
+async def on_delete_account(update, context, text):
+    user_id = update.effective_user.id
+    if await db.delete_account(text, owner_filter(user_id)):
+        player_info_cache.invalidate(text)
+        await stop_worker(text)  # Stop worker jika akun dihapus
+        await update.message.reply_text(f"✅ Akun '{text}' dihapus.", reply_markup=BACK_KEYBOARD)
+        logger.info(f"User {user_id} deleted account: {text}")
+    else:
+        await update.message.reply_text("🚫 Akun tidak ditemukan atau bukan milikmu.", reply_markup=BACK_KEYBOARD)
+    await back_to_main_menu(update, context)
+
+async def on_add_account_name(update, context, text):
+    if not text:
+        await update.message.reply_text("📝 Nama akun tidak boleh kosong:", reply_markup=BACK_KEYBOARD)
+        return
+    context.user_data["add_name"] = text
+    context.user_data["state"] = "add_account_auth"
+    await update.message.reply_text("🔑 Masukkan X-Authorization:", reply_markup=BACK_KEYBOARD)
+
+async def on_add_account_auth(update, context, text):
+    user_id = update.effective_user.id
+    if not text:
+        await update.message.reply_text("🔑 SessionTicket tidak boleh kosong:", reply_markup=BACK_KEYBOARD)
+        return
+    session_ticket = text
+    display_name = context.user_data.get("add_name", "")
+
+    info, error = (await run_upstream(get_player_info, session_ticket))[:2]
+    if not info:
+        await update.message.reply_text(f"⚠ Gagal validasi: {error}", reply_markup=BACK_KEYBOARD)
+        await back_to_main_menu(update, context)
+        return
+
+    if await db.account_exists(display_name):
+        await update.message.reply_text(f"🚫 Nama '{display_name}' sudah ada.", reply_markup=BACK_KEYBOARD)
+        return
+
+    payload = {
+        "AndroidDeviceId": "manual",
+        "OS": "Android",
+        "AndroidDevice": "AndroidPhone",
+        "CreateAccount": True,
+        "TitleId": "4AE9",
+        "EncryptedRequest": None,
+        "PlayerSecret": None,
+        "InfoRequestParameters": None
+    }
+    await db.add_account(display_name, session_ticket, json.dumps(payload), "manual", user_id)
+    player_info_cache.put(display_name, info)
+
+    await update.message.reply_text(f"✅ Akun '{display_name}' ditambahkan.", reply_markup=BACK_KEYBOARD)
+    logger.info(f"User {user_id} added account: {display_name}")
+    await back_to_main_menu(update, context)
+
+async def on_create_account_list_name(update, context, text):
+    if not text:
+        await update.message.reply_text("📝 Nama akun tidak boleh kosong:", reply_markup=BACK_KEYBOARD)
+        return
+    context.user_data["list_name"] = text
+    context.user_data["state"] = "create_account_bussid_name"
+    await update.message.reply_text("📛 Masukkan nama BUSSID:", reply_markup=BACK_KEYBOARD)
+
+async def on_create_account_bussid_name(update, context, text):
+    user_id = update.effective_user.id
+    if not text:
+        await update.message.reply_text("📛 Nama BUSSID tidak boleh kosong:", reply_markup=BACK_KEYBOARD)
+        return
+    list_name = context.user_data.get("list_name", "")
+    bussid_name = text
+    await update.message.reply_text("⏳ Membuat akun BUSSID...")
+
+    session_ticket, payload, device_id, error = await run_upstream(create_bussid_account, bussid_name)
+    if not session_ticket:
+        await update.message.reply_text(f"⚠ Gagal membuat akun: {error}", reply_markup=BACK_KEYBOARD)
+        await back_to_main_menu(update, context)
+        return
+
+    await update.message.reply_text(
+        f"📋 Payload:\n"
+        f"```\n{json.dumps(payload, indent=2)}\n```\n"
+        f"🔑 Auth:\n"
+        f"```\n{session_ticket}\n```",
+        parse_mode="Markdown"
+    )
+    await update.message.reply_text("📝 Mengganti nama BUSSID...")
+
+    success, error = await run_upstream(update_display_name, session_ticket, bussid_name)
+    if not success:
+        await update.message.reply_text(f"⚠ Gagal ganti nama: {error}", reply_markup=BACK_KEYBOARD)
+        await back_to_main_menu(update, context)
+        return
+
+    if await db.account_exists(list_name):
+        await update.message.reply_text(f"🚫 Nama '{list_name}' sudah ada.", reply_markup=BACK_KEYBOARD)
+        await back_to_main_menu(update, context)
+        return
+
+    await db.add_account(list_name, session_ticket, json.dumps(payload), device_id, user_id)
+
+    await update.message.reply_text(f"✅ Akun '{list_name}' (BUSSID: {bussid_name}) dibuat.", reply_markup=BACK_KEYBOARD)
+    logger.info(f"User {user_id} created account: {list_name}")
+    await back_to_main_menu(update, context)
+
+async def on_bulk_create_count(update, context, text):
+    max_count = BULK_CREATE.get("max_count", 50)
+    try:
+        count = int(text)
+    except ValueError:
+        count = 0
+    if not 1 <= count <= max_count:
+        await update.message.reply_text(f"🔢 Jumlah harus angka 1-{max_count}:", reply_markup=BACK_KEYBOARD)
+        return
+    context.user_data["bulk_count"] = count
+    context.user_data["state"] = "bulk_create_pattern"
+    await update.message.reply_text(
+        "📝 Masukkan pola nama, {n} diganti nomor urut (contoh: akun{n} -> akun1, akun2, ...). "
+        "Nama ini dipakai untuk daftar akun dan nama BUSSID:",
+        reply_markup=BACK_KEYBOARD
+    )
+
+async def on_bulk_create_pattern(update, context, text):
+    if not text:
+        await update.message.reply_text("📝 Pola nama tidak boleh kosong:", reply_markup=BACK_KEYBOARD)
+        return
+    names = bulk_account_names(text, context.user_data.get("bulk_count", 1))
+    await update.message.reply_text(f"⏳ Membuat {len(names)} akun ({names[0]} ... {names[-1]}). Hasilnya dikirim setelah selesai.")
+    # Jalan di background supaya update lain tetap diproses selama pembuatan
+    spawn(run_bulk_create(context.bot, update.effective_chat.id, update.effective_user.id, names))
+    await back_to_main_menu(update, context)
+
+async def on_change_bussid_name(update, context, text):
+    if not text:
+        await update.message.reply_text("📛 Nama BUSSID tidak boleh kosong:", reply_markup=BACK_KEYBOARD)
+        return
+    account_name = context.user_data.get("current_account", "")
+    result = await db.get_account(account_name, owner_filter(update.effective_user.id))
+    if result:
+        session_ticket = result["session_ticket"]
+        success, error = await run_upstream(update_display_name, session_ticket, text)
+        if success:
+            player_info_cache.invalidate(account_name)
+            await update.message.reply_text(f"✅ Nama BUSSID untuk '{account_name}' diubah jadi '{text}'.", reply_markup=BACK_KEYBOARD)
+        else:
+            await update.message.reply_text(f"⚠ Gagal ganti nama: {error}", reply_markup=BACK_KEYBOARD)
+    else:
+        await update.message.reply_text("🚫 Akun tidak ditemukan atau bukan milikmu.", reply_markup=BACK_KEYBOARD)
+    await back_to_main_menu(update, context)
+
+async def on_add_money_select(update, context, text):
+    result = await db.get_account(text, owner_filter(update.effective_user.id))
+    if result:
+        account_name, session_ticket = result["name"], result["session_ticket"]
+        context.user_data["current_account"] = account_name
+        context.user_data["session_ticket"] = session_ticket
+        context.user_data["account_owner"] = result["telegram_id"]
+        context.user_data["login_payload"] = relogin_payload(result["payload"], result["device_id"])
+        context.user_data["state"] = "add_money_control"
+        context.user_data["prev"] = "add_money_select"
+        status = "🟢 Sedang Berjalan" if await is_running(account_name) else "🔴 Stop"
+        message = (
+            f"💰 Kontrol Add Money untuk '{account_name}':\n"
+            f"Status: {status}"
+        )
+        await update.message.reply_text(message, reply_markup=MONEY_CONTROL_KEYBOARD)
+    else:
+        await update.message.reply_text("🚫 Akun tidak ditemukan atau bukan milikmu.", reply_markup=BACK_KEYBOARD)
+
+async def on_add_money_control(update, context, text):
+    user_id = update.effective_user.id
+    account_name = context.user_data.get("current_account", "")
+    session_ticket = context.user_data.get("session_ticket", "")
+    owner = context.user_data.get("account_owner", user_id)
+    if text == "▶ Start":
+        limit = None if user_id == ADMIN_ID else MAX_RUNNING_PER_USER  # Cek limit untuk non-admin
+        if await start_worker(account_name, session_ticket, owner, limit, context.user_data.get("login_payload")):
+            await update.message.reply_text(f"✅ Add Money untuk '{account_name}' dimulai.", reply_markup=MONEY_CONTROL_KEYBOARD)
+            logger.info(f"User {user_id} started Add Money: {account_name}")
+        elif await is_running(account_name):
+            await update.message.reply_text(f"⚠ Add Money untuk '{account_name}' sudah berjalan.", reply_markup=MONEY_CONTROL_KEYBOARD)
+        else:
+            await update.message.reply_text(
+                f"⚠ Kamu sudah menjalankan {MAX_RUNNING_PER_USER} akun. Stop salah satu dulu!",
+                reply_markup=MONEY_CONTROL_KEYBOARD
+            )
+    elif text == "⏹ Stop":
+        if await stop_worker(account_name):
+            await update.message.reply_text(f"✅ Add Money untuk '{account_name}' dihentikan.", reply_markup=MONEY_CONTROL_KEYBOARD)
+            logger.info(f"User {user_id} stopped Add Money: {account_name}")
+        else:
+            await update.message.reply_text(f"⚠ Add Money untuk '{account_name}' tidak berjalan.", reply_markup=MONEY_CONTROL_KEYBOARD)
+
+async def on_list_running_users(update, context, text):
+    result = await db.get_whitelist_by_name(text)
+    if result:
+        telegram_id = result["telegram_id"]
+        context.user_data["selected_user_id"] = telegram_id
+        context.user_data["selected_user_name"] = text
+        await show_running_accounts(update, context, telegram_id, text)
+    else:
+        await update.message.reply_text("🚫 User tidak ditemukan.", reply_markup=BACK_KEYBOARD)
+
+async def on_list_running_accounts(update, context, text):
+    if await is_running(text):
+        context.user_data["current_account"] = text
+        context.user_data["state"] = "running_control"
+        context.user_data["prev"] = "list_running_accounts"
+        await update.message.reply_text(f"📽 Kontrol running untuk '{text}':", reply_markup=RUNNING_CONTROL_KEYBOARD)
+    else:
+        await update.message.reply_text("🚫 Akun tidak valid atau tidak running.", reply_markup=BACK_KEYBOARD)
+
+async def on_running_control(update, context, text):
+    if text != "⏹ Stop":
+        return
+    account_name = context.user_data.get("current_account", "")
+    if await stop_worker(account_name):
+        await update.message.reply_text(f"✅ Add Money untuk '{account_name}' dihentikan.", reply_markup=BACK_KEYBOARD)
+        logger.info(f"Admin {update.effective_user.id} stopped Add Money: {account_name}")
+    else:
+        await update.message.reply_text(f"⚠ Add Money untuk '{account_name}' tidak berjalan.", reply_markup=BACK_KEYBOARD)
+    await show_running_accounts(
+        update, context, context.user_data.get("selected_user_id", 0), context.user_data.get("selected_user_name", ""))
+
+async def on_whitelist_id(update, context, text):
+    try:
+        telegram_id = int(text)
+    except ValueError:
+        await update.message.reply_text("🆔 ID harus angka:", reply_markup=BACK_KEYBOARD)
+        return
+    context.user_data["whitelist_id"] = telegram_id
+    context.user_data["state"] = "whitelist_name"
+    await update.message.reply_text("📛 Masukkan nama user:", reply_markup=BACK_KEYBOARD)
+
+async def on_whitelist_name(update, context, text):
+    if not text:
+        await update.message.reply_text("📛 Nama tidak boleh kosong:", reply_markup=BACK_KEYBOARD)
+        return
+    telegram_id = context.user_data.get("whitelist_id", 0)
+
+    if await db.is_whitelisted(telegram_id):
+        await update.message.reply_text(f"🚫 User ID {telegram_id} sudah di-whitelist.", reply_markup=BACK_KEYBOARD)
+        await back_to_main_menu(update, context)
+        return
+
+    whitelist_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    await db.add_whitelist(telegram_id, text, whitelist_time)
+
+    await update.message.reply_text(f"✅ User '{text}' (ID: {telegram_id}) di-whitelist pada {whitelist_time}.", reply_markup=BACK_KEYBOARD)
+    logger.info(f"Admin {update.effective_user.id} whitelisted user: {telegram_id}")
+    await back_to_main_menu(update, context)
+
+async def on_unwhitelist(update, context, text):
+    result = await db.get_whitelist_by_name(text)
+    if result:
+        telegram_id = result["telegram_id"]
+        await db.remove_whitelist(telegram_id)
+        await update.message.reply_text(f"✅ User '{text}' di-unwhitelist.", reply_markup=BACK_KEYBOARD)
+        logger.info(f"Admin {update.effective_user.id} unwhitelisted user: {telegram_id}")
+    else:
+        await update.message.reply_text("⚠ User tidak ditemukan.", reply_markup=BACK_KEYBOARD)
+    await back_to_main_menu(update, context)
+
+async def on_list_whitelist(update, context, text):
+    result = await db.get_whitelist_by_name(text)
+    if result:
+        telegram_id, whitelist_time = result["telegram_id"], result["whitelist_time"]
+        message = (
+            f"ℹ️ Info Whitelist:\n"
+            f"```\n"
+            f"Nama: {text}\n"
+            f"Telegram ID: {telegram_id}\n"
+            f"Waktu Whitelist: {whitelist_time}\n"
+            f"```"
+        )
+        await update.message.reply_text(message, parse_mode="Markdown", reply_markup=BACK_KEYBOARD)
+    else:
+        await update.message.reply_text("⚠ User tidak ditemukan.", reply_markup=BACK_KEYBOARD)
+    await back_to_main_menu(update, context)
+
+# Registry dispatch. State baru cukup ditambah di sini; lookup per update tetap
+# satu dict.get berapa pun jumlah state-nya.
+MAIN_MENU_ACTIONS = {
+    "➕ Add Account": menu_add_account,
+    "🆕 Create Account": menu_create_account,
+    "🗑 Delete Account": show_delete_accounts,
+    "📋 List Accounts": show_list_accounts,
+    "💰 Add Money": show_add_money_accounts,
+    "📦 Bulk Create": menu_bulk_create,
+    "🔐 Admin Menu": menu_admin,
+}
+
+ADMIN_MENU_ACTIONS = {
+    "✅ Whitelist User": admin_whitelist_user,
+    "❌ Unwhitelist User": admin_unwhitelist_user,
+    "📜 List Whitelist": admin_list_whitelist,
+    "📊 List Running": admin_list_running,
+    "📈 Metrics": admin_metrics,
+}
+
+# "⬅ Kembali": layar tujuan berdasarkan user_data["prev"]
+BACK_ACTIONS = {
+    "": back_to_main_menu,
+    "list_accounts": show_list_accounts,
+    "add_money_select": show_add_money_accounts,
+    "add_money_control": show_add_money_accounts,
+    "admin_menu": show_admin_menu,
+    "list_running_users": show_admin_menu,
+    "list_running_accounts": show_running_users,
+}
+
+STATE_HANDLERS = {
+    "admin_menu": on_admin_menu,
+    "list_accounts": on_list_accounts,
+    "account_info": on_account_info,
+    "delete_account": on_delete_account,
+    "add_account_name": on_add_account_name,
+    "add_account_auth": on_add_account_auth,
+    "create_account_list_name": on_create_account_list_name,
+    "create_account_bussid_name": on_create_account_bussid_name,
+    "bulk_create_count": on_bulk_create_count,
+    "bulk_create_pattern": on_bulk_create_pattern,
+    "change_bussid_name": on_change_bussid_name,
+    "add_money_select": on_add_money_select,
+    "add_money_control": on_add_money_control,
+    "list_running_users": on_list_running_users,
+    "list_running_accounts": on_list_running_accounts,
+    "running_control": on_running_control,
+    "whitelist_id": on_whitelist_id,
+    "whitelist_name": on_whitelist_name,
+    "unwhitelist": on_unwhitelist,
+    "list_whitelist": on_list_whitelist,
+}
+
+@timed("handler_message")
+@per_user
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    chat_id = update.effective_chat.id
     text = update.message.text.strip()
     state = context.user_data.get("state", "")
-    
-    with sqlite3.connect(DB_NAME) as conn:
-        if not is_whitelisted(user_id, conn):
-            await update.message.reply_text("🚫 Maaf, kamu tidak diizinkan menggunakan bot ini.", reply_markup=ReplyKeyboardRemove())
-            return
-        
-        c = conn.cursor()
-        
-        # Main menu
-        if not state:
-            if text == "➕ Add Account":
-                context.user_data["state"] = "add_account_name"
-                context.user_data["prev"] = ""
-                await update.message.reply_text("📝 Masukkan nama akun untuk daftar akun:", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-            elif text == "🆕 Create Account":
-                context.user_data["state"] = "create_account_list_name"
-                context.user_data["prev"] = ""
-                await update.message.reply_text("📝 Masukkan nama akun untuk daftar akun:", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-            elif text == "🗑 Delete Account":
-                context.user_data["state"] = "delete_account"
-                context.user_data["prev"] = ""
-                query = "SELECT name FROM accounts WHERE telegram_id = ?" if user_id != ADMIN_ID else "SELECT name FROM accounts"
-                c.execute(query, (user_id,) if user_id != ADMIN_ID else ())
-                accounts = c.fetchall()
-                if not accounts:
-                    await update.message.reply_text("📭 Tidak ada akun yang tersimpan.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                    return
-                keyboard = [[name[0]] for name in accounts] + [["⬅ Kembali"]]
-                await update.message.reply_text("🗑 Pilih akun untuk dihapus:", reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True))
-            elif text == "📋 List Accounts":
-                context.user_data["state"] = "list_accounts"
-                context.user_data["prev"] = ""
-                query = "SELECT name FROM accounts WHERE telegram_id = ?" if user_id != ADMIN_ID else "SELECT name FROM accounts"
-                c.execute(query, (user_id,) if user_id != ADMIN_ID else ())
-                accounts = c.fetchall()
-                if not accounts:
-                    await update.message.reply_text("📭 Tidak ada akun yang tersimpan.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                    return
-                keyboard = [[name[0]] for name in accounts] + [["⬅ Kembali"]]
-                await update.message.reply_text("📋 Pilih akun untuk detail:", reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True))
-            elif text == "💰 Add Money":
-                context.user_data["state"] = "add_money_select"
-                context.user_data["prev"] = ""
-                query = "SELECT name FROM accounts WHERE telegram_id = ?" if user_id != ADMIN_ID else "SELECT name FROM accounts"
-                c.execute(query, (user_id,) if user_id != ADMIN_ID else ())
-                accounts = c.fetchall()
-                if not accounts:
-                    await update.message.reply_text("📭 Tidak ada akun yang tersimpan.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                    return
-                keyboard = [[name[0]] for name in accounts] + [["⬅ Kembali"]]
-                await update.message.reply_text("💰 Pilih akun untuk Add Money:", reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True))
-            elif text == "🔐 Admin Menu" and user_id == ADMIN_ID:
-                context.user_data["state"] = "admin_menu"
-                context.user_data["prev"] = ""
-                keyboard = [
-                    ["✅ Whitelist User", "❌ Unwhitelist User"],
-                    ["📜 List Whitelist", "📊 List Running"],
-                    ["⬅ Kembali"]
-                ]
-                await update.message.reply_text("🔐 Admin Menu:", reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True))
-            elif text == "🔐 Admin Menu":
-                await update.message.reply_text("🚫 Hanya admin yang bisa akses.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-            return
-        
-        # Back navigation
-        if text == "⬅ Kembali":
-            prev = context.user_data.get("prev", "")
-            if prev == "":
-                context.user_data.clear()
-                await show_main_menu(update, context, chat_id)
-            elif prev == "list_accounts":
-                context.user_data["state"] = "list_accounts"
-                context.user_data["prev"] = ""
-                query = "SELECT name FROM accounts WHERE telegram_id = ?" if user_id != ADMIN_ID else "SELECT name FROM accounts"
-                c.execute(query, (user_id,) if user_id != ADMIN_ID else ())
-                accounts = c.fetchall()
-                if not accounts:
-                    await update.message.reply_text("📭 Tidak ada akun yang tersimpan.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                    return
-                keyboard = [[name[0]] for name in accounts] + [["⬅ Kembali"]]
-                await update.message.reply_text("📋 Pilih akun untuk detail:", reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True))
-            elif prev == "add_money_select":
-                context.user_data["state"] = "add_money_select"
-                context.user_data["prev"] = ""
-                query = "SELECT name FROM accounts WHERE telegram_id = ?" if user_id != ADMIN_ID else "SELECT name FROM accounts"
-                c.execute(query, (user_id,) if user_id != ADMIN_ID else ())
-                accounts = c.fetchall()
-                if not accounts:
-                    await update.message.reply_text("📭 Tidak ada akun yang tersimpan.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                    return
-                keyboard = [[name[0]] for name in accounts] + [["⬅ Kembali"]]
-                await update.message.reply_text("💰 Pilih akun untuk Add Money:", reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True))
-            elif prev == "add_money_control":
-                context.user_data["state"] = "add_money_select"
-                context.user_data["prev"] = ""
-                query = "SELECT name FROM accounts WHERE telegram_id = ?" if user_id != ADMIN_ID else "SELECT name FROM accounts"
-                c.execute(query, (user_id,) if user_id != ADMIN_ID else ())
-                accounts = c.fetchall()
-                if not accounts:
-                    await update.message.reply_text("📭 Tidak ada akun yang tersimpan.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                    return
-                keyboard = [[name[0]] for name in accounts] + [["⬅ Kembali"]]
-                await update.message.reply_text("💰 Pilih akun untuk Add Money:", reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True))
-            elif prev == "admin_menu":
-                context.user_data["state"] = "admin_menu"
-                context.user_data["prev"] = ""
-                keyboard = [
-                    ["✅ Whitelist User", "❌ Unwhitelist User"],
-                    ["📜 List Whitelist", "📊 List Running"],
-                    ["⬅ Kembali"]
-                ]
-                await update.message.reply_text("🔐 Admin Menu:", reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True))
-            elif prev == "list_running_users":
-                context.user_data["state"] = "admin_menu"
-                context.user_data["prev"] = ""
-                keyboard = [
-                    ["✅ Whitelist User", "❌ Unwhitelist User"],
-                    ["📜 List Whitelist", "📊 List Running"],
-                    ["⬅ Kembali"]
-                ]
-                await update.message.reply_text("🔐 Admin Menu:", reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True))
-            elif prev == "list_running_accounts":
-                context.user_data["state"] = "list_running_users"
-                context.user_data["prev"] = "admin_menu"
-                c.execute("SELECT name FROM whitelist")
-                users = c.fetchall()
-                if not users:
-                    await update.message.reply_text("📭 Tidak ada user di-whitelist.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                    return
-                keyboard = [[name[0]] for name in users] + [["⬅ Kembali"]]
-                await update.message.reply_text("📊 Pilih user untuk lihat akun running:", reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True))
-            return
-        
-        # Admin menu
-        if state == "admin_menu":
-            if text == "✅ Whitelist User":
-                context.user_data["state"] = "whitelist_id"
-                context.user_data["prev"] = "admin_menu"
-                await update.message.reply_text("🆔 Masukkan Telegram ID:", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-            elif text == "❌ Unwhitelist User":
-                context.user_data["state"] = "unwhitelist"
-                context.user_data["prev"] = "admin_menu"
-                c.execute("SELECT name FROM whitelist")
-                users = c.fetchall()
-                if not users:
-                    await update.message.reply_text("📭 Tidak ada user di-whitelist.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                    return
-                keyboard = [[name[0]] for name in users] + [["⬅ Kembali"]]
-                await update.message.reply_text("❌ Pilih user untuk di-unwhitelist:", reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True))
-            elif text == "📜 List Whitelist":
-                context.user_data["state"] = "list_whitelist"
-                context.user_data["prev"] = "admin_menu"
-                c.execute("SELECT name FROM whitelist")
-                users = c.fetchall()
-                if not users:
-                    await update.message.reply_text("📭 Tidak ada user di-whitelist.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                    return
-                keyboard = [[name[0]] for name in users] + [["⬅ Kembali"]]
-                await update.message.reply_text("📜 Pilih user untuk detail:", reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True))
-            elif text == "📊 List Running":
-                context.user_data["state"] = "list_running_users"
-                context.user_data["prev"] = "admin_menu"
-                c.execute("SELECT name FROM whitelist")
-                users = c.fetchall()
-                if not users:
-                    await update.message.reply_text("📭 Tidak ada user di-whitelist.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                    return
-                keyboard = [[name[0]] for name in users] + [["⬅ Kembali"]]
-                await update.message.reply_text("📊 Pilih user untuk lihat akun running:", reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True))
-            return
-        
-        # List accounts
-        if state == "list_accounts":
-            query = "SELECT name, session_ticket, payload FROM accounts WHERE name = ? AND telegram_id = ?" if user_id != ADMIN_ID else "SELECT name, session_ticket, payload FROM accounts WHERE name = ?"
-            c.execute(query, (text, user_id) if user_id != ADMIN_ID else (text,))
-            result = c.fetchone()
-            if result:
-                account_name, session_ticket, payload = result
-                context.user_data["current_account"] = account_name
-                context.user_data["state"] = "account_info"
-                context.user_data["prev"] = "list_accounts"
-                await show_account_info(update, context, account_name, session_ticket, payload)
-            else:
-                await update.message.reply_text("🚫 Akun tidak ditemukan atau bukan milikmu.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-            return
-        
-        # Account info options
-        if state == "account_info":
-            account_name = context.user_data.get("current_account")
-            query = "SELECT session_ticket, payload FROM accounts WHERE name = ? AND telegram_id = ?" if user_id != ADMIN_ID else "SELECT session_ticket, payload FROM accounts WHERE name = ?"
-            c.execute(query, (account_name, user_id) if user_id != ADMIN_ID else (account_name,))
-            result = c.fetchone()
-            if result:
-                session_ticket, payload = result
-                if text == "🔄 Change Name BUSSID":
-                    context.user_data["state"] = "change_bussid_name"
-                    context.user_data["prev"] = "list_accounts"
-                    await update.message.reply_text("📛 Masukkan nama BUSSID baru:", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                elif text == "📄 File Txt":
-                    filename, error = generate_account_file(session_ticket, payload, account_name)
-                    if filename:
-                        with open(filename, "rb") as f:
-                            await update.message.reply_document(document=f, filename=filename)
-                        os.remove(filename)
-                        await update.message.reply_text("✅ File dikirim.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                    else:
-                        await update.message.reply_text(f"⚠ Gagal membuat file: {error}", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                elif text == "🔄 Refresh":
-                    await show_account_info(update, context, account_name, session_ticket, payload, refresh=True)
-            else:
-                await update.message.reply_text("🚫 Akun tidak ditemukan atau bukan milikmu.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-            return
-        
-        # Delete account
-        if state == "delete_account":
-            query = "DELETE FROM accounts WHERE name = ? AND telegram_id = ?" if user_id != ADMIN_ID else "DELETE FROM accounts WHERE name = ?"
-            c.execute(query, (text, user_id) if user_id != ADMIN_ID else (text,))
-            if c.rowcount > 0:
-                conn.commit()
-                stop_money_worker(text)  # Stop worker jika akun dihapus
-                await update.message.reply_text(f"✅ Akun '{text}' dihapus.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                logger.info(f"User {user_id} deleted account: {text}")
-            else:
-                await update.message.reply_text("🚫 Akun tidak ditemukan atau bukan milikmu.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-            context.user_data.clear()
-            await show_main_menu(update, context, chat_id)
-            return
-        
-        # Add account
-        if state == "add_account_name":
-            if not text:
-                await update.message.reply_text("📝 Nama akun tidak boleh kosong:", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                return
-            context.user_data["add_name"] = text
-            context.user_data["state"] = "add_account_auth"
-            await update.message.reply_text("🔑 Masukkan X-Authorization:", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-        
-        elif state == "add_account_auth":
-            if not text:
-                await update.message.reply_text("🔑 SessionTicket tidak boleh kosong:", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                return
-            session_ticket = text
-            display_name = context.user_data.get("add_name", "")
-            
-            info, error = get_player_info(session_ticket)[:2]
-            if not info:
-                await update.message.reply_text(f"⚠ Gagal validasi: {error}", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                context.user_data.clear()
-                await show_main_menu(update, context, chat_id)
-                return
-            
-            c.execute("SELECT name FROM accounts WHERE name = ?", (display_name,))
-            if c.fetchone():
-                await update.message.reply_text(f"🚫 Nama '{display_name}' sudah ada.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                return
-            
-            payload = {
-                "AndroidDeviceId": "manual",
-                "OS": "Android",
-                "AndroidDevice": "AndroidPhone",
-                "CreateAccount": True,
-                "TitleId": "4AE9",
-                "EncryptedRequest": None,
-                "PlayerSecret": None,
-                "InfoRequestParameters": None
-            }
-            c.execute(
-                "INSERT INTO accounts (name, session_ticket, payload, device_id, telegram_id) VALUES (?, ?, ?, ?, ?)",
-                (display_name, session_ticket, json.dumps(payload), "manual", user_id)
-            )
-            conn.commit()
-            
-            await update.message.reply_text(f"✅ Akun '{display_name}' ditambahkan.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-            logger.info(f"User {user_id} added account: {display_name}")
-            context.user_data.clear()
-            await show_main_menu(update, context, chat_id)
-        
-        # Create account
-        if state == "create_account_list_name":
-            if not text:
-                await update.message.reply_text("📝 Nama akun tidak boleh kosong:", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                return
-            context.user_data["list_name"] = text
-            context.user_data["state"] = "create_account_bussid_name"
-            await update.message.reply_text("📛 Masukkan nama BUSSID:", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-        
-        elif state == "create_account_bussid_name":
-            if not text:
-                await update.message.reply_text("📛 Nama BUSSID tidak boleh kosong:", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                return
-            list_name = context.user_data.get("list_name", "")
-            bussid_name = text
-            await update.message.reply_text("⏳ Membuat akun BUSSID...")
-            
-            session_ticket, payload, device_id, error = create_bussid_account(bussid_name)
-            if not session_ticket:
-                await update.message.reply_text(f"⚠ Gagal membuat akun: {error}", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                context.user_data.clear()
-                await show_main_menu(update, context, chat_id)
-                return
-            
-            await update.message.reply_text(
-                f"📋 Payload:\n"
-                f"```\n{json.dumps(payload, indent=2)}\n```\n"
-                f"🔑 Auth:\n"
-                f"```\n{session_ticket}\n```",
-                parse_mode="Markdown"
-            )
-            await update.message.reply_text("📝 Mengganti nama BUSSID...")
-            
-            success, error = update_display_name(session_ticket, bussid_name)
-            if not success:
-                await update.message.reply_text(f"⚠ Gagal ganti nama: {error}", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                context.user_data.clear()
-                await show_main_menu(update, context, chat_id)
-                return
-            
-            c.execute("SELECT name FROM accounts WHERE name = ?", (list_name,))
-            if c.fetchone():
-                await update.message.reply_text(f"🚫 Nama '{list_name}' sudah ada.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                context.user_data.clear()
-                await show_main_menu(update, context, chat_id)
-                return
-            
-            c.execute(
-                "INSERT INTO accounts (name, session_ticket, payload, device_id, telegram_id) VALUES (?, ?, ?, ?, ?)",
-                (list_name, session_ticket, json.dumps(payload), device_id, user_id)
-            )
-            conn.commit()
-            
-            await update.message.reply_text(f"✅ Akun '{list_name}' (BUSSID: {bussid_name}) dibuat.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-            logger.info(f"User {user_id} created account: {list_name}")
-            context.user_data.clear()
-            await show_main_menu(update, context, chat_id)
-        
-        # Change BUSSID name
-        if state == "change_bussid_name":
-            if not text:
-                await update.message.reply_text("📛 Nama BUSSID tidak boleh kosong:", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                return
-            account_name = context.user_data.get("current_account", "")
-            query = "SELECT session_ticket FROM accounts WHERE name = ? AND telegram_id = ?" if user_id != ADMIN_ID else "SELECT session_ticket FROM accounts WHERE name = ?"
-            c.execute(query, (account_name, user_id) if user_id != ADMIN_ID else (account_name,))
-            result = c.fetchone()
-            if result:
-                session_ticket = result[0]
-                success, error = update_display_name(session_ticket, text)
-                if success:
-                    await update.message.reply_text(f"✅ Nama BUSSID untuk '{account_name}' diubah jadi '{text}'.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                else:
-                    await update.message.reply_text(f"⚠ Gagal ganti nama: {error}", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-            else:
-                await update.message.reply_text("🚫 Akun tidak ditemukan atau bukan milikmu.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-            context.user_data.clear()
-            await show_main_menu(update, context, chat_id)
-        
-        # Add Money select account
-        elif state == "add_money_select":
-            query = "SELECT name, session_ticket FROM accounts WHERE name = ? AND telegram_id = ?" if user_id != ADMIN_ID else "SELECT name, session_ticket FROM accounts WHERE name = ?"
-            c.execute(query, (text, user_id) if user_id != ADMIN_ID else (text,))
-            result = c.fetchone()
-            if result:
-                account_name, session_ticket = result
-                context.user_data["current_account"] = account_name
-                context.user_data["session_ticket"] = session_ticket
-                context.user_data["state"] = "add_money_control"
-                context.user_data["prev"] = "add_money_select"
-                status = "🟢 Sedang Berjalan" if is_worker_running(account_name) else "🔴 Stop"
-                message = (
-                    f"💰 Kontrol Add Money untuk '{account_name}':\n"
-                    f"Status: {status}"
-                )
-                keyboard = [["▶ Start", "⏹ Stop"], ["⬅ Kembali"]]
-                await update.message.reply_text(message, reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True))
-            else:
-                await update.message.reply_text("🚫 Akun tidak ditemukan atau bukan milikmu.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-            return
-        
-        # Add Money control
-        elif state == "add_money_control":
-            account_name = context.user_data.get("current_account", "")
-            session_ticket = context.user_data.get("session_ticket", "")
-            if text == "▶ Start":
-                if user_id != ADMIN_ID:  # Cek limit untuk non-admin
-                    running_count = get_user_running_count(user_id)
-                    if running_count >= MAX_RUNNING_PER_USER:
-                        await update.message.reply_text(
-                            f"⚠ Kamu sudah menjalankan {MAX_RUNNING_PER_USER} akun. Stop salah satu dulu!",
-                            reply_markup=ReplyKeyboardMarkup([["▶ Start", "⏹ Stop"], ["⬅ Kembali"]], resize_keyboard=True)
-                        )
-                        return
-                if start_money_worker(account_name, session_ticket):
-                    await update.message.reply_text(
-                        f"✅ Add Money untuk '{account_name}' dimulai.",
-                        reply_markup=ReplyKeyboardMarkup([["▶ Start", "⏹ Stop"], ["⬅ Kembali"]], resize_keyboard=True)
-                    )
-                    logger.info(f"User {user_id} started Add Money: {account_name}")
-                else:
-                    await update.message.reply_text(
-                        f"⚠ Add Money untuk '{account_name}' sudah berjalan.",
-                        reply_markup=ReplyKeyboardMarkup([["▶ Start", "⏹ Stop"], ["⬅ Kembali"]], resize_keyboard=True)
-                    )
-            elif text == "⏹ Stop":
-                if stop_money_worker(account_name):
-                    await update.message.reply_text(
-                        f"✅ Add Money untuk '{account_name}' dihentikan.",
-                        reply_markup=ReplyKeyboardMarkup([["▶ Start", "⏹ Stop"], ["⬅ Kembali"]], resize_keyboard=True)
-                    )
-                    logger.info(f"User {user_id} stopped Add Money: {account_name}")
-                else:
-                    await update.message.reply_text(
-                        f"⚠ Add Money untuk '{account_name}' tidak berjalan.",
-                        reply_markup=ReplyKeyboardMarkup([["▶ Start", "⏹ Stop"], ["⬅ Kembali"]], resize_keyboard=True)
-                    )
-            return
-        
-        # List running users
-        if state == "list_running_users":
-            c.execute("SELECT telegram_id FROM whitelist WHERE name = ?", (text,))
-            result = c.fetchone()
-            if result:
-                telegram_id = result[0]
-                context.user_data["selected_user_id"] = telegram_id
-                context.user_data["selected_user_name"] = text
-                context.user_data["state"] = "list_running_accounts"
-                context.user_data["prev"] = "list_running_users"
-                
-                # Ambil akun running milik user ini
-                running_accounts = get_running_workers()
-                c.execute("SELECT name FROM accounts WHERE telegram_id = ?", (telegram_id,))
-                user_accounts = [row[0] for row in c.fetchall()]
-                running_user_accounts = [acc for acc in running_accounts if acc in user_accounts]
-                
-                if not running_user_accounts:
-                    await update.message.reply_text(
-                        f"📭 Tidak ada akun running untuk user '{text}'.",
-                        reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True)
-                    )
-                    return
-                
-                keyboard = [[acc] for acc in running_user_accounts] + [["⬅ Kembali"]]
-                await update.message.reply_text(
-                    f"📊 Akun running untuk user '{text}':",
-                    reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-                )
-            else:
-                await update.message.reply_text(
-                    "🚫 User tidak ditemukan.",
-                    reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True)
-                )
-            return
-        
-        # List running accounts
-        if state == "list_running_accounts":
-            running_accounts = get_running_workers()
-            if text in running_accounts:
-                context.user_data["current_account"] = text
-                context.user_data["state"] = "running_control"
-                context.user_data["prev"] = "list_running_accounts"
-                await update.message.reply_text(
-                    f"📽 Kontrol running untuk '{text}':",
-                    reply_markup=ReplyKeyboardMarkup([["⏹ Stop"], ["⬅ Kembali"]], resize_keyboard=True)
-                )
-            else:
-                await update.message.reply_text(
-                    "🚫 Akun tidak valid atau tidak running.",
-                    reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True)
-                )
-            return
-        
-        # Running control
-        if state == "running_control":
-            account_name = context.user_data.get("current_account", "")
-            if text == "⏹ Stop":
-                if stop_money_worker(account_name):
-                    await update.message.reply_text(
-                        f"✅ Add Money untuk '{account_name}' dihentikan.",
-                        reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True)
-                    )
-                    logger.info(f"Admin {user_id} stopped Add Money: {account_name}")
-                else:
-                    await update.message.reply_text(
-                        f"⚠ Add Money untuk '{account_name}' tidak berjalan.",
-                        reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True)
-                    )
-                context.user_data["state"] = "list_running_accounts"
-                context.user_data["prev"] = "list_running_users"
-                telegram_id = context.user_data.get("selected_user_id", 0)
-                user_name = context.user_data.get("selected_user_name", "")
-                
-                running_accounts = get_running_workers()
-                c.execute("SELECT name FROM accounts WHERE telegram_id = ?", (telegram_id,))
-                user_accounts = [row[0] for row in c.fetchall()]
-                running_user_accounts = [acc for acc in running_accounts if acc in user_accounts]
-                
-                if not running_user_accounts:
-                    await update.message.reply_text(
-                        f"📭 Tidak ada akun running untuk user '{user_name}'.",
-                        reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True)
-                    )
-                    return
-                
-                keyboard = [[acc] for acc in running_user_accounts] + [["⬅ Kembali"]]
-                await update.message.reply_text(
-                    f"📊 Akun running untuk user '{user_name}':",
-                    reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-                )
-            return
-        
-        # Whitelist
-        if state == "whitelist_id":
-            try:
-                telegram_id = int(text)
-            except ValueError:
-                await update.message.reply_text("🆔 ID harus angka:", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                return
-            context.user_data["whitelist_id"] = telegram_id
-            context.user_data["state"] = "whitelist_name"
-            await update.message.reply_text("📛 Masukkan nama user:", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-        
-        elif state == "whitelist_name":
-            if not text:
-                await update.message.reply_text("📛 Nama tidak boleh kosong:", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                return
-            telegram_id = context.user_data.get("whitelist_id", 0)
-            
-            c.execute("SELECT telegram_id FROM whitelist WHERE telegram_id = ?", (telegram_id,))
-            if c.fetchone():
-                await update.message.reply_text(f"🚫 User ID {telegram_id} sudah di-whitelist.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                context.user_data.clear()
-                await show_main_menu(update, context, chat_id)
-                return
-            
-            whitelist_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            c.execute(
-                "INSERT INTO whitelist (telegram_id, name, whitelist_time) VALUES (?, ?, ?)",
-                (telegram_id, text, whitelist_time)
-            )
-            conn.commit()
-            
-            await update.message.reply_text(f"✅ User '{text}' (ID: {telegram_id}) di-whitelist pada {whitelist_time}.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-            logger.info(f"Admin {user_id} whitelisted user: {telegram_id}")
-            context.user_data.clear()
-            await show_main_menu(update, context, chat_id)
-        
-        # Unwhitelist
-        elif state == "unwhitelist":
-            c.execute("SELECT telegram_id FROM whitelist WHERE name = ?", (text,))
-            result = c.fetchone()
-            if result:
-                telegram_id = result[0]
-                c.execute("DELETE FROM whitelist WHERE telegram_id = ?", (telegram_id,))
-                conn.commit()
-                await update.message.reply_text(f"✅ User '{text}' di-unwhitelist.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-                logger.info(f"Admin {user_id} unwhitelisted user: {telegram_id}")
-            else:
-                await update.message.reply_text("⚠ User tidak ditemukan.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-            context.user_data.clear()
-            await show_main_menu(update, context, chat_id)
-        
-        # List whitelist
-        elif state == "list_whitelist":
-            c.execute("SELECT telegram_id, whitelist_time FROM whitelist WHERE name = ?", (text,))
-            result = c.fetchone()
-            if result:
-                telegram_id, whitelist_time = result
-                message = (
-                    f"ℹ️ Info Whitelist:\n"
-                    f"```\n"
-                    f"Nama: {text}\n"
-                    f"Telegram ID: {telegram_id}\n"
-                    f"Waktu Whitelist: {whitelist_time}\n"
-                    f"```"
-                )
-                await update.message.reply_text(message, parse_mode="Markdown", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-            else:
-                await update.message.reply_text("⚠ User tidak ditemukan.", reply_markup=ReplyKeyboardMarkup([["⬅ Kembali"]], resize_keyboard=True))
-            context.user_data.clear()
-            await show_main_menu(update, context, chat_id)
 
-async def reset_webhook(context: ContextTypes.DEFAULT_TYPE):
+    if not await is_whitelisted(user_id):
+        await update.message.reply_text("🚫 Maaf, kamu tidak diizinkan menggunakan bot ini.", reply_markup=ReplyKeyboardRemove())
+        return
+
+    # Main menu
+    if not state:
+        action = MAIN_MENU_ACTIONS.get(text)
+        if action:
+            await action(update, context)
+        return
+
+    # Back navigation
+    if text == "⬅ Kembali":
+        action = BACK_ACTIONS.get(context.user_data.get("prev", ""))
+        if action:
+            await action(update, context)
+        return
+
+    handler = STATE_HANDLERS.get(state)
+    if handler:
+        await handler(update, context, text)
+
+# Lanjutkan worker yang jalan sebelum bot restart. Start dibuat bertahap
+# (rate per detik + jitter) supaya ratusan akun tidak login dan kena 429 bersamaan.
+async def resume_workers():
+    rows = await db.list_running_workers()
+    if not rows:
+        return
+    rate = max(RESUME.get("rate", 2.0), 0.1)
+    jitter = RESUME.get("jitter", 1.0)
+    logger.info(f"Melanjutkan {len(rows)} worker ({rate}/detik)")
+    resumed = 0
+    for row in rows:
+        await asyncio.sleep(1.0 / rate + random.uniform(0, jitter))
+        login_payload = relogin_payload(row["payload"], row["device_id"])
+        if await start_local_worker(row["account"], row["session_ticket"], row["owner"], login_payload=login_payload):
+            resumed += 1
+    logger.info(f"{resumed} worker dilanjutkan")
+
+# Setup yang tidak dibutuhkan untuk membalas update pertama jalan setelah polling
+# mulai: node cluster / resume worker, exporter metrics, warm-up koneksi PlayFab.
+# Node cluster dijalankan paling dulu (tanpa heartbeat lease-nya diambil node lain
+# dan worker jalan dobel) dan setiap langkah gagal sendiri-sendiri.
+async def setup_background():
+    if CLUSTER.get("enabled"):
+        # Node cluster mengambil lease-nya sendiri; tidak perlu resume
+        spawn(run_node())
+        try:
+            serve_cluster_store(CLUSTER)
+        except Exception as e:
+            logger.error(f"Endpoint store cluster gagal start: {str(e)}")
+    elif RESUME.get("enabled", True):
+        spawn(resume_workers())
     try:
-        await context.bot.deleteWebhook(drop_pending_updates=True)
-        logger.info("Webhook deleted and pending updates dropped.")
+        start_exporter(METRICS)
     except Exception as e:
-        logger.error(f"Webhook error: {str(e)}")
+        logger.error(f"Exporter metrics gagal start: {str(e)}")
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, warm_up_http_pool, HTTP_POOL_WARMUP)
+    except Exception as e:
+        logger.error(f"Warm-up HTTP pool gagal: {str(e)}")
+    logger.info("Setup background selesai")
+
+async def start_updates(app):
+    # Webhook: Telegram POST update ke server lokal (tornado bawaan python-telegram-bot)
+    # yang mengecek secret token lalu langsung memasukkannya ke update_queue.
+    # Tanpa webhook: long polling. Keduanya membuang update yang tertunda saat start.
+    if not WEBHOOK.get("enabled"):
+        await app.updater.start_polling(allowed_updates=Update.ALL_TYPES, drop_pending_updates=True)
+        logger.info("Starting Telegram bot (polling).")
+        return
+    if not WEBHOOK.get("url"):
+        raise ValueError("webhook.url harus diisi di config.json kalau webhook aktif")
+    path = WEBHOOK.get("path", "telegram").strip("/")
+    # Tanpa secret_token di config dibuat acak tiap start (setWebhook dipanggil ulang)
+    secret_token = WEBHOOK.get("secret_token") or secrets.token_urlsafe(32)
+    await app.updater.start_webhook(
+        listen=WEBHOOK.get("listen", "127.0.0.1"),
+        port=WEBHOOK.get("port", 8443),
+        url_path=path,
+        webhook_url=f"{WEBHOOK['url'].rstrip('/')}/{path}",
+        secret_token=secret_token,
+        max_connections=WEBHOOK.get("max_connections", 40),
+        allowed_updates=Update.ALL_TYPES,
+        drop_pending_updates=True
+    )
+    logger.info(f"Starting Telegram bot (webhook {WEBHOOK['url'].rstrip('/')}/{path}).")
+
+def wait_for_stop():
+    # SIGINT/SIGTERM menghentikan bot dengan rapi; di Windows tidak ada
+    # add_signal_handler, Ctrl+C jadi KeyboardInterrupt di asyncio.run
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+    return stop.wait()
+
+def build_application():
+    # concurrent_updates: update dari chat berbeda diproses paralel, jadi call
+    # upstream yang lama milik satu user tidak menahan balasan user lain
+    builder = Application.builder().token(BOT_TOKEN).concurrent_updates(CONCURRENT_UPDATES)
+    if BOT_API_URL:
+        builder = builder.base_url(BOT_API_URL)
+    app = builder.build()
+    app.add_handler(CommandHandler("start", start))
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    return app
 
 async def main():
+    # Logging (queue + file berotasi, level dari config.json) dipasang saat bot
+    # jalan, bukan saat import, supaya import bot (benchmark) tidak membuka file log
+    setup_logging(config)
     try:
-        init_db()
-        app = Application.builder().token(BOT_TOKEN).build()
-        
-        app.add_handler(CommandHandler("start", start))
-        app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
-        
-        if app.job_queue:
-            app.job_queue.run_once(reset_webhook, 0)
-        else:
-            await reset_webhook(app)
-        
-        logger.info("Starting Telegram bot.")
-        await app.run_polling(allowed_updates=Update.ALL_TYPES)
+        # Yang dibutuhkan handler: database, engine dan pembagian worker
+        db.open_db(DB_NAME, DB_READERS)
+        set_session_listener(db.update_session_ticket_nowait)  # ticket hasil login ulang worker
+        set_engine(MONEY_ENGINE)
+        configure_http_pool(HTTP_POOL_SIZE)
+        configure_rate_limiter(
+            RATE_LIMIT.get("initial"),
+            RATE_LIMIT.get("min", 1.0),
+            RATE_LIMIT.get("max")
+        )
+        configure_pacing(
+            PACING.get("mode", "fixed"),
+            PACING.get("min_delay", 0.3),
+            PACING.get("max_delay", 10.0),
+            PACING.get("overlap_fuel_reset", False)
+        )
+        configure_shards(MONEY_SHARDS)
+        # Bot pemilik database akun, jadi selalu memakai store sqlite
+        if CLUSTER.get("enabled") and CLUSTER.get("store", "sqlite") != "sqlite":
+            raise ValueError("cluster.store di bot harus 'sqlite'; store 'http' untuk python cluster.py di host lain")
+        configure_cluster(CLUSTER)
+
+        app = build_application()
+        async with app:
+            await app.start()
+            await start_updates(app)
+            spawn(setup_background())
+            await wait_for_stop()
+            logger.info("Bot stopped by user")
+            await app.updater.stop()
+            await app.stop()
     except Exception as e:
         logger.error(f"Bot start error: {str(e)}")
         raise
 
 if __name__ == "__main__":
-    loop = asyncio.get_event_loop()
     try:
-        loop.run_until_complete(main())
+        asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
-        loop.run_until_complete(loop.shutdown_asyncgens())
-        loop.close()
\ No newline at end of file
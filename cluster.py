@@ -0,0 +1,192 @@
+import asyncio
+import functools
+import json
+import logging
+import os
+import socket
+import time
+import db
+from cluster_store import make_store, serve_store
+from money import (
+    start_money_worker, stop_money_worker, is_worker_running, get_running_workers,
+    relogin_payload, set_session_listener
+)
+
+logger = logging.getLogger(__name__)
+
+# Mode cluster: beberapa node (proses bot + proses `python cluster.py`) berbagi
+# satu store koordinasi (cluster_store.py). Akun yang harus jalan ada di tabel
+# running_workers; setiap akun dipegang tepat satu node lewat lease yang
+# diperpanjang tiap sync. Node yang mati berhenti memperpanjang lease, jadi setelah
+# LEASE_TTL akunnya diambil node lain. Start baru diberikan ke node dengan lease
+# paling sedikit.
+#
+# Store "sqlite" memakai database bot langsung (node di host yang sama). Untuk
+# node di host lain, bot membuka endpoint store (cluster.serve) dan node memakai
+# store "http" ke alamat itu. Bot tetap satu-satunya pemilik database: kalau bot
+# mati, node lain tetap menjalankan worker yang sudah dipegang tapi tidak bisa
+# memperpanjang atau mengambil lease sampai bot hidup lagi.
+LEASE_TTL = 30
+SYNC_INTERVAL = 5
+MAX_CLAIMS_PER_SYNC = 20  # ambil alih bertahap supaya tidak login bersamaan
+
+node_id = None  # None = mode cluster mati, semua worker jalan di proses ini
+store = None
+store_server = None
+
+def configure_cluster(config):
+    global node_id, store, LEASE_TTL, SYNC_INTERVAL
+    if not config.get("enabled"):
+        return
+    store = make_store(config)
+    node_id = config.get("id") or f"{socket.gethostname()}-{os.getpid()}"
+    LEASE_TTL = config.get("lease_ttl", LEASE_TTL)
+    SYNC_INTERVAL = config.get("sync_interval", SYNC_INTERVAL)
+    logger.info(f"Mode cluster aktif, node {node_id} (store {config.get('store', 'sqlite')}, lease {LEASE_TTL} detik)")
+
+# Dipanggil bot dari event loop-nya kalau cluster.serve diisi
+def serve_cluster_store(config):
+    global store_server
+    serve = config.get("serve")
+    if node_id is None or not serve:
+        return
+    store_server = serve_store(
+        store, asyncio.get_running_loop(), serve.get("host", "127.0.0.1"), serve["port"], config.get("token"))
+
+def _least_loaded(loads):
+    return min(loads, key=lambda node: (loads[node], node))
+
+async def _node_loads(now):
+    loads = await store.node_loads(now - LEASE_TTL, now)
+    loads.setdefault(node_id, len(get_running_workers()))
+    return loads
+
+# Start/stop di money.py bisa berupa round trip ke proses shard (sampai
+# SHARD_CALL_TIMEOUT kalau shard macet), jadi dijalankan di thread supaya event
+# loop bot tetap melayani update lain selama menunggu
+async def start_local_worker(name, session_ticket, owner, limit=None, login_payload=None):
+    return await asyncio.get_running_loop().run_in_executor(
+        None, functools.partial(start_money_worker, name, session_ticket, owner, limit, login_payload))
+
+async def stop_local_worker(name):
+    return await asyncio.get_running_loop().run_in_executor(None, stop_money_worker, name)
+
+# API worker untuk bot.py. Tanpa mode cluster langsung ke money.py (dan tabel
+# running_workers untuk resume); dengan mode cluster lewat tabel lease.
+async def start_worker(name, session_ticket, owner, limit=None, login_payload=None):
+    if node_id is None:
+        if not await start_local_worker(name, session_ticket, owner, limit, login_payload):
+            return False
+        await db.mark_worker_running(name, owner)
+        return True
+    now = time.time()
+    target = _least_loaded(await _node_loads(now))
+    if not await store.assign(name, owner, target, now + LEASE_TTL, limit):
+        return False
+    if target == node_id:
+        await start_local_worker(name, session_ticket, owner, login_payload=login_payload)
+    logger.info(f"Worker {name} diberikan ke node {target}")
+    return True
+
+async def stop_worker(name):
+    if node_id is None:
+        # Baris resume selalu dihapus, juga kalau worker sudah mati sendiri
+        # (shard ditandai gagal, login ulang gagal) supaya tidak di-resume lagi
+        stopped = await stop_local_worker(name)
+        removed = await db.mark_worker_stopped(name)
+        return stopped or removed
+    stopped = await store.unassign(name)
+    # Kalau jalan di node lain, node itu berhenti sendiri di sync berikutnya
+    await stop_local_worker(name)
+    return stopped
+
+async def is_running(name):
+    if node_id is None:
+        return is_worker_running(name)
+    return await store.is_assigned(name)
+
+async def running_workers(owner=None):
+    if node_id is None:
+        return get_running_workers(owner)
+    return await store.assigned(owner)
+
+async def worker_nodes():
+    # {akun: node}; kosong kalau mode cluster mati
+    if node_id is None:
+        return {}
+    return await store.worker_nodes()
+
+async def sync_node():
+    now = time.time()
+    local = set(get_running_workers())
+    await store.heartbeat(node_id, len(local), now)
+    await store.renew(node_id, now + LEASE_TTL)
+    loads = await _node_loads(now)
+    mine = set()
+    claims = 0
+    for account, owner, session_ticket, payload, device_id, node, expires_at in await store.desired_workers():
+        if node is None or expires_at < now:
+            # Lease yatim: setiap node menghitung pembagian yang sama dan hanya
+            # mengambil bagiannya sendiri
+            target = _least_loaded(loads)
+            loads[target] += 1
+            if target != node_id or claims >= MAX_CLAIMS_PER_SYNC:
+                continue
+            if not await store.claim(account, node_id, now, now + LEASE_TTL):
+                continue
+            claims += 1
+            logger.info(f"Lease {account} diambil alih oleh node {node_id}")
+        elif node != node_id:
+            continue
+        mine.add(account)
+        if account not in local:
+            await start_local_worker(account, session_ticket, owner, login_payload=relogin_payload(payload, device_id))
+    # Worker yang lease-nya hilang atau di-stop dari node lain
+    for account in local - mine:
+        await stop_local_worker(account)
+
+async def run_node():
+    while True:
+        try:
+            await sync_node()
+        except Exception as e:
+            logger.error(f"Sync node {node_id} gagal: {e}")
+        await asyncio.sleep(SYNC_INTERVAL)
+
+async def serve_node():
+    # Ticket baru dari thread worker disimpan lewat store di event loop node
+    loop = asyncio.get_running_loop()
+    set_session_listener(
+        lambda name, ticket: asyncio.run_coroutine_threadsafe(store.update_session_ticket(name, ticket), loop))
+    await run_node()
+
+# Node tambahan tanpa bot Telegram: python cluster.py
+def main():
+    from logging_setup import setup_logging
+    import money
+
+    with open("config.json", "r") as config_file:
+        config = json.load(config_file)
+    setup_logging(config)
+    cluster = dict(config.get("cluster", {}), enabled=True)
+    # Node dengan store http tidak menyentuh database bot sama sekali
+    if cluster.get("store", "sqlite") == "sqlite":
+        db.open_db(config["db_name"], config.get("db_readers", 3))
+    money.set_engine(config.get("money_engine", "thread"))
+    money.configure_http_pool(config.get("http_pool_size", 20))
+    rate_limit = config.get("rate_limit", {})
+    money.configure_rate_limiter(rate_limit.get("initial"), rate_limit.get("min", 1.0), rate_limit.get("max"))
+    pacing = config.get("pacing", {})
+    money.configure_pacing(
+        pacing.get("mode", "fixed"), pacing.get("min_delay", 0.3),
+        pacing.get("max_delay", 10.0), pacing.get("overlap_fuel_reset", False)
+    )
+    money.configure_shards(config.get("money_shards", 0))
+    configure_cluster(cluster)
+    try:
+        asyncio.run(serve_node())
+    except KeyboardInterrupt:
+        logger.info(f"Node {node_id} berhenti")
+
+if __name__ == "__main__":
+    main()
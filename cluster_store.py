@@ -0,0 +1,215 @@
+import asyncio
+import hmac
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+import db
+
+logger = logging.getLogger(__name__)
+
+# Store koordinasi untuk mode cluster: semua state lease yang dipakai cluster.py
+# lewat satu interface kecil, supaya node tidak terikat ke file SQLite bot.
+#
+#   heartbeat(node, running, now)           catat node masih hidup + jumlah worker lokal
+#   renew(node, expires_at)                 perpanjang semua lease milik node
+#   node_loads(alive_since, now)            {node: jumlah lease aktif} node yang hidup
+#   desired_workers()                       [(akun, owner, ticket, payload, device_id, node, expires_at)]
+#   claim(account, node, now, expires_at)   ambil lease yatim/kedaluwarsa; True kalau berhasil
+#   assign(name, owner, node, expires_at, limit)  daftarkan worker baru + lease-nya
+#   unassign(name)                          hapus worker dan lease-nya
+#   is_assigned(name) / assigned(owner)     status worker yang harus jalan
+#   worker_nodes()                          {akun: node}
+#   update_session_ticket(name, ticket)     simpan ticket hasil login ulang worker
+#
+# SqliteStore: database lokal bot (satu host). HttpStore: node di host lain
+# memanggil store milik proses bot lewat HTTP (lihat serve_store).
+STORE_METHODS = (
+    "heartbeat", "renew", "node_loads", "desired_workers", "claim", "assign", "unassign",
+    "is_assigned", "assigned", "worker_nodes", "update_session_ticket"
+)
+HTTP_STORE_TIMEOUT = 10
+
+NETWORK_FILESYSTEMS = {
+    "nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "afs", "ceph", "glusterfs", "lustre",
+    "fuse.sshfs", "fuse.glusterfs", "fuse.cephfs", "fuse.rclone"
+}
+
+def _filesystem_type(path):
+    # Tipe filesystem dari mount point terpanjang yang memuat path (Linux, /proc/mounts)
+    path = os.path.realpath(path)
+    mount_point, fstype = "", None
+    try:
+        with open("/proc/mounts") as mounts:
+            for line in mounts:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount = fields[1].replace("\\040", " ")
+                if (path == mount or path.startswith(mount.rstrip("/") + "/")) and len(mount) > len(mount_point):
+                    mount_point, fstype = mount, fields[2]
+    except OSError:
+        return None
+    return fstype
+
+# Lease di tabel running_workers/worker_leases/nodes database bot. Lock file dan
+# shared memory WAL SQLite tidak bekerja lewat NFS/SMB, jadi semua proses yang
+# memakai store ini harus di host yang sama dengan file database.
+class SqliteStore:
+    def __init__(self):
+        fstype = _filesystem_type(db.database.path)
+        if fstype in NETWORK_FILESYSTEMS:
+            raise ValueError(f"Store sqlite butuh database di disk lokal, {db.database.path} ada di {fstype}")
+
+    async def heartbeat(self, node, running, now):
+        await db.heartbeat_node(node, running, now)
+
+    async def renew(self, node, expires_at):
+        await db.renew_leases(node, expires_at)
+
+    async def node_loads(self, alive_since, now):
+        return await db.list_node_loads(alive_since, now)
+
+    async def desired_workers(self):
+        return [tuple(row) for row in await db.list_desired_workers()]
+
+    async def claim(self, account, node, now, expires_at):
+        return await db.claim_lease(account, node, now, expires_at)
+
+    async def assign(self, name, owner, node, expires_at, limit=None):
+        return await db.assign_worker(name, owner, node, expires_at, limit)
+
+    async def unassign(self, name):
+        return await db.unassign_worker(name)
+
+    async def is_assigned(self, name):
+        return await db.is_worker_assigned(name)
+
+    async def assigned(self, owner=None):
+        return await db.list_assigned_workers(owner)
+
+    async def worker_nodes(self):
+        return await db.list_worker_nodes()
+
+    async def update_session_ticket(self, name, session_ticket):
+        await asyncio.wrap_future(db.update_session_ticket_nowait(name, session_ticket))
+
+# Store di proses bot dipanggil lewat HTTP (POST /<method>, body {"args": [...]},
+# header Authorization: Bearer <token>). Request blocking jalan di thread sendiri.
+class HttpStore:
+    def __init__(self, url, token):
+        if not url or not token:
+            raise ValueError("Store http butuh cluster.store_url dan cluster.token")
+        self.url = url.rstrip("/")
+        self.token = token
+        self.local = threading.local()
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cluster-store")
+
+    def _session(self):
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = self.local.session = requests.Session()
+            session.headers["Authorization"] = f"Bearer {self.token}"
+        return session
+
+    def _call(self, method, args):
+        response = self._session().post(f"{self.url}/{method}", json={"args": args}, timeout=HTTP_STORE_TIMEOUT)
+        data = response.json()
+        if response.status_code != 200:
+            raise RuntimeError(f"Store {method} gagal ({response.status_code}): {data.get('error')}")
+        return data["result"]
+
+    async def _request(self, method, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._call, method, list(args))
+
+    async def heartbeat(self, node, running, now):
+        await self._request("heartbeat", node, running, now)
+
+    async def renew(self, node, expires_at):
+        await self._request("renew", node, expires_at)
+
+    async def node_loads(self, alive_since, now):
+        return await self._request("node_loads", alive_since, now)
+
+    async def desired_workers(self):
+        return [tuple(row) for row in await self._request("desired_workers")]
+
+    async def claim(self, account, node, now, expires_at):
+        return await self._request("claim", account, node, now, expires_at)
+
+    async def assign(self, name, owner, node, expires_at, limit=None):
+        return await self._request("assign", name, owner, node, expires_at, limit)
+
+    async def unassign(self, name):
+        return await self._request("unassign", name)
+
+    async def is_assigned(self, name):
+        return await self._request("is_assigned", name)
+
+    async def assigned(self, owner=None):
+        return await self._request("assigned", owner)
+
+    async def worker_nodes(self):
+        return await self._request("worker_nodes")
+
+    async def update_session_ticket(self, name, session_ticket):
+        await self._request("update_session_ticket", name, session_ticket)
+
+def make_store(config):
+    kind = config.get("store", "sqlite")
+    if kind == "sqlite":
+        return SqliteStore()
+    if kind == "http":
+        return HttpStore(config.get("store_url"), config.get("token"))
+    raise ValueError(f"Store cluster '{kind}' tidak dikenal, pilih 'sqlite' atau 'http'")
+
+# Endpoint store untuk node di host lain. Jalan di thread HTTP; setiap call
+# diteruskan ke event loop pemilik store.
+def serve_store(store, loop, host, port, token):
+    if not token:
+        raise ValueError("cluster.serve butuh cluster.token")
+    expected = f"Bearer {token}".encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b"{}"
+            if not hmac.compare_digest(self.headers.get("Authorization", "").encode(), expected):
+                self._send(403, {"error": "token salah"})
+                return
+            method = self.path.strip("/")
+            if method not in STORE_METHODS:
+                self._send(404, {"error": f"method {method} tidak ada"})
+                return
+            try:
+                args = json.loads(raw).get("args", [])
+                future = asyncio.run_coroutine_threadsafe(getattr(store, method)(*args), loop)
+                self._send(200, {"result": future.result(timeout=HTTP_STORE_TIMEOUT)})
+            except Exception as e:
+                logger.error(f"Store {method} gagal: {e}")
+                self._send(500, {"error": str(e)})
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="cluster-store", daemon=True).start()
+    logger.info(f"Store cluster tersedia untuk node lain di http://{host}:{server.server_port}")
+    return server
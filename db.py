@@ -0,0 +1,416 @@
+import asyncio
+import sqlite3
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Akses SQLite: satu koneksi writer (thread sendiri) + beberapa koneksi reader
+# (satu per thread di pool reader). Mode WAL supaya reader tidak ke-block saat
+# ada yang menulis; semua query jalan di luar event loop Telegram.
+class Database:
+    def __init__(self, path, readers=3):
+        self.path = path
+        self.writer_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        self.reader_executor = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="db-reader")
+        self.local = threading.local()
+        self.writer = None
+        self.connections = []
+        self.connections_lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        with self.connections_lock:
+            self.connections.append(conn)
+        return conn
+
+    def _reader(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = self._connect()
+        return conn
+
+    def _writer(self):
+        if self.writer is None:
+            self.writer = self._connect()
+        return self.writer
+
+    # Versi sync (dipanggil dari thread executor atau saat startup)
+    def _fetchone(self, sql, params):
+        return self._reader().execute(sql, params).fetchone()
+
+    def _fetchall(self, sql, params):
+        return self._reader().execute(sql, params).fetchall()
+
+    def _execute(self, sql, params):
+        conn = self._writer()
+        with conn:
+            return conn.execute(sql, params).rowcount
+
+    def _executemany(self, sql, seq):
+        conn = self._writer()
+        with conn:
+            return conn.executemany(sql, seq).rowcount
+
+    def _transaction(self, func, args):
+        # BEGIN IMMEDIATE: cek-lalu-tulis tetap atomik walau ada proses lain di DB yang sama
+        conn = self._writer()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = func(conn, *args)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    async def _run(self, executor, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+    async def fetchone(self, sql, params=()):
+        return await self._run(self.reader_executor, self._fetchone, sql, params)
+
+    async def fetchall(self, sql, params=()):
+        return await self._run(self.reader_executor, self._fetchall, sql, params)
+
+    async def execute(self, sql, params=()):
+        return await self._run(self.writer_executor, self._execute, sql, params)
+
+    async def executemany(self, sql, seq):
+        return await self._run(self.writer_executor, self._executemany, sql, seq)
+
+    async def transaction(self, func, *args):
+        return await self._run(self.writer_executor, self._transaction, func, args)
+
+    def close(self):
+        self.writer_executor.shutdown(wait=True)
+        self.reader_executor.shutdown(wait=True)
+        with self.connections_lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections.clear()
+
+# Cache di memori untuk cek whitelist dan daftar akun per pemilik. Dimuat sekali
+# saat open_db, lalu di-update setiap kali fungsi tulis di bawah berhasil
+# (write-through), jadi cek auth di tiap pesan cukup lookup set.
+class Cache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.whitelist = set()
+        self.account_owner = {}  # {account_name: telegram_id}, urut sesuai rowid
+        self.accounts_by_owner = {}  # {telegram_id: {account_name: None}}
+
+    def load(self, whitelist_rows, account_rows):
+        with self.lock:
+            self.whitelist = {row[0] for row in whitelist_rows}
+            self.account_owner = {}
+            self.accounts_by_owner = {}
+            for name, owner in account_rows:
+                self.account_owner[name] = owner
+                self.accounts_by_owner.setdefault(owner, {})[name] = None
+
+    def add_whitelist(self, telegram_id):
+        with self.lock:
+            self.whitelist.add(telegram_id)
+
+    def remove_whitelist(self, telegram_id):
+        with self.lock:
+            self.whitelist.discard(telegram_id)
+
+    def add_account(self, name, owner):
+        with self.lock:
+            self.account_owner[name] = owner
+            self.accounts_by_owner.setdefault(owner, {})[name] = None
+
+    def remove_account(self, name):
+        with self.lock:
+            owner = self.account_owner.pop(name, None)
+            names = self.accounts_by_owner.get(owner)
+            if names is not None:
+                names.pop(name, None)
+                if not names:
+                    del self.accounts_by_owner[owner]
+
+    def account_names(self, owner=None):
+        with self.lock:
+            if owner is None:
+                return list(self.account_owner)
+            return list(self.accounts_by_owner.get(owner, ()))
+
+    def owner_of(self, name):
+        with self.lock:
+            return self.account_owner.get(name)
+
+database = None
+cache = Cache()
+
+def open_db(path, readers=3):
+    global database
+    if database is not None:
+        database.close()
+    database = Database(path, readers)
+    init_db()
+    load_cache()
+    return database
+
+def load_cache():
+    cache.load(
+        database._fetchall("SELECT telegram_id FROM whitelist", ()),
+        database._fetchall("SELECT name, telegram_id FROM accounts ORDER BY id", ())
+    )
+
+# Migrasi schema: daftar berurutan (versi, deskripsi, statement). Versi yang
+# sudah jalan dicatat di tabel schema_version; init_db menjalankan sisanya,
+# masing-masing dalam satu transaksi. Tambah migrasi baru di akhir list.
+MIGRATIONS = [
+    (1, "tabel accounts dan whitelist", [
+        """CREATE TABLE IF NOT EXISTS accounts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            session_ticket TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            device_id TEXT NOT NULL,
+            telegram_id INTEGER NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS whitelist (
+            telegram_id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            whitelist_time TEXT NOT NULL
+        )"""
+    ]),
+    (2, "index accounts.telegram_id dan whitelist.name", [
+        "CREATE INDEX IF NOT EXISTS idx_accounts_telegram_id ON accounts (telegram_id)",
+        "CREATE INDEX IF NOT EXISTS idx_whitelist_name ON whitelist (name)"
+    ]),
+    (3, "tabel running_workers", [
+        """CREATE TABLE IF NOT EXISTS running_workers (
+            account TEXT PRIMARY KEY,
+            owner INTEGER NOT NULL,
+            started_at TEXT NOT NULL
+        )"""
+    ]),
+    (4, "tabel nodes dan worker_leases", [
+        """CREATE TABLE IF NOT EXISTS nodes (
+            node TEXT PRIMARY KEY,
+            heartbeat_at REAL NOT NULL,
+            running INTEGER NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS worker_leases (
+            account TEXT PRIMARY KEY,
+            node TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_worker_leases_node ON worker_leases (node)"
+    ])
+]
+
+def _migrate():
+    conn = database._writer()
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL, applied_at TEXT NOT NULL)")
+    current = conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        conn.execute("BEGIN")
+        try:
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute("INSERT INTO schema_version (version, applied_at) VALUES (?, datetime('now'))", (version,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            logger.error(f"Migrasi {version} ({description}) gagal")
+            raise
+        logger.info(f"Migrasi {version} selesai: {description}")
+    return conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0]
+
+# Inisialisasi database
+def init_db():
+    version = database.writer_executor.submit(_migrate).result()
+    logger.info(f"Schema database versi {version}")
+    for sql, plan in check_query_plans():
+        logger.warning(f"Query tanpa index: {sql} -> {plan}")
+
+# Query yang jalan di hampir setiap update; harus tetap pakai index walau tabel
+# accounts sudah puluhan ribu baris.
+HOT_QUERIES = [
+    ("SELECT name, session_ticket, payload, device_id, telegram_id FROM accounts WHERE name = ?", ("",)),
+    ("SELECT name, session_ticket, payload, device_id, telegram_id FROM accounts WHERE name = ? AND telegram_id = ?", ("", 0)),
+    ("SELECT name FROM accounts WHERE telegram_id = ?", (0,)),
+    ("DELETE FROM accounts WHERE name = ? AND telegram_id = ?", ("", 0)),
+    ("SELECT telegram_id, whitelist_time FROM whitelist WHERE name = ?", ("",)),
+    ("SELECT 1 FROM whitelist WHERE telegram_id = ?", (0,))
+]
+
+def check_query_plans():
+    # Return [(sql, detail)] untuk query yang masih full table scan
+    conn = database._reader()
+    slow = []
+    for sql, params in HOT_QUERIES:
+        for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall():
+            detail = row[-1]
+            if detail.startswith("SCAN") and "INDEX" not in detail:
+                slow.append((sql, detail))
+    return slow
+
+# Query akun. owner=None berarti tanpa filter pemilik (admin).
+async def list_account_names(owner=None):
+    return cache.account_names(owner)
+
+async def get_account(name, owner=None):
+    if owner is None:
+        return await database.fetchone(
+            "SELECT name, session_ticket, payload, device_id, telegram_id FROM accounts WHERE name = ?", (name,))
+    return await database.fetchone(
+        "SELECT name, session_ticket, payload, device_id, telegram_id FROM accounts WHERE name = ? AND telegram_id = ?",
+        (name, owner))
+
+async def account_exists(name):
+    return cache.owner_of(name) is not None
+
+async def add_account(name, session_ticket, payload, device_id, owner):
+    await database.execute(
+        "INSERT INTO accounts (name, session_ticket, payload, device_id, telegram_id) VALUES (?, ?, ?, ?, ?)",
+        (name, session_ticket, payload, device_id, owner))
+    cache.add_account(name, owner)
+
+def _add_accounts(conn, rows):
+    # Nama yang sudah dipakai (mis. dibuat user lain selama bulk create jalan) dilewati
+    rows = [row for row in rows if conn.execute("SELECT 1 FROM accounts WHERE name = ?", (row[0],)).fetchone() is None]
+    conn.executemany(
+        "INSERT INTO accounts (name, session_ticket, payload, device_id, telegram_id) VALUES (?, ?, ?, ?, ?)", rows)
+    return rows
+
+async def add_accounts(rows):
+    # rows: [(name, session_ticket, payload, device_id, owner)], semua dalam satu transaksi.
+    # Return nama yang benar-benar ditambahkan.
+    added = await database.transaction(_add_accounts, rows)
+    for name, _, _, _, owner in added:
+        cache.add_account(name, owner)
+    return [row[0] for row in added]
+
+async def delete_account(name, owner=None):
+    if owner is None:
+        rowcount = await database.execute("DELETE FROM accounts WHERE name = ?", (name,))
+    else:
+        rowcount = await database.execute("DELETE FROM accounts WHERE name = ? AND telegram_id = ?", (name, owner))
+    if rowcount > 0:
+        cache.remove_account(name)
+    return rowcount > 0
+
+async def update_session_ticket(name, session_ticket, owner=None):
+    if owner is None:
+        await database.execute("UPDATE accounts SET session_ticket = ? WHERE name = ?", (session_ticket, name))
+    else:
+        await database.execute(
+            "UPDATE accounts SET session_ticket = ? WHERE name = ? AND telegram_id = ?", (session_ticket, name, owner))
+
+# Worker yang sedang jalan, supaya bisa dilanjutkan setelah bot restart
+async def mark_worker_running(name, owner):
+    await database.execute(
+        "INSERT OR REPLACE INTO running_workers (account, owner, started_at) VALUES (?, ?, datetime('now'))",
+        (name, owner))
+
+async def mark_worker_stopped(name):
+    return await database.execute("DELETE FROM running_workers WHERE account = ?", (name,)) > 0
+
+async def list_running_workers():
+    # Akun yang sudah dihapus ikut terbuang lewat JOIN
+    return await database.fetchall(
+        "SELECT r.account, r.owner, a.session_ticket, a.payload, a.device_id FROM running_workers r "
+        "JOIN accounts a ON a.name = r.account ORDER BY r.started_at")
+
+# Lease worker untuk mode cluster: satu baris running_workers = akun yang harus
+# jalan, worker_leases = node mana yang menjalankannya sampai expires_at (unix time)
+async def heartbeat_node(node, running, now):
+    await database.execute(
+        "INSERT OR REPLACE INTO nodes (node, heartbeat_at, running) VALUES (?, ?, ?)", (node, now, running))
+
+async def renew_leases(node, expires_at):
+    await database.execute("UPDATE worker_leases SET expires_at = ? WHERE node = ?", (expires_at, node))
+
+async def list_node_loads(alive_since, now):
+    # {node: jumlah lease aktif} untuk node yang heartbeat-nya masih baru
+    rows = await database.fetchall(
+        "SELECT n.node, COUNT(l.account) FROM nodes n "
+        "LEFT JOIN worker_leases l ON l.node = n.node AND l.expires_at > ? "
+        "WHERE n.heartbeat_at > ? GROUP BY n.node", (now, alive_since))
+    return {row[0]: row[1] for row in rows}
+
+async def list_desired_workers():
+    return await database.fetchall(
+        "SELECT r.account, r.owner, a.session_ticket, a.payload, a.device_id, l.node, l.expires_at FROM running_workers r "
+        "JOIN accounts a ON a.name = r.account "
+        "LEFT JOIN worker_leases l ON l.account = r.account ORDER BY r.started_at")
+
+async def claim_lease(account, node, now, expires_at):
+    # Hanya berhasil kalau lease belum ada atau sudah kedaluwarsa
+    return await database.execute(
+        "INSERT INTO worker_leases (account, node, expires_at) VALUES (?, ?, ?) "
+        "ON CONFLICT(account) DO UPDATE SET node = excluded.node, expires_at = excluded.expires_at "
+        "WHERE worker_leases.expires_at < ?", (account, node, expires_at, now)) > 0
+
+def _assign_worker(conn, name, owner, node, expires_at, limit):
+    if conn.execute("SELECT 1 FROM running_workers WHERE account = ?", (name,)).fetchone():
+        return False
+    if limit is not None:
+        count = conn.execute("SELECT COUNT(*) FROM running_workers WHERE owner = ?", (owner,)).fetchone()[0]
+        if count >= limit:
+            return False
+    conn.execute("INSERT INTO running_workers (account, owner, started_at) VALUES (?, ?, datetime('now'))", (name, owner))
+    conn.execute("INSERT OR REPLACE INTO worker_leases (account, node, expires_at) VALUES (?, ?, ?)", (name, node, expires_at))
+    return True
+
+async def assign_worker(name, owner, node, expires_at, limit=None):
+    return await database.transaction(_assign_worker, name, owner, node, expires_at, limit)
+
+def _unassign_worker(conn, name):
+    conn.execute("DELETE FROM worker_leases WHERE account = ?", (name,))
+    return conn.execute("DELETE FROM running_workers WHERE account = ?", (name,)).rowcount > 0
+
+async def unassign_worker(name):
+    return await database.transaction(_unassign_worker, name)
+
+async def is_worker_assigned(name):
+    return await database.fetchone("SELECT 1 FROM running_workers WHERE account = ?", (name,)) is not None
+
+async def list_assigned_workers(owner=None):
+    if owner is None:
+        rows = await database.fetchall("SELECT account FROM running_workers ORDER BY started_at")
+    else:
+        rows = await database.fetchall(
+            "SELECT account FROM running_workers WHERE owner = ? ORDER BY started_at", (owner,))
+    return [row[0] for row in rows]
+
+async def list_worker_nodes():
+    return {row[0]: row[1] for row in await database.fetchall("SELECT account, node FROM worker_leases")}
+
+# Untuk thread worker di luar event loop: antre ke writer tanpa menunggu
+def update_session_ticket_nowait(name, session_ticket):
+    return database.writer_executor.submit(
+        database._execute, "UPDATE accounts SET session_ticket = ? WHERE name = ?", (session_ticket, name))
+
+# Query whitelist
+async def is_whitelisted(telegram_id):
+    return telegram_id in cache.whitelist
+
+async def list_whitelist_names():
+    return [row[0] for row in await database.fetchall("SELECT name FROM whitelist")]
+
+async def get_whitelist_by_name(name):
+    return await database.fetchone("SELECT telegram_id, whitelist_time FROM whitelist WHERE name = ?", (name,))
+
+async def add_whitelist(telegram_id, name, whitelist_time):
+    await database.execute(
+        "INSERT INTO whitelist (telegram_id, name, whitelist_time) VALUES (?, ?, ?)",
+        (telegram_id, name, whitelist_time))
+    cache.add_whitelist(telegram_id)
+
+async def remove_whitelist(telegram_id):
+    await database.execute("DELETE FROM whitelist WHERE telegram_id = ?", (telegram_id,))
+    cache.remove_whitelist(telegram_id)
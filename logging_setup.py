@@ -0,0 +1,81 @@
+import atexit
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+
+FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener = None
+
+# File log hasil rotasi langsung dikompres ke .gz
+def _gzip_namer(name):
+    return name + ".gz"
+
+def _gzip_rotator(source, dest):
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+def _file_handler(filename, rotate, max_bytes, backup_count, when):
+    if rotate == "time":
+        handler = logging.handlers.TimedRotatingFileHandler(filename, when=when, backupCount=backup_count, encoding="utf-8")
+    else:
+        handler = logging.handlers.RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+    handler.namer = _gzip_namer
+    handler.rotator = _gzip_rotator
+    handler.setFormatter(logging.Formatter(FORMAT))
+    return handler
+
+# Semua logger cuma menaruh record ke queue; satu thread listener yang format
+# dan menulis ke file/console, jadi worker dan event loop tidak menunggu disk.
+# Log bot ke bussid_bot.log + console, log worker money ke debug.log.
+def setup_logging(config):
+    global _listener
+    if _listener is not None:
+        return
+    level = getattr(logging, str(config.get("log_level", "INFO")).upper(), logging.INFO)
+    rotate = config.get("log_rotate", "size")
+    max_bytes = config.get("log_max_bytes", 10 * 1024 * 1024)
+    backup_count = config.get("log_backup_count", 5)
+    when = config.get("log_when", "midnight")
+
+    bot_file = _file_handler("bussid_bot.log", rotate, max_bytes, backup_count, when)
+    money_file = _file_handler("debug.log", rotate, max_bytes, backup_count, when)
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(FORMAT))
+
+    # Record money hanya ke debug.log, selain itu ke bussid_bot.log + console
+    class _NotMoney(logging.Filter):
+        def filter(self, record):
+            return not record.name.startswith("money")
+
+    class _OnlyMoney(logging.Filter):
+        def filter(self, record):
+            return record.name.startswith("money")
+
+    bot_file.addFilter(_NotMoney())
+    console.addFilter(_NotMoney())
+    money_file.addFilter(_OnlyMoney())
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+    # Library HTTP terlalu ramai di level DEBUG
+    for name in ("httpx", "urllib3", "telegram", "apscheduler"):
+        logging.getLogger(name).setLevel(max(level, logging.INFO))
+
+    _listener = logging.handlers.QueueListener(log_queue, bot_file, money_file, console, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,202 @@
+import bisect
+import functools
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Batas bucket latency (detik)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.lock = threading.Lock()
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        with self.lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def merge(self, counts, total, maximum):
+        # Tambahkan isi bucket dari histogram lain (mis. dari proses shard)
+        with self.lock:
+            for i, n in enumerate(counts):
+                self.counts[i] += n
+            self.count += sum(counts)
+            self.sum += total
+            if maximum > self.max:
+                self.max = maximum
+
+    def quantile(self, q):
+        # Perkiraan dari bucket: batas atas bucket tempat rank ke-q jatuh
+        with self.lock:
+            if not self.count:
+                return 0.0
+            rank = q * self.count
+            seen = 0
+            for i, n in enumerate(self.counts):
+                seen += n
+                if seen >= rank:
+                    return self.buckets[i] if i < len(self.buckets) else self.max
+            return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "max": self.max
+        }
+
+histograms = {}
+_registry_lock = threading.Lock()
+
+def histogram(name):
+    hist = histograms.get(name)
+    if hist is None:
+        with _registry_lock:
+            hist = histograms.setdefault(name, Histogram())
+    return hist
+
+def timed(name):
+    # Decorator untuk handler async: catat durasi tiap panggilan ke histogram `name`
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                histogram(name).observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+# Counter worker money, total dan per akun
+WORKER_COUNTERS = (
+    "missions_created", "fare_ok", "fare_failed", "fuel_resets",
+    "throttled_429", "unauthorized_401", "error_backoffs", "session_renewals"
+)
+
+class Counters:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.totals = dict.fromkeys(WORKER_COUNTERS, 0)
+        self.by_account = {}
+
+    def inc(self, name, account=None, amount=1):
+        with self.lock:
+            self.totals[name] = self.totals.get(name, 0) + amount
+            if account is not None:
+                counts = self.by_account.get(account)
+                if counts is None:
+                    counts = self.by_account[account] = dict.fromkeys(WORKER_COUNTERS, 0)
+                counts[name] = counts.get(name, 0) + amount
+
+    def snapshot(self, account=None):
+        with self.lock:
+            if account is None:
+                return dict(self.totals)
+            return dict(self.by_account.get(account, dict.fromkeys(WORKER_COUNTERS, 0)))
+
+    def accounts(self):
+        with self.lock:
+            return {account: dict(counts) for account, counts in self.by_account.items()}
+
+worker_counters = Counters()
+
+# Gauge dihitung saat export: {nama: fungsi tanpa argumen -> angka}
+gauges = {}
+
+def register_gauge(name, func):
+    gauges[name] = func
+
+# Format teks Prometheus
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+# Counter hanya ditulis per akun; total = sum() di sisi Prometheus
+def render_prometheus():
+    lines = []
+    for name in WORKER_COUNTERS:
+        metric = f"bussid_worker_{name}_total"
+        lines.append(f"# TYPE {metric} counter")
+        for account, counts in sorted(worker_counters.accounts().items()):
+            lines.append(f'{metric}{{account="{_label_value(account)}"}} {counts.get(name, 0)}')
+    for name, func in sorted(gauges.items()):
+        try:
+            value = func()
+        except Exception:
+            continue
+        metric = f"bussid_{name}"
+        lines.append(f"# TYPE {metric} gauge")
+        if isinstance(value, dict):
+            for label, v in sorted(value.items()):
+                lines.append(f'{metric}{{account="{_label_value(label)}"}} {v}')
+        else:
+            lines.append(f"{metric} {value}")
+    for name, hist in sorted(histograms.items()):
+        metric = f"bussid_{name}_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        with hist.lock:
+            cumulative = 0
+            for bound, n in zip(hist.buckets, hist.counts):
+                cumulative += n
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {hist.count}')
+            lines.append(f"{metric}_sum {hist.sum}")
+            lines.append(f"{metric}_count {hist.count}")
+    return "\n".join(lines) + "\n"
+
+# Exporter: tulis ke file secara berkala dan/atau layani GET /metrics di localhost
+def _write_file(path):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp, path)
+
+def _file_loop(path, interval):
+    while True:
+        try:
+            _write_file(path)
+        except OSError as e:
+            logger.error(f"Gagal menulis metrics ke {path}: {e}")
+        time.sleep(interval)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_exporter(config):
+    path = config.get("file")
+    port = config.get("port")
+    if path:
+        interval = config.get("interval", 15)
+        threading.Thread(target=_file_loop, args=(path, interval), name="metrics-file", daemon=True).start()
+        logger.info(f"Metrics ditulis ke {path} setiap {interval} detik")
+    if port:
+        server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info(f"Metrics tersedia di http://127.0.0.1:{port}/metrics")
@@ -5,14 +5,33 @@ import threading
 import queue
 import random
 import logging
+import logging.handlers
+import asyncio
+import atexit
+import hashlib
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from metrics import histogram, histograms, worker_counters, register_gauge
 
-# Setup logging ke file debug.log
-logging.basicConfig(
-    filename='debug.log',
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    filemode='a'
-)
+# aiohttp opsional dan import-nya berat (~100 ms), jadi baru diimport saat
+# engine asyncio dipilih
+aiohttp = None
+
+def _load_aiohttp():
+    global aiohttp
+    if aiohttp is None:
+        try:
+            import aiohttp as module
+        except ImportError:
+            raise RuntimeError("Engine asyncio butuh aiohttp (pip install aiohttp)") from None
+        aiohttp = module
+    return aiohttp
+
+# Log worker masuk ke debug.log lewat pipeline di logging_setup
+logger = logging.getLogger("money")
 
 # Daftar rute
 routes = [
@@ -36,95 +55,679 @@ record = [
     {'Key': {'sourceCity': 'JKT', 'destinationCity': 'P_Merak', 'amount': 45}, 'Value': 90}
 ]
 
+PLAYFAB_BASE_URL = 'https://4ae9.playfabapi.com'
+HTTP_TIMEOUT = (5, 30)  # (connect, read) detik
+
 # Manajemen worker per akun
-workers = {}  # {account_name: {"thread": Thread, "event": Event, "session": Session}}
+workers = {}  # {account_name: {"thread": Thread, "event": Event, "owner": telegram_id, "pacer": Pacer} | {"task": Future, "owner": telegram_id, "pacer": Pacer} | {"shard": Shard, "owner": telegram_id, "auth": ticket, "login_payload": payload}}
+owners = {}  # {telegram_id: {account_name: None}}, index pemilik -> worker
 lock = threading.Lock()
 
-def create_mission(session, headers):
-    selected_cities = random.choice(routes)
-    game_data = json.dumps({
-        "FunctionName": "PlayCareer",
-        "FunctionParameter": {"cities": selected_cities},
-        "RevisionSelection": "Live",
-        "SpecificRevision": None,
-        "GeneratePlayStreamEvent": False
-    })
-    
-    retries = 3
-    for attempt in range(retries):
+# Engine worker: "thread" (satu thread per akun) atau "asyncio" (semua akun di satu event loop)
+ENGINES = ("thread", "asyncio")
+engine = "thread"
+_async_engine = None
+
+def set_engine(name):
+    global engine
+    if name not in ENGINES:
+        raise ValueError(f"Engine '{name}' tidak dikenal, pilih salah satu dari {ENGINES}")
+    if name == "asyncio":
+        _load_aiohttp()
+    with lock:
+        if workers and name != engine:
+            raise RuntimeError("Engine tidak bisa diganti saat masih ada worker berjalan")
+        engine = name
+    logger.info(f"Money engine: {name}")
+
+# Pool koneksi HTTP bersama untuk semua trafik PlayFab (handler bot + semua worker).
+# Koneksi keep-alive dipakai ulang; kalau semua koneksi sedang dipakai, request
+# menunggu slot kosong (pool_block) daripada membuka koneksi baru tanpa batas.
+http_pool_size = 20
+_http_session = None
+_http_lock = threading.Lock()
+
+class PoolStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.misses = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_get(self, waited):
+        with self.lock:
+            self.requests += 1
+            self.wait_total += waited
+            if waited > self.wait_max:
+                self.wait_max = waited
+
+    def record_miss(self):
+        with self.lock:
+            self.misses += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "max_connections": http_pool_size,
+                "requests": self.requests,
+                "hits": self.requests - self.misses,
+                "misses": self.misses,
+                "wait_avg_ms": (self.wait_total / self.requests * 1000) if self.requests else 0.0,
+                "wait_max_ms": self.wait_max * 1000
+            }
+
+pool_stats = PoolStats()
+
+class _CountingPoolMixin:
+    def _get_conn(self, timeout=None):
+        start = time.monotonic()
+        conn = super()._get_conn(timeout)
+        pool_stats.record_get(time.monotonic() - start)
+        return conn
+
+    def _new_conn(self):
+        pool_stats.record_miss()
+        return super()._new_conn()
+
+class _CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    pass
+
+class _CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    pass
+
+class _PooledAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool
+        }
+
+def configure_http_pool(max_connections):
+    global http_pool_size, _http_session
+    with _http_lock:
+        http_pool_size = max(1, int(max_connections))
+        if _http_session is not None:
+            _http_session.close()
+            _http_session = None
+    logger.info(f"HTTP pool size: {http_pool_size}")
+
+def get_http_session():
+    global _http_session
+    with _http_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = _PooledAdapter(pool_connections=4, pool_maxsize=http_pool_size, pool_block=True)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _http_session = session
+        return _http_session
+
+def warm_up_http_pool(connections=2):
+    # Buka beberapa koneksi TCP+TLS di awal supaya request pertama tidak kena handshake
+    session = get_http_session()
+    connections = max(0, min(int(connections), http_pool_size))
+
+    def ping(_):
         try:
-            response = session.post('https://4ae9.playfabapi.com/Client/ExecuteCloudScript', headers=headers, data=game_data)
-            response.raise_for_status()
-            parser = response.json()
-            
-            logging.debug(f"[create_mission] Cities: {selected_cities}")
-            logging.debug(f"[create_mission] Response: {json.dumps(parser, indent=2)}")
-            
-            if parser.get('code') == 401:
-                logging.error("Unauthorized (401). Periksa token auth.")
-                return None
-            elif parser.get('code') == 429:
-                retry_after = parser.get('data', {}).get('Error', {}).get('retryAfterSeconds', 2)
-                logging.warning(f"Rate limit exceeded (429). Menunggu {retry_after} detik...")
-                time.sleep(retry_after + random.uniform(0.1, 0.5))
-                continue
-            elif parser.get('code') == 200:
-                data = parser.get('data', {})
-                if "apiError" in data:
-                    logging.error(f"API error detected - {data['apiError']}")
-                    return None
-                if 'FunctionResult' not in data or 'careerSession' not in data['FunctionResult']:
-                    logging.error(f"'FunctionResult' or 'careerSession' missing - {data}")
-                    return None
-                logging.info("Successfully created mission")
-                return data['FunctionResult']['careerSession']
+            session.get(PLAYFAB_BASE_URL, timeout=HTTP_TIMEOUT).close()
+            return True
         except requests.exceptions.RequestException as e:
-            logging.error(f"Request failed: {e}. Retrying ({attempt + 1}/{retries})...")
-            time.sleep(0.5 + random.uniform(0.1, 0.3))
-    logging.error("Gagal setelah 3 percobaan di create_mission.")
-    return None
-
-def reset_user_fuel(session, headers):
-    data = json.dumps({
-        "FunctionName": "ResetUserFuel",
-        "FunctionParameter": None,
+            logger.warning(f"HTTP warm-up gagal: {e}")
+            return False
+
+    if not connections:
+        return 0
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        ok = sum(executor.map(ping, range(connections)))
+    logger.info(f"HTTP pool warm-up: {ok}/{connections} koneksi siap")
+    return ok
+
+def get_http_pool_stats():
+    return pool_stats.snapshot()
+
+# Rate limiter global (token bucket) untuk semua call PlayFab. Defaultnya tanpa
+# batas: rate baru dipasang saat 429 pertama (setengah laju call yang teramati),
+# lalu naik sedikit demi sedikit setiap call sukses dan dipotong lagi saat kena
+# 429 (AIMD). retryAfterSeconds dari server berlaku untuk semua worker, bukan
+# cuma yang kena.
+class RateLimiter:
+    def __init__(self, rate=None, min_rate=1.0, max_rate=None, increase=0.05, decrease=0.5):
+        self.lock = threading.Lock()
+        self.rate = float(rate) if rate else float("inf")
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate) if max_rate else float("inf")
+        self.increase = increase
+        self.decrease = decrease
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.last_cut = 0.0
+        self.queued = 0
+        self.throttles = 0
+        # Laju call teramati (jendela 1 detik), dasar potongan pertama saat rate masih tanpa batas
+        self.window_start = self.updated
+        self.window_calls = 0
+        self.observed = 0.0
+
+    def _reserve(self):
+        # Ambil satu token (boleh minus); return berapa detik caller harus menunggu
+        now = time.monotonic()
+        self.window_calls += 1
+        if now - self.window_start >= 1.0:
+            self.observed = self.window_calls / (now - self.window_start)
+            self.window_start = now
+            self.window_calls = 0
+        if self.rate == float("inf"):
+            return max(0.0, self.blocked_until - now)
+        self.tokens = min(max(1.0, self.rate), self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate, self.blocked_until - now)
+
+    def acquire(self, stop_event=None):
+        with self.lock:
+            wait = self._reserve()
+            if wait:
+                self.queued += 1
+        if wait:
+            try:
+                if stop_event is not None:
+                    stop_event.wait(wait)
+                else:
+                    time.sleep(wait)
+            finally:
+                with self.lock:
+                    self.queued -= 1
+        return wait
+
+    async def acquire_async(self):
+        with self.lock:
+            wait = self._reserve()
+            if wait:
+                self.queued += 1
+        if wait:
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                with self.lock:
+                    self.queued -= 1
+        return wait
+
+    def on_success(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after):
+        with self.lock:
+            now = time.monotonic()
+            self.throttles += 1
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+            # Banyak 429 yang datang bersamaan cukup memotong rate sekali
+            if now - self.last_cut >= 1.0:
+                current = self.rate
+                if current == float("inf"):
+                    current = min(self.max_rate, max(self.observed, self.window_calls))
+                self.rate = max(self.min_rate, current * self.decrease)
+                self.tokens = min(self.tokens, 0.0)
+                self.updated = now
+                self.last_cut = now
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "rate": self.rate,
+                "queued": self.queued,
+                "throttles": self.throttles,
+                "paused_for": max(0.0, self.blocked_until - time.monotonic())
+            }
+
+rate_limiter = RateLimiter()
+# Bucket terpisah untuk call dari handler bot (login, ganti nama, info akun):
+# tidak ikut antre di belakang ratusan worker dan hanya diperlambat oleh 429
+# yang diterimanya sendiri.
+interactive_limiter = RateLimiter()
+
+def configure_rate_limiter(rate=None, min_rate=1.0, max_rate=None):
+    global rate_limiter, interactive_limiter
+    rate_limiter = RateLimiter(rate, min_rate, max_rate)
+    interactive_limiter = RateLimiter(None, min_rate, max_rate)
+    logger.info(f"Rate limiter: {rate or 'tanpa batas'}/s (min {min_rate}, max {max_rate or 'tanpa batas'})")
+
+def get_rate_limiter_stats():
+    stats = rate_limiter.snapshot()
+    stats["interactive"] = interactive_limiter.snapshot()
+    return stats
+
+# Pacing antar siklus mission. "fixed" = jeda tetap seperti semula (1.3-1.7 detik,
+# 5 detik setelah 5 error). "adaptive" = jeda per akun diperkecil selama siklus
+# lancar dan dilipatgandakan saat akun kena 429 atau latency melonjak; jeda error
+# naik eksponensial dan reset setelah siklus sukses.
+PACING_MODES = ("fixed", "adaptive")
+pacing = {"mode": "fixed", "min_delay": 0.3, "max_delay": 10.0, "overlap_fuel_reset": False}
+
+def configure_pacing(mode="fixed", min_delay=0.3, max_delay=10.0, overlap_fuel_reset=False):
+    if mode not in PACING_MODES:
+        raise ValueError(f"Pacing '{mode}' tidak dikenal, pilih salah satu dari {PACING_MODES}")
+    pacing.update(mode=mode, min_delay=float(min_delay), max_delay=float(max_delay),
+                  overlap_fuel_reset=bool(overlap_fuel_reset))
+    logger.info(f"Pacing: {mode} ({min_delay}-{max_delay} detik), overlap ResetUserFuel: {overlap_fuel_reset}")
+
+class Pacer:
+    def __init__(self, account_name):
+        self.account = account_name
+        self.lock = threading.Lock()
+        self.delay = 1.5
+        self.backoff = 1.0
+        self.latency = None  # rata-rata bergerak latency siklus
+        self.throttled = worker_counters.snapshot(account_name)["throttled_429"]
+        self.missions = deque()  # waktu fare sukses dalam 60 detik terakhir
+
+    def record_mission(self):
+        now = time.monotonic()
+        with self.lock:
+            self.missions.append(now)
+            self._prune(now)
+
+    def _prune(self, now):
+        while self.missions and now - self.missions[0] > 60:
+            self.missions.popleft()
+
+    def missions_per_minute(self):
+        with self.lock:
+            self._prune(time.monotonic())
+            return len(self.missions)
+
+    def cycle_delay(self, latency, ok=True):
+        if pacing["mode"] == "fixed":
+            return 1 + random.uniform(0.3, 0.7)
+        throttled = worker_counters.snapshot(self.account)["throttled_429"]
+        if throttled > self.throttled:
+            self.delay *= 2
+        elif not ok:
+            pass  # siklus gagal: jeda tidak diperkecil
+        elif self.latency is not None and latency > 2 * self.latency:
+            self.delay += 0.25
+        else:
+            self.delay *= 0.85
+        self.throttled = throttled
+        if ok:
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            self.backoff = 1.0
+        self.delay = min(pacing["max_delay"], max(pacing["min_delay"], self.delay))
+        return self.delay * random.uniform(1.0, 1.2)
+
+    def error_delay(self):
+        if pacing["mode"] == "fixed":
+            return 5 + random.uniform(0.5, 1.0)
+        delay = self.backoff
+        self.backoff = min(30.0, self.backoff * 2)
+        return delay * random.uniform(1.0, 1.2)
+
+    def exception_delay(self):
+        if pacing["mode"] == "fixed":
+            return 2 + random.uniform(0.5, 1.0)
+        return self.error_delay()
+
+# Executor untuk ResetUserFuel yang dijalankan bersamaan dengan PlayCareer berikutnya
+_fuel_executor = None
+
+def _get_fuel_executor():
+    global _fuel_executor
+    with _http_lock:
+        if _fuel_executor is None:
+            _fuel_executor = ThreadPoolExecutor(max_workers=http_pool_size, thread_name_prefix="fuel-reset")
+        return _fuel_executor
+
+# Client PlayFab: satu jalur untuk header, retry, 429/401 dan transport error.
+# Body CloudScript yang statis diserialisasi sekali saat import; FarePayment
+# hanya menyambung field dinamis (records, careerToken) ke template byte.
+PLAYFAB_HEADERS = {
+    'User-Agent': 'UnityEngine-Unity; Version: 2018.4.26f1',
+    'X-ReportErrorAsSuccess': 'true',
+    'X-PlayFabSDK': 'UnitySDK-2.20.170411',
+    'Content-Type': 'application/json'
+}
+
+def _cloudscript_body(function_name, parameter):
+    return json.dumps({
+        "FunctionName": function_name,
+        "FunctionParameter": parameter,
         "RevisionSelection": "Live",
         "SpecificRevision": None,
         "GeneratePlayStreamEvent": False
-    })
-    
-    retries = 3
-    for attempt in range(retries):
+    }).encode()
+
+PLAY_CAREER_BODIES = [_cloudscript_body("PlayCareer", {"cities": cities}) for cities in routes]
+RESET_FUEL_BODY = _cloudscript_body("ResetUserFuel", None)
+COMBINED_INFO_BODY = json.dumps({
+    "PlayFabId": None,
+    "InfoRequestParameters": {
+        "GetUserAccountInfo": True,
+        "GetUserInventory": True,
+        "GetUserVirtualCurrency": True,
+        "GetUserData": False,
+        "GetUserReadOnlyData": True,
+        "GetCharacterList": False,
+        "GetTitleData": True,
+        "GetPlayerStatistics": False
+    }
+}).encode()
+
+_fare_template = _cloudscript_body("FarePayment", {
+    "records": "__RECORDS__",
+    "bonus": True,
+    "careerToken": "__TOKEN__",
+    "activityRewardToken": "{\"rewards\":[]}"
+})
+_FARE_HEAD, _fare_rest = _fare_template.split(b'"__RECORDS__"')
+_FARE_MID, _FARE_TAIL = _fare_rest.split(b'"__TOKEN__"')
+
+def fare_payment_body(records, token):
+    return b"".join((_FARE_HEAD, json.dumps(records).encode(), _FARE_MID, json.dumps(token).encode(), _FARE_TAIL))
+
+def _retry_after(parser):
+    return parser.get('data', {}).get('Error', {}).get('retryAfterSeconds', 2)
+
+# Login ulang saat session ticket kedaluwarsa (401). Payload LoginWithAndroidDeviceID
+# diambil dari tabel accounts; ticket baru diteruskan ke session_listener supaya
+# disimpan ke DB (di proses shard, dikirim ke proses utama bersama stats).
+RENEW_RETRY_AFTER = 60  # jeda sebelum mencoba login ulang lagi setelah gagal
+session_listener = None
+
+def set_session_listener(func):
+    global session_listener
+    session_listener = func
+
+def _notify_session(account_name, session_ticket):
+    if session_listener is not None:
         try:
-            response = session.post('https://4ae9.playfabapi.com/Client/ExecuteCloudScript', headers=headers, data=data)
-            response.raise_for_status()
-            parser = response.json()
-            
-            logging.debug(f"[reset_user_fuel] Response: {json.dumps(parser, indent=4)}")
-            
-            if parser.get('code') == 401:
-                logging.error("Unauthorized (401) in reset_user_fuel.")
-                return False
-            elif parser.get('code') == 429:
-                retry_after = parser.get('data', {}).get('Error', {}).get('retryAfterSeconds', 2)
-                logging.warning(f"Rate limit exceeded (429) in reset_user_fuel. Menunggu {retry_after} detik...")
-                time.sleep(retry_after + random.uniform(0.1, 0.5))
-                continue
-            elif parser.get('code') == 200:
-                backend_data = parser.get('data', {})
-                if "apiError" in backend_data:
-                    logging.error(f"API error detected in reset_user_fuel - {backend_data['apiError']}")
-                    return False
-                logging.info(f"Successfully reset fuel: {backend_data.get('FunctionResult', 'No result')}")
-                return True
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Request failed in reset_user_fuel: {e}. Retrying ({attempt + 1}/{retries})...")
-            time.sleep(0.5 + random.uniform(0.1, 0.3))
-    logging.error("Gagal setelah 3 percobaan di reset_user_fuel.")
-    return False
+            session_listener(account_name, session_ticket)
+        except Exception as e:
+            logger.error(f"[{account_name}] Gagal menyimpan session ticket baru: {e}")
+
+def relogin_payload(payload, device_id):
+    # Akun "manual" tidak punya device, jadi tidak bisa login ulang
+    if not payload or device_id == "manual":
+        return None
+    try:
+        data = json.loads(payload)
+    except (TypeError, ValueError):
+        return None
+    if not data.get("AndroidDeviceId"):
+        return None
+    return dict(data, CreateAccount=False)
+
+def _session_ticket(parser):
+    if parser is None or parser.get('code') != 200:
+        return None
+    return parser.get('data', {}).get('SessionTicket')
+
+class PlayFabClient:
+    def __init__(self, auth=None, session=None, account=None, stop_event=None, login_payload=None, interactive=False):
+        self.headers = dict(PLAYFAB_HEADERS)
+        if auth:
+            self.headers['X-Authorization'] = auth
+        self.session = session
+        self.account = account
+        self.stop_event = stop_event
+        self.login_payload = login_payload
+        self.interactive = interactive  # call dari handler bot, pakai interactive_limiter
+        self.renew_lock = threading.Lock()
+        self.renew_lock_async = None
+        self.renew_failed_at = 0.0
+
+    # Jeda retry; langsung bangun kalau worker di-stop
+    def _pause(self, seconds):
+        if self.stop_event is not None:
+            return self.stop_event.wait(seconds)
+        time.sleep(seconds)
+        return False
+
+    def _stopped(self):
+        return self.stop_event is not None and self.stop_event.is_set()
+
+    def _limiter(self):
+        return interactive_limiter if self.interactive else rate_limiter
+
+    # Return (parser, error): parser adalah JSON response (code apa pun selain 429),
+    # atau None dengan pesan error setelah semua percobaan gagal.
+    def request(self, path, body, tag, retries=3, timeout=HTTP_TIMEOUT, metric=None):
+        session = self.session or get_http_session()
+        limiter = self._limiter()
+        error = ""
+        for attempt in range(retries):
+            if self._stopped():
+                return None, "Worker dihentikan"
+            try:
+                limiter.acquire(self.stop_event)
+                if self._stopped():
+                    return None, "Worker dihentikan"
+                start = time.perf_counter()
+                response = session.post(PLAYFAB_BASE_URL + path, headers=self.headers, data=body, timeout=timeout)
+                if metric:
+                    histogram(metric).observe(time.perf_counter() - start)
+                if response.status_code != 200:
+                    error = f"HTTP Error: {response.status_code}"
+                    logger.error(f"[{tag}] {error}. Retrying ({attempt + 1}/{retries})...")
+                    self._pause(0.5 + random.uniform(0.1, 0.3))
+                    continue
+                parser = response.json()
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"[{tag}] Response: {json.dumps(parser, indent=2)}")
+                if parser.get('code') == 429:
+                    retry_after = _retry_after(parser)
+                    error = "Rate limit exceeded (429)"
+                    logger.warning(f"[{tag}] Rate limit exceeded (429). Menunggu {retry_after} detik...")
+                    limiter.on_throttle(retry_after + random.uniform(0.1, 0.5))
+                    worker_counters.inc("throttled_429", self.account)
+                    continue
+                limiter.on_success()
+                return parser, ""
+            except (requests.exceptions.RequestException, ValueError) as e:
+                error = f"Error: {str(e)}"
+                logger.error(f"[{tag}] Request failed: {e}. Retrying ({attempt + 1}/{retries})...")
+                self._pause(0.5 + random.uniform(0.1, 0.3))
+        logger.error(f"[{tag}] Gagal setelah {retries} percobaan.")
+        return None, error
+
+    async def request_async(self, path, body, tag, retries=3, metric=None):
+        limiter = self._limiter()
+        error = ""
+        for attempt in range(retries):
+            try:
+                await limiter.acquire_async()
+                start = time.perf_counter()
+                async with self.session.post(PLAYFAB_BASE_URL + path, headers=self.headers, data=body) as response:
+                    if response.status != 200:
+                        error = f"HTTP Error: {response.status}"
+                        logger.error(f"[{tag}] {error}. Retrying ({attempt + 1}/{retries})...")
+                        await asyncio.sleep(0.5 + random.uniform(0.1, 0.3))
+                        continue
+                    parser = await response.json(content_type=None)
+                if metric:
+                    histogram(metric).observe(time.perf_counter() - start)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"[{tag}] Response: {json.dumps(parser, indent=2)}")
+                if parser.get('code') == 429:
+                    retry_after = _retry_after(parser)
+                    error = "Rate limit exceeded (429)"
+                    logger.warning(f"[{tag}] Rate limit exceeded (429). Menunggu {retry_after} detik...")
+                    limiter.on_throttle(retry_after + random.uniform(0.1, 0.5))
+                    worker_counters.inc("throttled_429", self.account)
+                    continue
+                limiter.on_success()
+                return parser, ""
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                error = f"Error: {str(e)}"
+                logger.error(f"[{tag}] Request failed: {e}. Retrying ({attempt + 1}/{retries})...")
+                await asyncio.sleep(0.5 + random.uniform(0.1, 0.3))
+        logger.error(f"[{tag}] Gagal setelah {retries} percobaan.")
+        return None, error
+
+    # ExecuteCloudScript: return blok 'data' kalau code 200, None kalau gagal/401.
+    # Kena 401 sekali: login ulang lalu ulangi call dengan ticket baru.
+    def execute_cloudscript(self, function, body, tag):
+        stale = self.headers.get('X-Authorization')
+        parser = self.request('/Client/ExecuteCloudScript', body, tag, metric=f"cloudscript_{function}")[0]
+        if parser is not None and parser.get('code') == 401 and self.renew_session(stale):
+            parser = self.request('/Client/ExecuteCloudScript', body, tag, metric=f"cloudscript_{function}")[0]
+        return self._cloudscript_data(parser, tag)
+
+    async def execute_cloudscript_async(self, function, body, tag):
+        stale = self.headers.get('X-Authorization')
+        parser = (await self.request_async('/Client/ExecuteCloudScript', body, tag, metric=f"cloudscript_{function}"))[0]
+        if parser is not None and parser.get('code') == 401 and await self.renew_session_async(stale):
+            parser = (await self.request_async('/Client/ExecuteCloudScript', body, tag, metric=f"cloudscript_{function}"))[0]
+        return self._cloudscript_data(parser, tag)
+
+    # Single-flight: call yang gagal bersamaan menunggu satu login; yang datang
+    # belakangan melihat ticket sudah berganti dan langsung memakai ticket baru.
+    def _can_renew(self, stale):
+        if self.headers.get('X-Authorization') != stale:
+            return True
+        if not self.login_payload or time.monotonic() - self.renew_failed_at < RENEW_RETRY_AFTER:
+            return False
+        return None
+
+    def _renewed(self, parser, error):
+        ticket = _session_ticket(parser)
+        if not ticket:
+            self.renew_failed_at = time.monotonic()
+            logger.error(f"[{self.account}] Login ulang gagal: {error or (parser or {}).get('errorMessage')}")
+            return False
+        self.headers['X-Authorization'] = ticket
+        worker_counters.inc("session_renewals", self.account)
+        logger.info(f"[{self.account}] Session ticket diperbarui")
+        _notify_session(self.account, ticket)
+        return True
+
+    def renew_session(self, stale):
+        with self.renew_lock:
+            ready = self._can_renew(stale)
+            if ready is not None:
+                return ready
+            login = PlayFabClient(session=self.session, stop_event=self.stop_event)
+            return self._renewed(*login.login_android(self.login_payload))
+
+    async def renew_session_async(self, stale):
+        if self.renew_lock_async is None:
+            self.renew_lock_async = asyncio.Lock()
+        async with self.renew_lock_async:
+            ready = self._can_renew(stale)
+            if ready is not None:
+                return ready
+            login = PlayFabClient(session=self.session)
+            return self._renewed(*await login.request_async(
+                '/Client/LoginWithAndroidDeviceID', json.dumps(self.login_payload), "login", retries=1))
+
+    def _cloudscript_data(self, parser, tag):
+        if parser is None:
+            return None
+        if parser.get('code') == 401:
+            logger.error(f"[{tag}] Unauthorized (401). Periksa token auth.")
+            worker_counters.inc("unauthorized_401", self.account)
+            return None
+        if parser.get('code') != 200:
+            logger.error(f"[{tag}] Unexpected response code {parser.get('code')}: {parser.get('errorMessage')}")
+            return None
+        return parser.get('data', {})
+
+    # Endpoint non-CloudScript yang dipakai bot.py
+    def login_android(self, login_payload, timeout=5):
+        return self.request('/Client/LoginWithAndroidDeviceID', json.dumps(login_payload), "login", retries=1, timeout=timeout)
+
+    def update_display_name(self, display_name, timeout=5):
+        return self.request('/Client/UpdateUserTitleDisplayName', json.dumps({"DisplayName": display_name}), "update_display_name", retries=1, timeout=timeout)
+
+    def get_combined_info(self, timeout=5):
+        return self.request('/Client/GetPlayerCombinedInfo', COMBINED_INFO_BODY, "get_player_info", retries=1, timeout=timeout)
+
+# Memori rute per akun. Pasangan kota yang ditolak FarePayment dengan "Terminal
+# has been visited" diblokir selama ROUTE_FAIL_TTL detik supaya tidak dikirim lagi,
+# dan rata-rata bayaran per varian rute PlayCareer dipakai untuk memilih rute
+# berikutnya (sesekali tetap coba varian lain supaya statistiknya ikut terbarui).
+ROUTE_FAIL_TTL = 3600
+ROUTE_EXPLORE = 0.1
+MAX_FARE_RECORDS = 3
+
+class RouteMemory:
+    def __init__(self):
+        self.failed = {}  # {(source, destination): kedaluwarsa (monotonic)}
+        self.stats = [[0, 0] for _ in routes]  # per varian: [jumlah percobaan, total bayaran]
+        self.current = None  # varian rute PlayCareer terakhir
+
+    def is_failed(self, source, destination):
+        expires = self.failed.get((source, destination))
+        if expires is None:
+            return False
+        if expires < time.monotonic():
+            del self.failed[(source, destination)]
+            return False
+        return True
+
+    def mark_failed(self, records):
+        expires = time.monotonic() + ROUTE_FAIL_TTL
+        for r in records:
+            self.failed[(r['Key']['sourceCity'], r['Key']['destinationCity'])] = expires
+
+    def choose_variant(self):
+        untried = [i for i, (count, _) in enumerate(self.stats) if count == 0]
+        if untried:
+            self.current = random.choice(untried)
+        elif random.random() < ROUTE_EXPLORE:
+            self.current = random.randrange(len(routes))
+        else:
+            self.current = max(range(len(routes)), key=lambda i: self.stats[i][1] / self.stats[i][0])
+        return self.current
+
+    def record(self, payout):
+        # Dicatat tiap percobaan; gagal = bayaran 0, jadi varian yang terus gagal
+        # rata-ratanya turun dan tidak dianggap "belum dicoba" lagi
+        if self.current is not None:
+            self.stats[self.current][0] += 1
+            self.stats[self.current][1] += payout
+
+route_memory = {}  # {account_name: RouteMemory}
+_route_lock = threading.Lock()
+
+def get_route_memory(account_name):
+    with _route_lock:
+        memory = route_memory.get(account_name)
+        if memory is None:
+            memory = route_memory[account_name] = RouteMemory()
+        return memory
 
-def skip_mission(session, headers, token, passenger_data):
-    failed_routes = set()
+# Langkah-langkah mission. Pembuatan body dan pembacaan hasil dipakai bareng oleh
+# engine thread dan engine asyncio.
+def _career_session(data):
+    if data is None:
+        return None
+    if "apiError" in data:
+        logger.error(f"API error detected - {data['apiError']}")
+        return None
+    if 'FunctionResult' not in data or 'careerSession' not in (data['FunctionResult'] or {}):
+        logger.error(f"'FunctionResult' or 'careerSession' missing - {data}")
+        return None
+    logger.info("Successfully created mission")
+    return data['FunctionResult']['careerSession']
+
+def _fuel_reset(data):
+    if data is None:
+        return False
+    if "apiError" in data:
+        logger.error(f"API error detected in reset_user_fuel - {data['apiError']}")
+        return False
+    logger.info(f"Successfully reset fuel: {data.get('FunctionResult', 'No result')}")
+    return True
+
+# Penumpang dengan bayaran terbesar, kecuali rute yang baru saja ditolak
+def _fare_records(passenger_data, memory):
+    passengers = [
+        p for p in sorted(passenger_data, key=lambda x: x['amount'], reverse=True)
+        if p['amount'] > 0 and not memory.is_failed(p['source'], p['destination'])
+    ]
     dynamic_record = [
         {
             'Key': {
@@ -134,131 +737,596 @@ def skip_mission(session, headers, token, passenger_data):
                 'activityRewards': None
             },
             'Value': p['amount']
-        } for p in sorted(passenger_data, key=lambda x: x['amount'], reverse=True)[:3]
-        if p['amount'] > 0 and (p['source'], p['destination']) not in failed_routes
+        } for p in passengers[:MAX_FARE_RECORDS]
     ]
-    
     if not dynamic_record:
-        dynamic_record = [random.choice(record)]
-        logging.warning(f"No valid routes in passenger_data, using fallback: {dynamic_record}")
-    
-    data = json.dumps({
-        "FunctionName": "FarePayment",
-        "FunctionParameter": {
-            "records": dynamic_record,
-            "bonus": True,
-            "careerToken": token,
-            "activityRewardToken": "{\"rewards\":[]}"
-        },
-        "RevisionSelection": "Live",
-        "SpecificRevision": None,
-        "GeneratePlayStreamEvent": False
-    })
-    
-    retries = 3
-    for attempt in range(retries):
-        try:
-            response = session.post('https://4ae9.playfabapi.com/Client/ExecuteCloudScript', headers=headers, data=data)
-            response.raise_for_status()
-            parser = response.json()
-            
-            logging.debug(f"[skip_mission] Response for token {token}: {json.dumps(parser, indent=4)}")
-            
-            if parser.get('code') == 401:
-                logging.error(f"[{token}] Unauthorized (401).")
-                return False
-            elif parser.get('code') == 429:
-                retry_after = parser.get('data', {}).get('Error', {}).get('retryAfterSeconds', 2)
-                logging.warning(f"[{token}] Rate limit exceeded (429). Menunggu {retry_after} detik...")
-                time.sleep(retry_after + random.uniform(0.1, 0.5))
-                continue
-            elif parser.get('code') == 200:
-                backend_data = parser.get('data', {})
-                if "apiError" in backend_data:
-                    logging.error(f"[{token}] API error detected - {backend_data['apiError']}")
-                    if "Terminal has been visited" in str(backend_data['apiError']):
-                        for route in dynamic_record:
-                            failed_routes.add((route['Key']['sourceCity'], route['Key']['destinationCity']))
-                        logging.warning(f"Added routes to failed_routes: {failed_routes}")
-                    return False
-                logs = backend_data.get('Logs', [])
-                msg = logs[-1]['Message'] if logs else "No message"
-                with lock:
-                    logging.info(f"[{token}] {msg}")
-                return True
-        except requests.exceptions.RequestException as e:
-            logging.error(f"[{token}] Request failed: {e}. Retrying ({attempt + 1}/{retries})...")
-            time.sleep(0.5 + random.uniform(0.1, 0.3))
-    logging.error(f"[{token}] Gagal setelah 3 percobaan di skip_mission.")
-    return False
-
-def pass_mission_worker(account_name, auth, stop_event):
-    headers = {
-        'User-Agent': 'UnityEngine-Unity; Version: 2018.4.26f1',
-        'X-ReportErrorAsSuccess': 'true',
-        'X-PlayFabSDK': 'UnitySDK-2.20.170411',
-        'X-Authorization': auth,
-        'Content-Type': 'application/json'
-    }
-    session = requests.Session()
+        fallback = [r for r in record if not memory.is_failed(r['Key']['sourceCity'], r['Key']['destinationCity'])]
+        dynamic_record = [random.choice(fallback or record)]
+        logger.warning(f"No valid routes in passenger_data, using fallback: {dynamic_record}")
+    return dynamic_record
+
+def _fare_paid(data, token, records, memory):
+    if data is None:
+        memory.record(0)
+        return False
+    if "apiError" in data:
+        memory.record(0)
+        logger.error(f"[{token}] API error detected - {data['apiError']}")
+        if "Terminal has been visited" in str(data['apiError']):
+            memory.mark_failed(records)
+            logger.warning(f"[{token}] Rute diblokir {ROUTE_FAIL_TTL} detik: "
+                           f"{[(r['Key']['sourceCity'], r['Key']['destinationCity']) for r in records]}")
+        return False
+    logs = data.get('Logs', [])
+    msg = logs[-1]['Message'] if logs else "No message"
+    logger.info(f"[{token}] {msg}")
+    memory.record(sum(r['Value'] for r in records))
+    return True
+
+def _play_career_body(memory):
+    index = memory.choose_variant()
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"[create_mission] Cities: {routes[index]}")
+    return PLAY_CAREER_BODIES[index]
+
+def _count(client, ok, success, failure=None):
+    if ok:
+        worker_counters.inc(success, client.account)
+    elif failure:
+        worker_counters.inc(failure, client.account)
+    return ok
+
+def _mission_created(client, memory, career):
+    if career is None:
+        memory.record(0)
+    _count(client, career is not None, "missions_created")
+    return career
+
+def create_mission(client):
+    memory = get_route_memory(client.account)
+    body = _play_career_body(memory)
+    return _mission_created(client, memory, _career_session(client.execute_cloudscript("PlayCareer", body, "create_mission")))
+
+def reset_user_fuel(client):
+    return _count(client, _fuel_reset(client.execute_cloudscript("ResetUserFuel", RESET_FUEL_BODY, "reset_user_fuel")), "fuel_resets")
+
+def skip_mission(client, token, passenger_data):
+    memory = get_route_memory(client.account)
+    records = _fare_records(passenger_data, memory)
+    data = client.execute_cloudscript("FarePayment", fare_payment_body(records, token), token)
+    return _count(client, _fare_paid(data, token, records, memory), "fare_ok", "fare_failed")
+
+async def create_mission_async(client):
+    memory = get_route_memory(client.account)
+    body = _play_career_body(memory)
+    return _mission_created(client, memory, _career_session(await client.execute_cloudscript_async("PlayCareer", body, "create_mission")))
+
+async def reset_user_fuel_async(client):
+    return _count(client, _fuel_reset(await client.execute_cloudscript_async("ResetUserFuel", RESET_FUEL_BODY, "reset_user_fuel")), "fuel_resets")
+
+async def skip_mission_async(client, token, passenger_data):
+    memory = get_route_memory(client.account)
+    records = _fare_records(passenger_data, memory)
+    data = await client.execute_cloudscript_async("FarePayment", fare_payment_body(records, token), token)
+    return _count(client, _fare_paid(data, token, records, memory), "fare_ok", "fare_failed")
+
+# Semua jeda pakai stop_event.wait supaya Stop langsung membangunkan worker.
+# Dengan overlap_fuel_reset, ResetUserFuel siklus ini jalan bersamaan dengan
+# PlayCareer siklus berikutnya dan ditunggu sebelum FarePayment.
+def pass_mission_worker(account_name, auth, stop_event, pacer=None, login_payload=None):
+    client = PlayFabClient(auth, account=account_name, stop_event=stop_event, login_payload=login_payload)
+    pacer = pacer or Pacer(account_name)
+    pending_reset = None
     error_count = 0
     max_errors = 5
     
     while not stop_event.is_set():
         try:
-            career = create_mission(session, headers)
+            cycle_start = time.perf_counter()
+            career = create_mission(client)
+            if pending_reset is not None:
+                pending_reset.exception()  # tunggu selesai; gagal reset cukup tercatat di log
+                pending_reset = None
+            if stop_event.is_set():
+                break
             if career and 'token' in career and 'passenger' in career:
                 token = career['token']
                 passenger_data = career['passenger']
-                if skip_mission(session, headers, token, passenger_data):
-                    reset_user_fuel(session, headers)
+                if skip_mission(client, token, passenger_data):
+                    pacer.record_mission()
+                    if pacing["overlap_fuel_reset"]:
+                        pending_reset = _get_fuel_executor().submit(reset_user_fuel, client)
+                    else:
+                        reset_user_fuel(client)
+                    histogram("worker_cycle").observe(time.perf_counter() - cycle_start)
                     error_count = 0
                 else:
                     error_count += 1
             else:
-                logging.warning(f"[{account_name}] Tidak ada careerSession, token, atau passenger.")
+                logger.warning(f"[{account_name}] Tidak ada careerSession, token, atau passenger.")
                 error_count += 1
             if error_count >= max_errors:
-                logging.warning(f"[{account_name}] Terlalu banyak error ({error_count}). Menunggu 5 detik...")
-                time.sleep(5 + random.uniform(0.5, 1.0))
+                delay = pacer.error_delay()
+                logger.warning(f"[{account_name}] Terlalu banyak error ({error_count}). Menunggu {delay:.1f} detik...")
+                worker_counters.inc("error_backoffs", account_name)
+                stop_event.wait(delay)
                 error_count = 0
             else:
-                time.sleep(1 + random.uniform(0.3, 0.7))
+                stop_event.wait(pacer.cycle_delay(time.perf_counter() - cycle_start, error_count == 0))
         except Exception as e:
-            logging.error(f"[{account_name}] Worker error: {str(e)}")
+            logger.error(f"[{account_name}] Worker error: {str(e)}")
             error_count += 1
-            time.sleep(2 + random.uniform(0.5, 1.0))
+            stop_event.wait(pacer.exception_delay())
+    
+    logger.info(f"[{account_name}] Worker stopped")
+
+# Engine asyncio: create_mission -> skip_mission -> reset_user_fuel sebagai coroutine
+# di satu event loop (thread terpisah) dengan satu aiohttp.ClientSession bersama.
+async def pass_mission_worker_async(account_name, auth, session, pacer=None, login_payload=None):
+    client = PlayFabClient(auth, session, account_name, login_payload=login_payload)
+    pacer = pacer or Pacer(account_name)
+    pending_reset = None
+    error_count = 0
+    max_errors = 5
     
-    session.close()
-    logging.info(f"[{account_name}] Worker stopped")
+    try:
+        while True:
+            try:
+                cycle_start = time.perf_counter()
+                career = await create_mission_async(client)
+                if pending_reset is not None:
+                    await asyncio.wait([pending_reset])
+                    pending_reset = None
+                if career and 'token' in career and 'passenger' in career:
+                    if await skip_mission_async(client, career['token'], career['passenger']):
+                        pacer.record_mission()
+                        if pacing["overlap_fuel_reset"]:
+                            pending_reset = asyncio.ensure_future(reset_user_fuel_async(client))
+                        else:
+                            await reset_user_fuel_async(client)
+                        histogram("worker_cycle").observe(time.perf_counter() - cycle_start)
+                        error_count = 0
+                    else:
+                        error_count += 1
+                else:
+                    logger.warning(f"[{account_name}] Tidak ada careerSession, token, atau passenger.")
+                    error_count += 1
+                if error_count >= max_errors:
+                    delay = pacer.error_delay()
+                    logger.warning(f"[{account_name}] Terlalu banyak error ({error_count}). Menunggu {delay:.1f} detik...")
+                    worker_counters.inc("error_backoffs", account_name)
+                    await asyncio.sleep(delay)
+                    error_count = 0
+                else:
+                    await asyncio.sleep(pacer.cycle_delay(time.perf_counter() - cycle_start, error_count == 0))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[{account_name}] Worker error: {str(e)}")
+                error_count += 1
+                await asyncio.sleep(pacer.exception_delay())
+    finally:
+        if pending_reset is not None:
+            pending_reset.cancel()
+        logger.info(f"[{account_name}] Worker stopped")
+
+class AsyncEngine:
+    def __init__(self, max_connections):
+        _load_aiohttp()
+        self.max_connections = max_connections
+        self.loop = asyncio.new_event_loop()
+        self.session = None
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="money-asyncio", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._open_session())
+        self.ready.set()
+        self.loop.run_forever()
+
+    async def _open_session(self):
+        # Statistik pool aiohttp masuk ke pool_stats yang sama dengan pool requests
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self._on_request_start)
+        trace.on_connection_queued_start.append(self._on_queued_start)
+        trace.on_connection_queued_end.append(self._on_queued_end)
+        trace.on_connection_create_start.append(self._on_create_start)
+        trace.on_request_end.append(self._on_request_end)
+        trace.on_request_exception.append(self._on_request_end)
+        connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(sock_connect=HTTP_TIMEOUT[0], sock_read=HTTP_TIMEOUT[1]),
+            trace_configs=[trace]
+        )
+
+    async def _on_request_start(self, session, ctx, params):
+        ctx.waited = 0.0
+
+    async def _on_queued_start(self, session, ctx, params):
+        ctx.queued_at = time.monotonic()
+
+    async def _on_queued_end(self, session, ctx, params):
+        ctx.waited = time.monotonic() - ctx.queued_at
+
+    async def _on_create_start(self, session, ctx, params):
+        pool_stats.record_miss()
 
-def start_money_worker(account_name, auth):
+    async def _on_request_end(self, session, ctx, params):
+        pool_stats.record_get(ctx.waited)
+
+    def spawn(self, account_name, auth, pacer=None, login_payload=None):
+        return asyncio.run_coroutine_threadsafe(
+            pass_mission_worker_async(account_name, auth, self.session, pacer, login_payload), self.loop)
+
+def _get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = AsyncEngine(http_pool_size)
+    return _async_engine
+
+# Mode shard: worker dibagi ke beberapa proses (hash nama akun) supaya parsing JSON
+# dan TLS tidak mentok di satu core. Proses bot tetap memegang registry dan API
+# start/stop/get_running_workers; perintah dikirim ke shard lewat Pipe. Setiap
+# shard menjalankan engine thread/asyncio sendiri dengan bagian rate limit yang
+# sama rata, log dikirim balik ke proses utama, dan counter/histogram ditarik
+# berkala supaya menu Metrics dan exporter tetap lengkap. Loop stats juga menjadi
+# pengawas: shard yang prosesnya mati, pipe-nya putus atau tidak membalas dalam
+# SHARD_CALL_TIMEOUT diganti proses baru dan worker-nya dijalankan ulang di sana.
+SHARD_STATS_INTERVAL = 5
+SHARD_CALL_TIMEOUT = 30
+SHARD_MAX_RESTARTS = 3  # restart per index dalam SHARD_RESTART_WINDOW detik sebelum menyerah
+SHARD_RESTART_WINDOW = 300
+_shards = []
+_shard_missions = {}  # {index shard: {akun: mission/menit}}
+_shard_setup = ()  # (context, log_queue, settings) untuk membuat ulang shard
+
+# Perintah start/stop dan tarikan stats memakai pipe terpisah, jadi stats yang
+# lambat tidak menahan Start/Stop dari bot (dan sebaliknya)
+class Shard:
+    def __init__(self, index, context, log_queue, settings, restarts=()):
+        self.index = index
+        self.lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.conn, child_conn = context.Pipe()
+        self.stats_conn, child_stats_conn = context.Pipe()
+        self.process = context.Process(
+            target=_shard_main, args=(index, child_conn, child_stats_conn, log_queue, settings),
+            name=f"money-shard-{index}", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        child_stats_conn.close()
+        self.counters = {}  # snapshot counter terakhir, untuk menghitung selisih
+        self.histograms = {}
+        self.restarts = list(restarts)  # waktu restart sebelumnya di index ini
+        self.failed = False  # pipe putus / tidak membalas; diganti oleh loop stats
+        self.abandoned = False  # terlalu sering mati, tidak di-restart lagi
+
+    def call(self, *command):
+        return self._request(self.conn, self.lock, command)
+
+    def pull_stats(self):
+        return self._request(self.stats_conn, self.stats_lock, ("stats",))
+
+    def _request(self, conn, conn_lock, command):
+        # Menunggu lock juga dibatasi SHARD_CALL_TIMEOUT: caller di belakang call
+        # yang macet ikut menyerah, bukan menunggu tanpa batas
+        if self.failed or not conn_lock.acquire(timeout=SHARD_CALL_TIMEOUT):
+            return None
+        try:
+            if self.failed:
+                return None
+            conn.send(command)
+            if not conn.poll(SHARD_CALL_TIMEOUT):
+                raise TimeoutError(f"tidak ada balasan dalam {SHARD_CALL_TIMEOUT} detik")
+            return conn.recv()
+        except (OSError, EOFError) as e:
+            logger.error(f"Shard {self.index} tidak merespons ({command[0]}): {e}")
+            self.failed = True
+            return None
+        finally:
+            conn_lock.release()
+
+    def alive(self):
+        return not self.failed and self.process.is_alive()
+
+def _shard_of(account_name):
+    digest = hashlib.blake2b(account_name.encode(), digest_size=8).digest()
+    return _shards[int.from_bytes(digest, "big") % len(_shards)]
+
+def _shard_main(index, conn, stats_conn, log_queue, settings):
+    global PLAYFAB_BASE_URL
+    # Proses baru (spawn): modul diimport ulang, jadi registry, counter, histogram
+    # dan semua lock mulai dari kosong
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(settings["log_level"])
+    renewed = {}
+    set_session_listener(renewed.__setitem__)
+
+    PLAYFAB_BASE_URL = settings["base_url"]
+    set_engine(settings["engine"])
+    configure_http_pool(settings["http_pool_size"])
+    configure_rate_limiter(*settings["rate_limit"])
+    configure_pacing(**settings["pacing"])
+    threading.Thread(target=_serve_shard_stats, args=(stats_conn, renewed), name="shard-stats", daemon=True).start()
+    logger.info(f"Shard {index} siap")
+
+    while True:
+        try:
+            command, *args = conn.recv()
+        except EOFError:
+            break
+        if command == "start":
+            conn.send(start_money_worker(*args))
+        elif command == "stop":
+            conn.send(stop_money_worker(*args))
+        elif command == "exit":
+            conn.send(True)
+            break
+    for name in list(workers):
+        stop_money_worker(name)
+
+def _serve_shard_stats(conn, renewed):
+    while True:
+        try:
+            conn.recv()
+        except EOFError:
+            break
+        conn.send({
+            "counters": worker_counters.accounts(),
+            "missions": get_missions_per_minute(),
+            "histograms": {name: (list(h.counts), h.sum, h.max) for name, h in list(histograms.items())},
+            "sessions": {name: renewed.pop(name) for name in list(renewed)}
+        })
+
+def _log_pump(log_queue):
+    while True:
+        record = log_queue.get()
+        if record is None:
+            break
+        logging.getLogger(record.name).handle(record)
+
+def _pull_shard_stats(shard):
+    stats = shard.pull_stats()
+    if stats is None:
+        return
+    for account, counts in stats["counters"].items():
+        previous = shard.counters.get(account, {})
+        for name, value in counts.items():
+            if value > previous.get(name, 0):
+                worker_counters.inc(name, account, value - previous.get(name, 0))
+    shard.counters = stats["counters"]
+    for name, (counts, total, maximum) in stats["histograms"].items():
+        prev_counts, prev_total = shard.histograms.get(name, ([0] * len(counts), 0.0))
+        histogram(name).merge([n - p for n, p in zip(counts, prev_counts)], total - prev_total, maximum)
+        shard.histograms[name] = (counts, total)
+    _shard_missions[shard.index] = stats["missions"]
+    for account, session_ticket in stats["sessions"].items():
+        # Ticket terbaru dipakai kalau worker harus dijalankan ulang di shard pengganti
+        with lock:
+            worker = workers.get(account)
+            if worker is not None and worker.get("shard") is shard:
+                worker["auth"] = session_ticket
+        _notify_session(account, session_ticket)
+
+def _shard_stats_loop():
+    while _shards:
+        for shard in list(_shards):
+            if shard.abandoned:
+                continue
+            if shard.alive():
+                _pull_shard_stats(shard)
+            if not shard.alive() and shard in _shards:
+                _restart_shard(shard)
+        time.sleep(SHARD_STATS_INTERVAL)
+
+def _shard_workers(shard):
+    with lock:
+        return {name: worker for name, worker in workers.items() if worker.get("shard") is shard}
+
+# Shard mati: worker-nya langsung terlihat berhenti (_worker_alive), lalu shard
+# baru dibuat di index yang sama (hash akun tetap menunjuk ke sana) dan worker
+# dijalankan ulang dengan ticket terakhir. Kalau index itu sudah terlalu sering
+# mati, worker-nya dikeluarkan dari registry supaya bisa di-Start ulang user.
+def _restart_shard(shard):
+    shard.failed = True
+    if shard.process.is_alive():
+        shard.process.kill()
+    shard.process.join(timeout=5)
+    _shard_missions.pop(shard.index, None)
+    orphans = _shard_workers(shard)
+    logger.error(f"Shard {shard.index} mati (exit code {shard.process.exitcode}), {len(orphans)} worker terhenti")
+
+    now = time.monotonic()
+    restarts = [at for at in shard.restarts if now - at < SHARD_RESTART_WINDOW]
+    if len(restarts) >= SHARD_MAX_RESTARTS:
+        shard.abandoned = True
+        with lock:
+            for name, worker in orphans.items():
+                if workers.get(name) is worker:
+                    _unregister(name)
+        logger.error(f"Shard {shard.index} mati {len(restarts) + 1}x dalam {SHARD_RESTART_WINDOW} detik, "
+                     f"tidak di-restart; worker-nya ditandai berhenti: {', '.join(orphans) or '-'}")
+        return
+
+    replacement = Shard(shard.index, *_shard_setup, restarts=restarts + [now])
+    with lock:
+        if shard not in _shards:
+            replacement.abandoned = True  # stop_shards() jalan selagi restart
+        else:
+            _shards[shard.index] = replacement
+    if replacement.abandoned:
+        replacement.call("exit")
+        return
+    with lock:
+        for name, worker in orphans.items():
+            if workers.get(name) is worker:
+                worker["shard"] = replacement
+    restarted = 0
+    for name, worker in orphans.items():
+        ok = replacement.call("start", name, worker["auth"], worker["owner"], None, worker["login_payload"])
+        with lock:
+            registered = workers.get(name) is worker
+            if not ok and registered:
+                _unregister(name)
+        if ok and not registered:
+            # Di-Stop user selagi dipindah
+            replacement.call("stop", name)
+        elif ok:
+            restarted += 1
+    logger.info(f"Shard {shard.index} diganti proses baru, {restarted}/{len(orphans)} worker dijalankan ulang")
+
+def configure_shards(count):
+    global _shard_setup
+    # count <= 1: semua worker jalan di proses ini (default)
+    if count <= 1 or _shards:
+        return
+    # spawn, bukan fork: shard (termasuk pengganti yang dibuat dari thread stats
+    # saat event loop dan thread lain jalan) tidak mewarisi counter, histogram
+    # atau lock proses utama yang mungkin sedang dipegang
+    context = multiprocessing.get_context("spawn")
+    log_queue = context.Queue()
+    threading.Thread(target=_log_pump, args=(log_queue,), name="money-shard-log", daemon=True).start()
+    settings = {
+        "engine": engine,
+        "http_pool_size": http_pool_size,
+        "base_url": PLAYFAB_BASE_URL,
+        "rate_limit": (rate_limiter.rate / count, rate_limiter.min_rate / count, rate_limiter.max_rate / count),
+        "pacing": dict(pacing),
+        "log_level": logging.getLogger().level
+    }
+    _shard_setup = (context, log_queue, settings)
+    for index in range(count):
+        _shards.append(Shard(index, context, log_queue, settings))
+    threading.Thread(target=_shard_stats_loop, name="money-shard-stats", daemon=True).start()
+    atexit.register(stop_shards)
+    logger.info(f"Money worker dibagi ke {count} proses shard ({context.get_start_method()})")
+
+def stop_shards():
+    shards = list(_shards)
+    _shards.clear()
+    for shard in shards:
+        shard.call("exit")
+        shard.process.join(timeout=5)
+        if shard.process.is_alive():
+            # Shard macet (mis. SIGSTOP) tidak bereaksi pada SIGTERM saat exit
+            shard.process.kill()
+            shard.process.join(timeout=5)
+
+def _worker_alive(worker):
+    if "shard" in worker:
+        return worker["shard"].alive()
+    if "task" in worker:
+        return not worker["task"].done()
+    return worker["thread"].is_alive()
+
+def _owner_count(owner):
+    return sum(1 for name in owners.get(owner, ()) if _worker_alive(workers[name]))
+
+# limit: batas worker per owner (None = tanpa batas); dicek di bawah lock yang
+# sama dengan pendaftaran worker, jadi dua Start bersamaan tidak bisa lolos dua-duanya
+# login_payload: payload LoginWithAndroidDeviceID untuk login ulang saat 401 (lihat relogin_payload)
+def start_money_worker(account_name, auth, owner=None, limit=None, login_payload=None):
+    shard = None
     with lock:
         if account_name in workers:
             return False
-        stop_event = threading.Event()
-        thread = threading.Thread(target=pass_mission_worker, args=(account_name, auth, stop_event))
-        thread.daemon = True
-        workers[account_name] = {"thread": thread, "event": stop_event, "session": requests.Session()}
-        thread.start()
-        logging.info(f"Started money worker for {account_name}")
-        return True
+        if limit is not None and _owner_count(owner) >= limit:
+            return False
+        if _shards:
+            shard = _shard_of(account_name)
+            workers[account_name] = {"shard": shard, "owner": owner, "auth": auth, "login_payload": login_payload}
+        elif engine == "asyncio":
+            pacer = Pacer(account_name)
+            workers[account_name] = {"task": _get_async_engine().spawn(account_name, auth, pacer, login_payload), "owner": owner, "pacer": pacer}
+        else:
+            pacer = Pacer(account_name)
+            stop_event = threading.Event()
+            thread = threading.Thread(target=pass_mission_worker, args=(account_name, auth, stop_event, pacer, login_payload))
+            thread.daemon = True
+            workers[account_name] = {"thread": thread, "event": stop_event, "owner": owner, "pacer": pacer}
+            thread.start()
+        owners.setdefault(owner, {})[account_name] = None
+    # Perintah ke shard dikirim di luar lock; kalau gagal, pendaftaran dibatalkan
+    if shard is not None and not shard.call("start", account_name, auth, owner, None, login_payload):
+        with lock:
+            if workers.get(account_name, {}).get("shard") is shard:
+                _unregister(account_name)
+        return False
+    logger.info(f"Started money worker for {account_name} (owner {owner})")
+    return True
+
+def _unregister(account_name):
+    worker = workers.pop(account_name)
+    names = owners.get(worker["owner"])
+    if names is not None:
+        names.pop(account_name, None)
+        if not names:
+            del owners[worker["owner"]]
+    return worker
+
+def _reap(account_name, thread):
+    # Tunggu thread worker selesai di background; request yang sedang jalan
+    # dibatasi HTTP_TIMEOUT, sesudah itu worker keluar sendiri
+    thread.join(timeout=HTTP_TIMEOUT[1] + 5)
+    if thread.is_alive():
+        logger.warning(f"[{account_name}] Worker belum berhenti setelah Stop")
 
+# Stop tidak menunggu worker: registry dibersihkan di bawah lock, worker diberi
+# sinyal di luar lock, dan join dilakukan thread lain.
 def stop_money_worker(account_name):
     with lock:
         if account_name not in workers:
             return False
-        workers[account_name]["event"].set()
-        workers[account_name]["thread"].join(timeout=5)
-        workers[account_name]["session"].close()
-        del workers[account_name]
-        logging.info(f"Stopped money worker for {account_name}")
-        return True
+        worker = _unregister(account_name)
+    if "shard" in worker:
+        worker["shard"].call("stop", account_name)
+    elif "task" in worker:
+        worker["task"].cancel()
+    else:
+        worker["event"].set()
+        threading.Thread(target=_reap, args=(account_name, worker["thread"]), name=f"reap-{account_name}", daemon=True).start()
+    logger.info(f"Stopped money worker for {account_name}")
+    return True
 
 def is_worker_running(account_name):
     with lock:
-        return account_name in workers and workers[account_name]["thread"].is_alive()
+        return account_name in workers and _worker_alive(workers[account_name])
+
+def get_running_workers(owner=None):
+    with lock:
+        if owner is None:
+            return [name for name, worker in workers.items() if _worker_alive(worker)]
+        return [name for name in owners.get(owner, ()) if _worker_alive(workers[name])]
 
-def get_running_workers():
+def count_running_workers(owner):
     with lock:
-        return [name for name, worker in workers.items() if worker["thread"].is_alive()]
\ No newline at end of file
+        return _owner_count(owner)
+
+def get_worker_owner(account_name):
+    with lock:
+        worker = workers.get(account_name)
+        return worker["owner"] if worker else None
+
+def get_missions_per_minute():
+    with lock:
+        pacers = {name: worker.get("pacer") for name, worker in workers.items()}
+    sharded = {}
+    for missions in list(_shard_missions.values()):
+        sharded.update(missions)
+    return {name: pacer.missions_per_minute() if pacer else sharded.get(name, 0) for name, pacer in pacers.items()}
+
+# Gauge untuk exporter metrics
+register_gauge("running_workers", lambda: len(get_running_workers()))
+register_gauge("missions_per_minute", get_missions_per_minute)
+register_gauge("http_pool_hits", lambda: get_http_pool_stats()["hits"])
+register_gauge("http_pool_misses", lambda: get_http_pool_stats()["misses"])
+register_gauge("rate_limit_per_second", lambda: get_rate_limiter_stats()["rate"])
+register_gauge("rate_limit_queued", lambda: get_rate_limiter_stats()["queued"])
+register_gauge("rate_limit_throttles", lambda: get_rate_limiter_stats()["throttles"])
+register_gauge("rate_limit_interactive_queued", lambda: get_rate_limiter_stats()["interactive"]["queued"])
\ No newline at end of file